@@ -1,5 +1,5 @@
 import streamlit as st
-from src import manage_cash
+from src.cash_management import manage_cash
 
 manage_cash()
 
@@ -0,0 +1,609 @@
+"""
+Benchmarks of the computational hot paths
+
+Every benchmark runs on the bundled data/ files and on synthetic, scaled-up inputs (more countries, more demand
+profiles, longer price histories). The best of several runs is compared with a stored baseline; the script exits with
+code 1 if a benchmark got slower than the tolerance allows or has no baseline, and with code 2 if there is no baseline
+file.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py --save          # measure and store benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py                 # measure and compare with the baseline
+    python benchmarks/run_benchmarks.py --filter fit --tolerance 0.5 --scale 8
+
+Baselines depend on the machine, store them on the machine that runs the comparison.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from src import binary_store, get_price_data, price_profile_generation
+from src.batch_evaluation import (
+    cached_sufficient_statistics,
+    calculate_allowable_investment_from_statistics,
+    stack_profiles,
+)
+from src.carnot_hp_calculations import calculate_cop, calculate_cop_weights
+from src.cop_maps import available_cop_maps
+from src.demand_profile_generation import (
+    available_industries,
+    available_temperature_levels,
+    generate_batch_process,
+    generate_continuous_process,
+    generate_demand_profile_template,
+    load_industrial_demand_profile,
+)
+from src.get_price_data import get_relative_prices, load_price_cube
+from src.plotting import downsample_frame
+from src.price_duration import (
+    build_price_duration_index,
+    calculate_allowable_investment_threshold,
+)
+from src.price_parameters import (
+    fit_all_price_parameters,
+    fitted_years,
+    load_price_parameters,
+)
+from src.price_profile_generation import (
+    available_price_countries,
+    fit_electricty_price_trends,
+    generate_electricity_price_profile,
+    load_electricity_price_profile,
+)
+from src.sensitivity import calculate_allowable_investment_sensitivity
+from src.temperature_profiles import seasonal_temperature_profile
+from src.time_alignment import align_series
+from src.time_series_aggregation import aggregate_representative_days
+
+BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+SCALING_FACTORS = {
+    "trend": 1.0,
+    "weekly_factor": 1.0,
+    "hourly_factor": 1.0,
+    "overall_factor": 1.0,
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """
+    Registers a benchmark. The decorated function gets the scale of the synthetic inputs and returns the callable to
+    time (all preparation happens before).
+
+    :param str name: name of the benchmark in the results
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def synthetic_price_history(
+    n_years: int, seed: int = 0, start_year: int = 2000
+) -> pd.DataFrame:
+    """
+    Hourly prices with trend, weekly and daily cycle and noise in the format of load_electricity_price_profile
+
+    :param int n_years: number of years
+    :param int seed: seed of the random number generator
+    :param int start_year: first year
+    :return: Dataframe with column p and a datetime index
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(
+        f"{start_year}-01-01",
+        f"{start_year + n_years - 1}-12-31 23:00",
+        freq="1h",
+        name="Datetime (Local)",
+    )
+    hours = np.arange(len(index))
+    log_p = (
+        4
+        + 0.00001 * hours
+        + 0.2 * np.abs(np.sin(hours * np.pi / 168))
+        + 0.3 * np.sin(hours * np.pi / 12)
+        + rng.normal(0, 0.3, len(index))
+    )
+    return pd.DataFrame({"p": np.exp(log_p)}, index=index)
+
+
+def write_synthetic_countries(path: str, n_countries: int) -> list:
+    """
+    Writes price csv files of additional synthetic countries (copies of a bundled country with noise)
+
+    :param str path: directory of the csv files
+    :param int n_countries: number of synthetic countries
+    :return: list of country names
+    """
+    template = pd.read_csv(
+        os.path.join(
+            price_profile_generation.PRICE_DATA_PATH,
+            f"{available_price_countries()[0]}.csv",
+        )
+    )
+    rng = np.random.default_rng(0)
+    names = []
+    for i in range(n_countries):
+        name = f"Synthetic {i}"
+        country = template.copy()
+        country["Country"] = name
+        country["Price (EUR/MWhe)"] = (
+            country["Price (EUR/MWhe)"] * rng.normal(1, 0.05, len(country))
+        ).round(2)
+        country.to_csv(os.path.join(path, f"{name}.csv"), index=False)
+        names.append(name)
+    return names
+
+
+def demand_profiles(n_profiles: int) -> np.ndarray:
+    """
+    Stacks bundled industrial profiles and generated processes until n_profiles are reached
+
+    :param int n_profiles: number of profiles
+    :return: array with shape (n_profiles, 35040)
+    """
+    profiles = [
+        generate_batch_process(6, 20, 2, 1),
+        generate_continuous_process([1] * 24),
+    ]
+    for industry in available_industries():
+        for level in available_temperature_levels(industry):
+            profiles.append(load_industrial_demand_profile(industry, level))
+    profiles = stack_profiles(profiles, 35040)
+    return profiles[np.arange(n_profiles) % len(profiles)]
+
+
+def page_3_inputs(n_profiles: int) -> tuple:
+    """
+    :param int n_profiles: number of demand profiles
+    :return: demand profiles, their datetimes, prices of the most complete year of a bundled country and that year
+    """
+    demand = demand_profiles(n_profiles)
+    datetimes = pd.date_range("2025-01-01", periods=demand.shape[1], freq="15min")
+    p = load_electricity_price_profile(available_price_countries()[0])["p"]
+    year = p.index.year.value_counts().idxmax()
+    p = p[p.index.year == year]
+    return demand, datetimes, p, year
+
+
+def page_3_run(
+    demand: np.ndarray,
+    datetimes: pd.DatetimeIndex,
+    p: pd.Series,
+    year: int,
+    T_l: np.ndarray = None,
+    rerun: bool = False,
+):
+    """
+    Returns the computation of page 3 with the heat pump running whenever there is heat demand: align the prices to
+    the profiles, look up the sufficient statistics of every profile and evaluate all profiles at once
+
+    :param np.ndarray demand: demand profiles with shape (n_profiles, n_steps)
+    :param pd.DatetimeIndex datetimes: datetimes of the demand profiles
+    :param pd.Series p: hourly prices in EUR/MWh
+    :param int year: year of the prices
+    :param np.ndarray T_l: source temperatures per time step with shape (n_profiles, n_steps), None for constant
+        temperatures
+    :param bool rerun: time a rerun after a change of a scalar input (statistics in the cache) instead of the first run
+    :return: callable without arguments
+    """
+    profile_keys = [f"profile {i}" for i in range(len(demand))]
+    series_key = ("bundled", year)
+    cache = {}
+
+    def run():
+        if not rerun:
+            cache.clear()
+        p_el = align_series(p.index, p.to_numpy() / 1000, datetimes, year)
+        if T_l is None:
+            cop, cop_weights = (
+                calculate_cop(
+                    np.linspace(20, 60, len(demand)),
+                    np.linspace(80, 120, len(demand)),
+                    0.6,
+                ),
+                None,
+            )
+        else:
+            cop, cop_weights = calculate_cop_weights(
+                demand, calculate_cop(T_l, 90, 0.6)
+            )
+        heat, electricity_costs = cached_sufficient_statistics(
+            demand,
+            p_el,
+            cache,
+            profile_keys,
+            [series_key],
+            0.25,
+            cop_weights=cop_weights,
+        )
+        return calculate_allowable_investment_from_statistics(
+            heat, electricity_costs, cop, 0.05, 0.05, 15
+        )
+
+    if rerun:
+        # the first run of the page fills the cache
+        run()
+    return run
+
+
+def page_3_threshold_run(
+    demand: np.ndarray,
+    datetimes: pd.DatetimeIndex,
+    p: pd.Series,
+    year: int,
+    n_representative_days: int,
+    rerun: bool = False,
+):
+    """
+    Returns the computation of the price threshold sweep of page 3 on representative days: cluster the year (kept in
+    the session state on reruns, see cash_management.get_representative_days), sort the prices and sweep the threshold
+
+    :param np.ndarray demand: demand profiles with shape (n_profiles, n_steps)
+    :param pd.DatetimeIndex datetimes: datetimes of the demand profiles
+    :param pd.Series p: hourly prices in EUR/MWh
+    :param int year: year of the prices
+    :param int n_representative_days: number of representative days
+    :param bool rerun: time a rerun after a change of a scalar input (aggregation in the cache) instead of the first
+        run
+    :return: callable without arguments
+    """
+    cop = calculate_cop(
+        np.linspace(20, 60, len(demand)), np.linspace(80, 120, len(demand)), 0.6
+    )
+    p_el = align_series(p.index, p.to_numpy() / 1000, datetimes, year)
+    cache = {}
+
+    def run():
+        if not rerun or "aggregation" not in cache:
+            cache["aggregation"] = aggregate_representative_days(
+                demand, p_el, n_representative_days, 96
+            )
+        aggregation = cache["aggregation"]
+        index = build_price_duration_index(
+            aggregation["demand"], aggregation["p_el"], 0.25, aggregation["weights"]
+        )
+        thresholds = np.linspace(0, 0.3, 200)
+        return calculate_allowable_investment_threshold(
+            index, cop, 0.05, 0.05, 15, 1, thresholds
+        )
+
+    if rerun:
+        run()
+    return run
+
+
+def source_temperature_series(scale: int) -> np.ndarray:
+    """
+    :param int scale: number of years times 25
+    :return: quarter-hourly seasonal source temperatures with shape (25 * scale, 35040)
+    """
+    datetimes = pd.date_range("2025-01-01", periods=35040, freq="15min")
+    return np.vstack(
+        [
+            seasonal_temperature_profile(datetimes, mean, 8, daily_amplitude=3)
+            for mean in np.linspace(5, 40, 25 * scale)
+        ]
+    )
+
+
+@benchmark("fit_electricty_price_trends[bundled]")
+def bench_fit_bundled(scale):
+    p = load_electricity_price_profile(available_price_countries()[0])
+    year = p.index.year.value_counts().idxmax()
+    return lambda: fit_electricty_price_trends(p, year)
+
+
+@benchmark("fit_electricty_price_trends[synthetic history]")
+def bench_fit_synthetic(scale):
+    p = synthetic_price_history(2 * scale)
+    return lambda: fit_electricty_price_trends(p, None)
+
+
+@benchmark("generate_electricity_price_profile")
+def bench_generate_price_profile(scale):
+    p = load_electricity_price_profile(available_price_countries()[0])
+    year = p.index.year.value_counts().idxmax()
+    _, params = fit_electricty_price_trends(p, year)
+    return lambda: generate_electricity_price_profile(params, 80, SCALING_FACTORS, 2025)
+
+
+@benchmark("load_electricity_price_profile[bundled, warm]")
+def bench_load_warm(scale):
+    countries = available_price_countries()
+    for country in countries:
+        load_electricity_price_profile(country)
+    return lambda: [load_electricity_price_profile(country) for country in countries]
+
+
+@benchmark("load_electricity_price_profile[synthetic countries, cold]")
+def bench_load_cold(scale):
+    data_path = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, data_path, True)
+    cache_path = os.path.join(data_path, ".cache")
+    countries = write_synthetic_countries(data_path, scale)
+
+    def load_all():
+        shutil.rmtree(cache_path, ignore_errors=True)
+        return [load_electricity_price_profile(country) for country in countries]
+
+    def run():
+        paths = (
+            price_profile_generation.PRICE_DATA_PATH,
+            price_profile_generation.CACHE_PATH,
+        )
+        (
+            price_profile_generation.PRICE_DATA_PATH,
+            price_profile_generation.CACHE_PATH,
+        ) = (data_path, cache_path)
+        try:
+            return load_all()
+        finally:
+            (
+                price_profile_generation.PRICE_DATA_PATH,
+                price_profile_generation.CACHE_PATH,
+            ) = paths
+
+    return run
+
+
+@benchmark("fit_all_price_parameters[bundled, refit]")
+def bench_fit_all(scale):
+    return lambda: fit_all_price_parameters(n_workers=1, force=True)
+
+
+@benchmark("load_price_parameters[bundled, all years]")
+def bench_load_parameters(scale):
+    fit_all_price_parameters(n_workers=1)
+    years = {country: fitted_years(country) for country in available_price_countries()}
+    return lambda: [
+        load_price_parameters(country, year)
+        for country in years
+        for year in years[country]
+    ]
+
+
+@benchmark("generate_batch_process")
+def bench_batch_process(scale):
+    return lambda: [generate_batch_process(6, 20, 2, 1) for _ in range(scale)]
+
+
+@benchmark("generate_continuous_process")
+def bench_continuous_process(scale):
+    return lambda: [generate_continuous_process([1] * 24) for _ in range(scale)]
+
+
+@benchmark("generate_demand_profile_template")
+def bench_template(scale):
+    return lambda: generate_demand_profile_template(True, 50)
+
+
+@benchmark("get_relative_prices")
+def bench_relative_prices(scale):
+    return get_relative_prices
+
+
+@benchmark("load_price_cube[cold]")
+def bench_price_cube_cold(scale):
+    def run():
+        get_price_data._load_price_cube.cache_clear()
+        return load_price_cube()
+
+    return run
+
+
+@benchmark("page 3 allowable costs[bundled]")
+def bench_page_3_bundled(scale):
+    return page_3_run(*page_3_inputs(2))
+
+
+@benchmark("page 3 allowable costs[bundled, rerun]")
+def bench_page_3_rerun(scale):
+    return page_3_run(*page_3_inputs(2), rerun=True)
+
+
+@benchmark("page 3 allowable costs[synthetic profiles]")
+def bench_page_3_synthetic(scale):
+    return page_3_run(*page_3_inputs(25 * scale))
+
+
+@benchmark("page 3 allowable costs[synthetic profiles, time-varying cop]")
+def bench_page_3_time_varying_cop(scale):
+    return page_3_run(*page_3_inputs(25 * scale), T_l=source_temperature_series(scale))
+
+
+@benchmark("page 3 price threshold[synthetic profiles, 12 representative days]")
+def bench_page_3_threshold(scale):
+    return page_3_threshold_run(*page_3_inputs(25 * scale), 12)
+
+
+@benchmark("page 3 price threshold[synthetic profiles, 12 representative days, rerun]")
+def bench_page_3_threshold_rerun(scale):
+    return page_3_threshold_run(*page_3_inputs(25 * scale), 12, rerun=True)
+
+
+@benchmark("calculate_cop[carnot, time-varying source]")
+def bench_cop_carnot(scale):
+    T_l = source_temperature_series(scale)
+    return lambda: calculate_cop(T_l, 90, 0.6)
+
+
+@benchmark("calculate_cop[cop map, time-varying source]")
+def bench_cop_map(scale):
+    T_l = source_temperature_series(scale)
+    cop_map = available_cop_maps()[0]
+    calculate_cop(T_l[:1], 90, cop_map=cop_map)
+    return lambda: calculate_cop(T_l, 90, cop_map=cop_map)
+
+
+@benchmark("sobol indices[allowable investment, 8 inputs]")
+def bench_sobol(scale):
+    distributions = {
+        "T_l": ("uniform", 20, 40),
+        "T_h": ("uniform", 80, 100),
+        "h": ("uniform", 5000, 7000),
+        "p_th": ("triangular", 30, 50, 70),
+        "p_el": ("normal", 150, 25),
+        "r": ("uniform", 0.03, 0.07),
+        "t": ("uniform", 10, 20),
+        "ex_eta": ("uniform", 0.45, 0.65),
+    }
+    return lambda: calculate_allowable_investment_sensitivity(
+        distributions, 2**14 * scale
+    )
+
+
+@benchmark("downsample_frame[price chart, 2 profiles]")
+def bench_downsample(scale):
+    index = pd.date_range("2023-01-01", periods=8760 * scale, freq="h")
+    values = np.random.default_rng(0).normal(size=(2, index.size)).cumsum(axis=1)
+    frame = pd.DataFrame(
+        {
+            "index": np.tile(index, 2),
+            "p": values.ravel(),
+            "source": np.repeat(["actual", "generic"], index.size),
+        }
+    )
+    return lambda: downsample_frame(frame, "index", "p", group="source")
+
+
+def measure(func, min_time: float = 1.0, max_repeat: int = 5) -> dict:
+    """
+    Times a callable repeatedly and keeps the best run
+
+    :param func: callable without arguments
+    :param float min_time: repeat until this time in seconds is spent (at most max_repeat runs)
+    :param int max_repeat: maximal number of runs
+    :return: dictionary with best time in seconds and number of runs
+    """
+    times = []
+    while len(times) < max_repeat and (not times or sum(times) < min_time):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "runs": len(times)}
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float, noise_floor: float
+) -> tuple:
+    """
+    :param dict results: current results
+    :param dict baseline: stored results
+    :param float tolerance: allowed relative slowdown, e.g. 0.3 for 30 %
+    :param float noise_floor: slowdowns below this absolute time in seconds are ignored
+    :return: names of benchmarks that got slower than allowed, names of benchmarks without baseline
+    """
+    regressions, missing = [], []
+    for name, result in results.items():
+        if name not in baseline:
+            missing.append(name)
+            continue
+        before, now = baseline[name]["seconds"], result["seconds"]
+        if now > before * (1 + tolerance) and now - before > noise_floor:
+            regressions.append(name)
+    return regressions, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE_PATH, help="path of the baseline json"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as new baseline"
+    )
+    parser.add_argument("--output", help="also write the results to this json file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="allowed relative slowdown (default 0.3)",
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=0.002,
+        help="ignore slowdowns below this many seconds (default 0.002)",
+    )
+    parser.add_argument(
+        "--scale", type=int, default=4, help="scale of the synthetic inputs (default 4)"
+    )
+    parser.add_argument(
+        "--filter", default="", help="only run benchmarks containing this text"
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save:
+        if not os.path.exists(args.baseline):
+            # without a baseline the gate would pass whatever the timings are
+            print(f"No baseline at {args.baseline}, store one with --save first")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(setup(args.scale))
+        before = baseline.get(name, {}).get("seconds")
+        change = f"{results[name]['seconds'] / before - 1:+8.1%}" if before else " " * 8
+        print(f"{name:<75} {results[name]['seconds'] * 1000:10.2f} ms {change}")
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.platform(),
+            "scale": args.scale,
+            "store_version": binary_store.STORE_VERSION,
+        },
+        "results": results,
+    }
+    for path in [args.baseline if args.save else None, args.output]:
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {path}")
+
+    if args.save:
+        return
+    regressions, missing = compare(results, baseline, args.tolerance, args.noise_floor)
+    if missing:
+        print(
+            f"Not in the baseline (store a new one with --save): {', '.join(missing)}"
+        )
+    if regressions:
+        print(
+            f"Slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}"
+        )
+    if missing or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 import pytest
 
 
@@ -8,3 +10,11 @@ def pytest_configure(config):
     :param config: Configuration for pytest
     """
     config.data_folder_path = ""
+
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    """
+    Runs a test from the repository root, where the relative data paths (data/...) of src are valid
+    """
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
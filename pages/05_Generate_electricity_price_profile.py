@@ -2,22 +2,24 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 
-from src.price_profile_generation import fit_electricty_price_trends, generate_electricity_price_profile, \
-    load_electricity_price_profile
+from src.cash_management import generate_electricity_price_profile, load_electricity_price_profile, manage_cash
+from src.instrumentation import stage
+from src.plotting import downsample_frame
+from src.price_parameters import fitted_years, load_price_parameters
+from src.price_profile_generation import available_price_countries
 
-# st.markdown("**Select country and year to produce synthetic electricity price profile**")
-# ctrs_available = [f.replace(".csv", "") for f in os.listdir("data/european_wholesale_electricity_price_data_hourly") if f.endswith(".csv")]
-# ctr_sel = st.selectbox("Use price from country", ctrs_available)
+manage_cash()
 
-ctr_sel = "Germany"
-selected_years = 2024
+st.markdown("**Select country and year to produce synthetic electricity price profile**")
+ctr_sel = st.selectbox("Use price from country", available_price_countries())
+years_available = fitted_years(ctr_sel)
+selected_years = st.selectbox("Select a year:", years_available, index=len(years_available) - 1)
 
-p = load_electricity_price_profile(ctr_sel)
-# selected_years = st.selectbox("Select a year:", set(p.index.year.to_list()))
-p, params = fit_electricty_price_trends(p, selected_years)
+p = load_electricity_price_profile(ctr_sel, selected_years)
+params, _, _ = load_price_parameters(ctr_sel, selected_years)
 
-st.markdown("**Scale profile**  \n The tool used electricity price information of Germany from 2025 and generates "
-            "generic profiles based on https://www.sciencedirect.com/science/article/pii/S0140988311001721#f0015")
+st.markdown(f"**Scale profile**  \n The tool used electricity price information of {ctr_sel} from {selected_years} and "
+            "generates generic profiles based on https://www.sciencedirect.com/science/article/pii/S0140988311001721#f0015")
 average_electricity_price = st.number_input("Average electricity price (EUR/MWh)", min_value=-500, max_value=500, step=1, value=0)
 
 col1, col2 = st.columns(2)
@@ -55,15 +57,18 @@ p_gen_plot = p_gen_plot.to_frame(name="p").assign(source=p_gen_plot.name)
 
 p_de_plot = p["p"]
 p_de_plot.index.name = None
-p_de_plot.name = "Actual German price profile (2024)"
+p_de_plot.name = f"Actual price profile of {ctr_sel} ({selected_years})"
 p_de_plot  = p_de_plot.to_frame(name="p").assign(source=p_de_plot.name)
 
 p_plot = pd.concat([p_de_plot, p_gen_plot])
 
+# prices of the selected time range at full resolution, offered as csv download below
 p_plot_sel = p_plot[(p_plot.index >= start) & (p_plot.index <= end)]
+# the chart only gets the lowest and highest price per pixel, a shorter time range shows the full resolution
+p_chart = downsample_frame(p_plot_sel.reset_index(), "index", "p", group="source")
 
 chart = (
-    alt.Chart(p_plot_sel.reset_index())
+    alt.Chart(p_chart)
     .mark_line()
     .encode(
         x=alt.X("index:T", title="Time"),
@@ -79,7 +84,8 @@ chart = (
     .interactive()
 )
 
-st.altair_chart(chart, width='stretch')
+with stage("page 5: render chart"):
+    st.altair_chart(chart, width='stretch')
 
 @st.cache_data
 def convert_for_download(df):
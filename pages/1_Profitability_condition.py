@@ -2,8 +2,11 @@ import streamlit as st
 import numpy as np
 import pandas as pd
 import altair as alt
-from src import manage_cash
+from src.cash_management import manage_cash
+from src.ui import select_cop_model, select_temperature_grid, show_temperature_heatmap
+from src.instrumentation import stage
 from src.carnot_hp_calculations import calculate_profitable_relative_price
+from src.cop_grids import calculate_cop_grid, slice_cop_grid
 from src.get_price_data import get_relative_prices
 
 manage_cash()
@@ -43,7 +46,7 @@ elif on_x_axis == "Sink temperature":
 
 
 st.markdown("**Heat pump specifications**")
-exergetic_efficiency = st.number_input("Exergetic efficiency of heat pump (%)", value=60.0, min_value=0.0, max_value=100.0, step=0.5)
+exergetic_efficiency, cop_map = select_cop_model("Exergetic efficiency of heat pump (%)")
 
 
 st.markdown("**Plot actual industrial electricity prices**")
@@ -62,14 +65,12 @@ cfg = x_settings
 x_vals = np.linspace(*cfg["range"], num_points)
 
 # Generate y values by substituting the swept parameter
-def calc(x):
-    return calculate_profitable_relative_price(
-        T_l if cfg["arg"] != "T_l" else x,
-        T_h if cfg["arg"] != "T_h" else x,
-        exergetic_efficiency /100
-    )
-
-y_vals = [calc(x) for x in x_vals]
+y_vals = calculate_profitable_relative_price(
+    T_l if cfg["arg"] != "T_l" else x_vals,
+    T_h if cfg["arg"] != "T_h" else x_vals,
+    exergetic_efficiency /100,
+    cop_map
+)
 xlabel = cfg["xlabel"]
 
 # --- Prepare data ---
@@ -81,7 +82,7 @@ data["Label"] = x_settings["legend_title"]
 # Calculate current point NPV
 
 x_limits = (min(current_x, min(x_vals))*0.9, max(current_x, max(x_vals))*1.1)
-y_limits = (min(0, min(y_vals)), max(y_vals)*1.1)
+y_limits = (min(0, np.nanmin(y_vals)), np.nanmax(y_vals)*1.1)
 
 # --- Plot ---
 line = (
@@ -150,5 +151,15 @@ chart = (area1 + line + vertical + horizontal).properties(
     height=400, width=700
 ).interactive()
 
-st.altair_chart(chart, width='stretch')
-# st.text(f"COP is {round((1 - T_l / T_h) ** -1,1)}")
\ No newline at end of file
+with stage("page 1: render chart"):
+    st.altair_chart(chart, width='stretch')
+# st.text(f"COP is {round((1 - T_l / T_h) ** -1,1)}")
+
+st.markdown("**Heatmap over source and sink temperatures**")
+if st.checkbox("Show the profitable relative price for all source and sink temperatures"):
+    T_source_grid, T_sink_grid = select_temperature_grid()
+    with stage("page 1: heatmap"):
+        grid = calculate_cop_grid(T_source_grid, T_sink_grid, cop_map=cop_map)
+        relative_price = slice_cop_grid(grid, exergetic_efficiency / 100)
+    show_temperature_heatmap(grid, relative_price, "Relative electricity price", "profitable_relative_price.npz",
+                             profitable_relative_price=relative_price)
@@ -3,8 +3,15 @@ import numpy as np
 import pandas as pd
 import altair as alt
 
-from src import manage_cash
-from src.carnot_hp_calculations import calculate_allowable_investment_per_kw_el
+import os
+
+from src.cash_management import calculate_allowable_investment_sensitivity, manage_cash
+from src.ui import select_cop_model, select_temperature_grid, show_temperature_heatmap
+from src.instrumentation import stage
+from src.carnot_hp_calculations import calculate_allowable_investment_from_cop, \
+    calculate_allowable_investment_per_kw_el
+from src.cop_grids import calculate_cop_grid, slice_cop_grid
+from src.sensitivity import allowable_investment_model, calculate_tornado
 
 manage_cash()
 st.set_page_config(
@@ -17,7 +24,7 @@ st.markdown("**Application**")
 T_l = st.number_input("Temperature of heat source in Celsius", value=30.0, min_value = -20.0, max_value = 150.0, step = 0.5)
 T_h = st.number_input("Temperature of heat sink in Celsius", value=90.0, min_value = 0.0, max_value = 250.0, step = 0.5)
 operating_hours = st.number_input("Operating hours per year", value=6000, min_value = 0, max_value = 8760, step = 1)
-exergetic_efficiency = st.number_input("Exergetic efficiency (%)", value=60.0, min_value=0.0, max_value=100.0, step=0.5)
+exergetic_efficiency, cop_map = select_cop_model()
 
 st.markdown("**Alternative heat provision**")
 p_th = st.number_input("Cost of alternative heat provision (EUR/MW)", value=50, min_value = 0, max_value = 300)
@@ -30,149 +37,265 @@ lifetime = st.number_input("Lifetime of heat pump", value=15, min_value = 0, max
 interest_rate = st.number_input("Interest rate", value=5.0, min_value = 0.1, max_value = 20.0)
 
 st.markdown("**Plotting options**")
-num_points = 200
-
-# Define variable sweep settings
-x_settings = {
-    "electricity price": {
-        "range": (p_el-50, p_el+50),
-        "arg": "p_el",
-        "xlabel": "Electricity price (EUR/kW)",
-        "x_current": p_el
-    },
-    "heat provision cost of alternative": {
-        "range": (p_th-50, p_th+50),
-        "arg": "p_th",
-        "xlabel": "Alternative heat provision cost (EUR/kW)",
-        "x_current": p_th
-    },
-    "sink temperature": {
-        "range": (int(T_l)+20, 250),
-        "arg": "T_h",
-        "xlabel": "Sink temperature (°C)",
-        "x_current": T_h
-    },
-    "source temperature": {
-        "range": (-10, int(T_h)-20),
-        "arg": "T_l",
-        "xlabel": "Source temperature (°C)",
-        "x_current": T_l
-    },
-    "operating hours": {
-        "range": (operating_hours-1000, operating_hours+1000),
-        "arg": "operating_hours",
-        "xlabel": "Operating hours per year",
-        "x_current": operating_hours
-    },
-    "interest rate": {
-        "range": (interest_rate-0.1, interest_rate+0.1),
-        "arg": "interest_rate",
-        "xlabel": "Interest rate (-)",
-        "x_current": interest_rate
-    },
-    "lifetime": {
-        "range": (lifetime-10, lifetime+10),
-        "arg": "lifetime",
-        "xlabel": "Lifetime (years)",
-        "x_current": lifetime
-    },
-    "exergetic efficiency": {
-        "range": (0, 100),
-        "arg": "exergetic efficiency",
-        "xlabel": "exergetic efficiency (%)",
-        "x_current": exergetic_efficiency
-    },
-}
-on_x_axis = st.selectbox("Plot on x axis", x_settings.keys())
-
-
-# Select configuration
-cfg = x_settings[on_x_axis]
-x_vals = np.linspace(*cfg["range"], num_points)
-
-# Generate y values by substituting the swept parameter
-def calc(x):
-    return calculate_allowable_investment_per_kw_el(
-        T_l if cfg["arg"] != "T_l" else x,
-        T_h if cfg["arg"] != "T_h" else x,
-        operating_hours if cfg["arg"] != "operating_hours" else x,
-        p_th if cfg["arg"] != "p_th" else x,
-        p_el if cfg["arg"] != "p_el" else x,
-        interest_rate/100 if cfg["arg"] != "interest_rate" else x/100,
-        lifetime if cfg["arg"] != "lifetime" else x,
-        exergetic_efficiency/100 if cfg["arg"] != "exergetic efficiency" else x/100,
+one_at_a_time = "One input at a time"
+global_sensitivity = "All inputs at once (global sensitivity, Sobol indices)"
+temperature_heatmap = "Heatmap over source and sink temperatures"
+analysis = st.selectbox("Analysis", [one_at_a_time, global_sensitivity, temperature_heatmap])
+
+if analysis == temperature_heatmap:
+    T_source_grid, T_sink_grid = select_temperature_grid()
+    with stage("page 2: heatmap"):
+        grid = calculate_cop_grid(T_source_grid, T_sink_grid, cop_map=cop_map)
+        allowable_investment = calculate_allowable_investment_from_cop(
+            slice_cop_grid(grid, exergetic_efficiency / 100), operating_hours, p_th, p_el, interest_rate / 100,
+            lifetime)
+    show_temperature_heatmap(grid, allowable_investment, "Allowable CAPEX (EUR/kW)", "allowable_capex.npz",
+                             allowable_investment=allowable_investment)
+
+elif analysis == global_sensitivity:
+    # inputs of calculate_allowable_investment_per_kw_el in the units of this page
+    base = {"T_l": T_l, "T_h": T_h, "h": operating_hours, "p_th": p_th, "p_el": p_el, "r": interest_rate,
+            "t": lifetime, "ex_eta": exergetic_efficiency}
+    labels = {"T_l": "Source temperature (°C)", "T_h": "Sink temperature (°C)", "h": "Operating hours per year",
+              "p_th": "Alternative heat provision cost (EUR/MWh)", "p_el": "Electricity price (EUR/MWh)",
+              "r": "Interest rate (%)", "t": "Lifetime (years)", "ex_eta": "Exergetic efficiency (%)"}
+    spreads = {"T_l": 10, "T_h": 10, "h": 1000, "p_th": 20, "p_el": 50, "r": 2, "t": 5, "ex_eta": 10}
+    limits = {"h": (0, 8760), "p_th": (0, None), "p_el": (0, None), "r": (0, None), "t": (1, None),
+              "ex_eta": (1, 100)}
+    to_model_units = {"r": 0.01, "ex_eta": 0.01}
+    if cop_map is not None:
+        # the cop map replaces the exergetic efficiency
+        del base["ex_eta"]
+    names = list(base)
+
+    st.markdown("Ranges of the inputs. For normal distributions min and max are the 2.5 % and 97.5 % quantiles, "
+                "triangular distributions peak at the value above.")
+    ranges = st.data_editor(
+        pd.DataFrame({
+            "Input": [labels[name] for name in names],
+            "Distribution": "uniform",
+            "Min": [float(np.clip(base[name] - spreads[name], *limits.get(name, (None, None)))) for name in names],
+            "Max": [float(np.clip(base[name] + spreads[name], *limits.get(name, (None, None)))) for name in names],
+        }),
+        column_config={
+            "Input": st.column_config.TextColumn(disabled=True),
+            "Distribution": st.column_config.SelectboxColumn(options=["uniform", "triangular", "normal", "constant"],
+                                                             required=True),
+        },
+        hide_index=True,
     )
+    n_samples = st.number_input("Number of samples (the model is evaluated (inputs + 2) times per sample)",
+                                value=100000, min_value=1000, max_value=10000000, step=10000)
+    n_workers = st.number_input("CPU cores", value=1, min_value=1, max_value=os.cpu_count() or 1)
 
-y_vals = [calc(x) for x in x_vals]
+    distributions, tornado_ranges = {}, {}
+    for name, row in zip(names, ranges.itertuples()):
+        f = to_model_units.get(name, 1)
+        low, high, value = row.Min * f, row.Max * f, base[name] * f
+        if row.Distribution == "uniform":
+            distributions[name] = ("uniform", low, high)
+        elif row.Distribution == "triangular":
+            distributions[name] = ("triangular", low, min(max(value, low), high), high)
+        elif row.Distribution == "normal":
+            distributions[name] = ("normal", (low + high) / 2, (high - low) / 3.92)
+        else:
+            distributions[name] = ("constant", value)
+        if row.Distribution != "constant":
+            tornado_ranges[name] = (low, high)
 
-# st.text(cfg["arg"])
-# st.table(x_vals)
-# st.table(y_vals)
+    with stage("page 2: global sensitivity"):
+        sobol = calculate_allowable_investment_sensitivity(distributions, int(n_samples), cop_map, int(n_workers))
+        tornado = calculate_tornado(allowable_investment_model(cop_map),
+                                    {name: base[name] * to_model_units.get(name, 1) for name in names},
+                                    tornado_ranges)
+    st.info(f"Allowable CAPEX over {sobol['n_samples']} samples: mean {round(sobol['mean'], 0)} EUR/kW, standard "
+            f"deviation {round(sobol['std'], 0)} EUR/kW. {sobol['n_invalid']} samples without temperature lift "
+            f"(or outside of the cop map) are left out.")
 
-x_current = cfg["x_current"]
-xlabel = cfg["xlabel"]
+    indices = pd.DataFrame({"Input": [labels[name] for name in names],
+                            "First order (input alone)": sobol["first_order"],
+                            "Total (including interactions)": sobol["total_order"]})
+    indices = indices.melt(id_vars="Input", var_name="Index", value_name="Sobol index")
+    sobol_chart = (
+        alt.Chart(indices)
+        .mark_bar()
+        .encode(
+            y=alt.Y("Input:N", title=None, sort=alt.EncodingSortField(field="Sobol index", op="max",
+                                                                       order="descending")),
+            yOffset="Index:N",
+            x=alt.X("Sobol index:Q", title="Share of the variance of the allowable CAPEX"),
+            color="Index:N",
+        )
+        .properties(height=400, width=700, title="Which input drives the allowable CAPEX")
+    )
 
-y_current = calculate_allowable_investment_per_kw_el(T_l, T_h, operating_hours, p_th, p_el, interest_rate/100, lifetime, exergetic_efficiency / 100)
+    swings = pd.DataFrame([
+        {"Input": labels[name], "Case": f"Input at {case}", "Base (EUR/kW)": tornado["base"],
+         "Allowable CAPEX (EUR/kW)": value, "Swing": abs(tornado[name][1] - tornado[name][0])}
+        for name in tornado_ranges for case, value in zip(["min", "max"], tornado[name])
+    ])
+    tornado_chart = (
+        alt.Chart(swings)
+        .mark_bar()
+        .encode(
+            y=alt.Y("Input:N", title=None, sort=alt.EncodingSortField(field="Swing", op="max", order="descending")),
+            x=alt.X("Base (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)"),
+            x2="Allowable CAPEX (EUR/kW):Q",
+            color="Case:N",
+            tooltip=["Input", "Case", "Allowable CAPEX (EUR/kW)"],
+        )
+        .properties(height=400, width=700, title="Allowable CAPEX with one input at the ends of its range")
+    )
+    with stage("page 2: render chart"):
+        st.altair_chart(sobol_chart, width='stretch')
+        st.altair_chart(tornado_chart, width='stretch')
 
-# --- Prepare data ---
-data = pd.DataFrame({xlabel: x_vals, "NPV (EUR/kW)": y_vals})
+else:
+    num_points = 200
 
-# Calculate current point NPV
-npv_current = calculate_allowable_investment_per_kw_el(T_l, T_h, operating_hours, p_th, p_el, interest_rate/100, lifetime, exergetic_efficiency / 100)
+    # Define variable sweep settings
+    x_settings = {
+        "electricity price": {
+            "range": (p_el-50, p_el+50),
+            "arg": "p_el",
+            "xlabel": "Electricity price (EUR/kW)",
+            "x_current": p_el
+        },
+        "heat provision cost of alternative": {
+            "range": (p_th-50, p_th+50),
+            "arg": "p_th",
+            "xlabel": "Alternative heat provision cost (EUR/kW)",
+            "x_current": p_th
+        },
+        "sink temperature": {
+            "range": (int(T_l)+20, 250),
+            "arg": "T_h",
+            "xlabel": "Sink temperature (°C)",
+            "x_current": T_h
+        },
+        "source temperature": {
+            "range": (-10, int(T_h)-20),
+            "arg": "T_l",
+            "xlabel": "Source temperature (°C)",
+            "x_current": T_l
+        },
+        "operating hours": {
+            "range": (operating_hours-1000, operating_hours+1000),
+            "arg": "operating_hours",
+            "xlabel": "Operating hours per year",
+            "x_current": operating_hours
+        },
+        "interest rate": {
+            "range": (interest_rate-0.1, interest_rate+0.1),
+            "arg": "interest_rate",
+            "xlabel": "Interest rate (-)",
+            "x_current": interest_rate
+        },
+        "lifetime": {
+            "range": (lifetime-10, lifetime+10),
+            "arg": "lifetime",
+            "xlabel": "Lifetime (years)",
+            "x_current": lifetime
+        },
+        "exergetic efficiency": {
+            "range": (0, 100),
+            "arg": "exergetic efficiency",
+            "xlabel": "exergetic efficiency (%)",
+            "x_current": exergetic_efficiency
+        },
+    }
+    if cop_map is not None:
+        # the cop map replaces the exergetic efficiency
+        del x_settings["exergetic efficiency"]
+    on_x_axis = st.selectbox("Plot on x axis", x_settings.keys())
 
-x_limits = (min(x_vals), max(x_vals))
-y_limits = (min(0, min(y_vals)), max(y_vals)*1.1)
 
-# --- Plot ---
-line = (
-    alt.Chart(data)
-    .mark_line()
-    .encode(
-        x=alt.X(f"{xlabel}:Q", title=xlabel).scale(domain=x_limits),
-        y=alt.Y("NPV (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits),
-        tooltip=[xlabel, "NPV (EUR/kW):Q"]
+    # Select configuration
+    cfg = x_settings[on_x_axis]
+    x_vals = np.linspace(*cfg["range"], num_points)
+
+    # Generate y values by substituting the swept parameter
+    y_vals = calculate_allowable_investment_per_kw_el(
+        T_l if cfg["arg"] != "T_l" else x_vals,
+        T_h if cfg["arg"] != "T_h" else x_vals,
+        operating_hours if cfg["arg"] != "operating_hours" else x_vals,
+        p_th if cfg["arg"] != "p_th" else x_vals,
+        p_el if cfg["arg"] != "p_el" else x_vals,
+        interest_rate/100 if cfg["arg"] != "interest_rate" else x_vals/100,
+        lifetime if cfg["arg"] != "lifetime" else x_vals,
+        exergetic_efficiency/100 if cfg["arg"] != "exergetic efficiency" else x_vals/100,
+        cop_map=cop_map,
     )
-)
 
-point = (
-    alt.Chart(pd.DataFrame({xlabel: [x_current], "NPV (EUR/kW)": [npv_current]}))
-    .mark_point(size=100, color="red")
-    .encode(
-        x=alt.X(f"{xlabel}:Q").scale(domain=x_limits),
-        y=alt.Y("NPV (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits),
-        tooltip=[xlabel, "NPV (EUR/kW)"]
+    # st.text(cfg["arg"])
+    # st.table(x_vals)
+    # st.table(y_vals)
+
+    x_current = cfg["x_current"]
+    xlabel = cfg["xlabel"]
+
+    y_current = calculate_allowable_investment_per_kw_el(T_l, T_h, operating_hours, p_th, p_el, interest_rate/100, lifetime, exergetic_efficiency / 100, cop_map=cop_map)
+
+    # --- Prepare data ---
+    data = pd.DataFrame({xlabel: x_vals, "NPV (EUR/kW)": y_vals})
+
+    # Calculate current point NPV
+    npv_current = calculate_allowable_investment_per_kw_el(T_l, T_h, operating_hours, p_th, p_el, interest_rate/100, lifetime, exergetic_efficiency / 100, cop_map=cop_map)
+
+    x_limits = (min(x_vals), max(x_vals))
+    y_limits = (min(0, np.nanmin(y_vals)), np.nanmax(y_vals)*1.1)
+
+    # --- Plot ---
+    line = (
+        alt.Chart(data)
+        .mark_line()
+        .encode(
+            x=alt.X(f"{xlabel}:Q", title=xlabel).scale(domain=x_limits),
+            y=alt.Y("NPV (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits),
+            tooltip=[xlabel, "NPV (EUR/kW):Q"]
+        )
     )
-)
 
-current1 = (
-    alt.Chart(pd.DataFrame({xlabel: [x_current]}))
-    .mark_rule(color="black", strokeDash=[5, 5])
-    .encode(x=alt.X(f"{xlabel}:Q").scale(domain=x_limits))
-)
+    point = (
+        alt.Chart(pd.DataFrame({xlabel: [x_current], "NPV (EUR/kW)": [npv_current]}))
+        .mark_point(size=100, color="red")
+        .encode(
+            x=alt.X(f"{xlabel}:Q").scale(domain=x_limits),
+            y=alt.Y("NPV (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits),
+            tooltip=[xlabel, "NPV (EUR/kW)"]
+        )
+    )
 
-current2 = (
-    alt.Chart(pd.DataFrame({"NPV (EUR/kW)": [y_current]}))
-    .mark_rule(color="black", strokeDash=[5, 5])
-    .encode(y=alt.Y("NPV (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits))
-)
+    current1 = (
+        alt.Chart(pd.DataFrame({xlabel: [x_current]}))
+        .mark_rule(color="black", strokeDash=[5, 5])
+        .encode(x=alt.X(f"{xlabel}:Q").scale(domain=x_limits))
+    )
 
-y_min, y_max = 1200, 10e6
+    current2 = (
+        alt.Chart(pd.DataFrame({"NPV (EUR/kW)": [y_current]}))
+        .mark_rule(color="black", strokeDash=[5, 5])
+        .encode(y=alt.Y("NPV (EUR/kW):Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits))
+    )
 
-# Create shaded area spanning full x range
-area = (
-    alt.Chart(pd.DataFrame({"y_min": [y_min], "y_max": [y_max]}))
-    .mark_rect(opacity=0.2, color="grey")
-    .encode(
-        y=alt.Y("y_min:Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits),
-        y2="y_max:Q"
+    y_min, y_max = 1200, 10e6
+
+    # Create shaded area spanning full x range
+    area = (
+        alt.Chart(pd.DataFrame({"y_min": [y_min], "y_max": [y_max]}))
+        .mark_rect(opacity=0.2, color="grey")
+        .encode(
+            y=alt.Y("y_min:Q", title="Allowable CAPEX (EUR/kW)").scale(domain=y_limits),
+            y2="y_max:Q"
+        )
     )
-)
 
-# Combine everything
-st.text("Grey area is reasonable industrial heat pump cost from literature")
-chart = (area + line + point + current1 + current2).properties(
-    height=400, width=700
-).interactive()
+    # Combine everything
+    st.text("Grey area is reasonable industrial heat pump cost from literature")
+    chart = (area + line + point + current1 + current2).properties(
+        height=400, width=700
+    ).interactive()
 
-st.altair_chart(chart, width='stretch')
-# st.text(f"COP is {round((1 - T_l / T_h) ** -1,1)}")
\ No newline at end of file
+    with stage("page 2: render chart"):
+        st.altair_chart(chart, width='stretch')
+    # st.text(f"COP is {round((1 - T_l / T_h) ** -1,1)}")
\ No newline at end of file
@@ -1,11 +1,23 @@
 import pandas as pd
 import streamlit as st
-from src import manage_cash
+from src.cash_management import dispatch_storage_greedy, dispatch_storage_lp, get_demand_profile_frame, \
+    get_representative_days, load_electricity_price_profile, manage_cash
+from src.ui import get_cop_profile, select_cop_model
+from src.instrumentation import stage
 import altair as alt
 import numpy as np
-import os
-from src.get_price_data import process_price_data
+from src.get_price_data import load_price_cube, lookup_price
+from src.price_parameters import load_price_parameters
+from src.price_profile_generation import available_price_countries, complete_price_years
 
+from src.batch_evaluation import cached_sufficient_statistics, calculate_allowable_investment_from_statistics, \
+    calculate_allowable_investment_scenarios, stack_profiles, summarise_percentiles
+from src.price_scenarios import iter_price_scenarios
+from src.time_alignment import align_series, alignment_index
+from src.capacity_sizing import build_load_duration_index, calculate_capacity_sweep, optimal_capacity
+from src.price_duration import build_price_duration_index, calculate_allowable_investment_threshold
+from src.thermal_storage import calculate_allowable_investment_storage
+from src.time_series_aggregation import allowable_investment_error_bound, energy_error_bounds
 from src.carnot_hp_calculations import *
 
 manage_cash()
@@ -16,7 +28,8 @@ if len(st.session_state['demand_profiles'].keys()) == 0:
 else:
 
     st.markdown("**Heat pump specs**")
-    exergetic_efficiency = st.number_input("Exergetic efficiency (%)", value=60.0, min_value=0.0, max_value=100.0, step=0.5) /100
+    exergetic_efficiency, cop_map = select_cop_model()
+    exergetic_efficiency = exergetic_efficiency / 100
     lifetime = st.number_input("Lifetime of heat pump", value=15, min_value = 0, max_value = 100)
     interest_rate = st.number_input("Interest rate", value=5.0, min_value = 0.1, max_value = 20.0) / 100
 
@@ -24,98 +37,188 @@ else:
     p_th = st.number_input("Cost of alternative heat provision (EUR/MWth)", value=50, min_value = 0, max_value = 2000)/1000
 
     st.markdown("**Electricity price**")
-    profile_type = st.selectbox("Type", ["Constant electricity price", "Price profile (day ahead, excluding taxes and levies)"])
+    scenario_type = "Synthetic price scenarios (based on day ahead prices of the selected year)"
+    profile_type = st.selectbox("Type", ["Constant electricity price", "Price profile (day ahead, excluding taxes and levies)",
+                                         scenario_type])
 
 
     if profile_type == "Constant electricity price":
-        p_el = st.number_input("Cost of electricity for heat pump (EUR/MWel)", value=150, min_value = 0, max_value = 300)/1000
-        p_el = [p_el] * 8760*4
+        p_el_f = st.number_input("Cost of electricity for heat pump (EUR/MWel)", value=150, min_value = 0, max_value = 300)/1000
     else:
-        ctrs_available = [f.replace(".csv", "") for f in os.listdir("data/european_wholesale_electricity_price_data_hourly") if f.endswith(".csv")]
+        ctrs_available = available_price_countries()
         ctr_sel = st.selectbox("Use price from country", ctrs_available)
 
-        p_el_profiles = pd.read_csv(f"data/european_wholesale_electricity_price_data_hourly/{ctr_sel}.csv", header=[0])
-        p_el_profiles.index =  pd.to_datetime(p_el_profiles["Datetime (Local)"])
-        p_el_profiles = p_el_profiles["Price (EUR/MWhe)"]
-
-        counts = p_el_profiles.groupby(p_el_profiles.index.year).size()
-        full_years = counts[counts >= 8760].index
-        p_el_profiles = p_el_profiles[p_el_profiles.index.year.isin(full_years)]
-
-        yrs_available = full_years.tolist()
+        yrs_available = complete_price_years(ctr_sel)
         year_sel = st.selectbox("Use price from year", yrs_available)
-        p_el_profiles = p_el_profiles.loc[p_el_profiles.index.year == year_sel]
+        p_el_profiles = load_electricity_price_profile(ctr_sel, year_sel)["p"]
 
-        industrial_prices = process_price_data("data/industrial_el_prices.csv") *1000
-        if ctr_sel in industrial_prices:
-            industrial_prices = pd.DataFrame(industrial_prices.loc[ctr_sel,:])
-            industrial_prices["year"] = industrial_prices.index.to_series().str.extract(r"(\d{4})").astype(int)
-            industrial_prices_avg = industrial_prices.groupby("year")[ctr_sel].mean()
-            if year_sel in industrial_prices_avg:
-                industrial_prices_avg = industrial_prices_avg.loc[year_sel]
-                st.info(f"Average industrial electricity price from EUROSTAT for this year was: {industrial_prices_avg} EUR/MWh \n")
+        industrial_prices_avg = lookup_price(load_price_cube(), "electricity", ctr_sel, year_sel) * 1000
+        if not np.isnan(industrial_prices_avg):
+            st.info(f"Average industrial electricity price from EUROSTAT for this year was: {industrial_prices_avg} EUR/MWh \n")
 
         if p_el_profiles.isna().sum().sum() > 1:
             st.warning(f"Electricity prices contains missing values. Don't trust the results.")
 
-        p_el = [x for x in p_el_profiles.to_list() for _ in range(4)]
         p_el_f = st.number_input("Multiply electricity profile with...", value=1.0, min_value = 0.0, max_value = 10.0, step = 0.01)
-        p_el = [p * p_el_f/1000 for p in p_el]
+        p_el = p_el_profiles.to_numpy() / 1000
 
-        st.info(f"Min electricity prices from profile is {round(np.min(p_el*1)*1000,0)} EUR/MWh.")
-        st.info(f"Average electricity prices from profile is {round(np.mean(p_el)*1000,0)} EUR/MWh.")
-        st.info(f"Max electricity prices from profile is {round(np.max(p_el)*1000,0)} EUR/MWh.")
+        st.info(f"Min electricity prices from profile is {round(np.min(p_el * p_el_f)*1000,0)} EUR/MWh.")
+        st.info(f"Average electricity prices from profile is {round(np.mean(p_el * p_el_f)*1000,0)} EUR/MWh.")
+        st.info(f"Max electricity prices from profile is {round(np.max(p_el * p_el_f)*1000,0)} EUR/MWh.")
 
+        if profile_type == scenario_type:
+            n_scenarios = st.number_input("Number of synthetic price scenarios", value=1000, min_value=10, max_value=100000, step=100)
+            # the scenarios are evaluated on the full year
+            n_representative_days = 0
+        else:
+            n_representative_days = st.number_input("Representative days for the price threshold and capacity sizing "
+                                                    "(0 = full year)", value=0, min_value=0, max_value=365)
 
-    total_costs = pd.DataFrame(columns=['Allowable costs in EUR/kW'])
-    for profile_name in st.session_state['demand_profiles'].keys():
-        heat_demand = st.session_state['demand_profiles'][profile_name]["profile"]
-        heat_demand["p_el"] = p_el[0:len(heat_demand)]
-        T_l = st.session_state['demand_profiles'][profile_name]["T_l"]
-        T_h = st.session_state['demand_profiles'][profile_name]["T_h"]
-        cop = calculate_cop(T_l, T_h, exergetic_efficiency)
+    st.markdown("**Operation**")
+    always_on = "Run whenever there is heat demand"
+    profitable_only = "Run only when cheaper than alternative heat provision"
+    storage_strategy = "Run with thermal storage (shift electricity demand into cheap periods)"
+    if profile_type == scenario_type:
+        strategy = always_on
+        show_threshold_sweep = False
+        show_sizing = False
+    else:
+        strategy = st.selectbox("Operating strategy", [always_on, profitable_only, storage_strategy])
+        if strategy == storage_strategy:
+            storage_capacity = st.number_input("Storage capacity (hours of peak heat demand)", value=4.0, min_value=0.0,
+                                               max_value=168.0, step=0.5)
+            charge_power = st.number_input("Charge and discharge power (% of peak heat demand)", value=50.0,
+                                           min_value=0.0, max_value=100.0, step=5.0) / 100
+            loss_rate = st.number_input("Storage losses (% of stored heat per hour)", value=0.5, min_value=0.0,
+                                        max_value=10.0, step=0.1) / 100
+            hp_capacity = st.number_input("Heat output of heat pump (% of peak heat demand)", value=150.0,
+                                          min_value=100.0, max_value=300.0, step=10.0) / 100
+            dispatch_mode = st.selectbox("Storage dispatch", ["Heuristic (fast)", "Optimization (rolling horizon)"])
+        show_threshold_sweep = st.checkbox("Show allowable costs over electricity price threshold")
+        show_sizing = st.checkbox("Show capacity sizing below peak demand (alternative heat provision covers the rest)")
+        if show_sizing:
+            specific_cost = st.number_input("Specific investment cost of heat pump (EUR/kWel)", value=1200, min_value=0,
+                                            max_value=10000, step=50)
 
-        delta_t = heat_demand["datetime"].diff().dropna().mode()[0].total_seconds() / 3600
 
-        # cost alternative
-        heat_demand["heat_consumption"] = heat_demand["demand"]*delta_t
-        total_heat_demand = heat_demand["heat_consumption"].sum()
-        total_cost_alternative = total_heat_demand * p_th
+    demand_profiles = st.session_state['demand_profiles']
+    with stage("page 3: prepare demand profiles"):
+        demand_frames = [get_demand_profile_frame(name) for name in demand_profiles]
+        demand = stack_profiles([frame["demand"] for frame in demand_frames])
+    T_l = np.array([demand_profiles[name]["T_l"] for name in demand_profiles])
+    T_h = np.array([demand_profiles[name]["T_h"] for name in demand_profiles])
+    first_profile = demand_frames[0]
+    delta_t = first_profile["datetime"].diff().dropna().mode()[0].total_seconds() / 3600
 
-        # cost hp
-        heat_demand["electricity_power"] = heat_demand["demand"] / cop
-        heat_demand["electricity_consumption"] = heat_demand["electricity_power"]*delta_t
-        heat_demand["electricity_costs"] = heat_demand["electricity_consumption"] * heat_demand["p_el"]
+    if any("temperatures" in demand_profiles[name] for name in demand_profiles):
+        # cop per time step, split into the design cop of the heat pump and weights of the electricity costs
+        with stage("page 3: prepare cop profiles"):
+            cop_profiles = [np.broadcast_to(get_cop_profile(name, exergetic_efficiency, cop_map), len(frame))
+                            for name, frame in zip(demand_profiles, demand_frames)]
+            cop, cop_weights = calculate_cop_weights(demand, stack_profiles(cop_profiles, demand.shape[1]))
+        st.info(f"Profiles with time-varying temperatures use the cop of every time step; the heat pump is sized "
+                f"for the highest electricity demand (design cop {', '.join(str(round(c, 2)) for c in cop)}).")
+    else:
+        cop, cop_weights = calculate_cop(T_l, T_h, exergetic_efficiency, cop_map), None
+    if profile_type == "Constant electricity price":
+        # a constant price is a price series of ones multiplied with the price
+        p_el = np.ones(demand.shape[1])
+    else:
+        # join prices and demand on the time of the year (demand profiles are moved to the selected price year)
+        p_el = align_series(p_el_profiles.index, p_el_profiles.to_numpy() / 1000, first_profile["datetime"], year_sel)
 
-        total_cost_hp = heat_demand["electricity_costs"].sum()
-        electric_capacity_hp = 1/cop
-        f = calculate_annuity_factor(interest_rate, lifetime)
-        allowable_costs = (total_cost_alternative - total_cost_hp) / electric_capacity_hp * f
-        new_profile_name = profile_name + " " + str(int(T_l)) + "->" + str(int(T_h))
-        total_costs.loc[new_profile_name,'Allowable costs in EUR/kW'] = allowable_costs
+    # the saved profiles never change, so their names (and the cop model for time-varying cop) and the price series
+    # identify the inputs
+    profile_keys = tuple((name, float(exergetic_efficiency), cop_map) if "temperatures" in demand_profiles[name]
+                         else name for name in demand_profiles)
+    series_key = "constant" if profile_type == "Constant electricity price" else (ctr_sel, year_sel)
 
-        # st.text(f"COP: {cop}")
-        # st.text(f"Cost alternative: {total_cost_alternative}")
-        # st.text(f"Cost heat pump: {total_cost_hp}")
-        # st.text(f"Annualization factor: {f}")
-        # st.text(f"Allowable cost: {allowable_costs}")
+    # the allowable costs are sums over the year and fast on the full year, the representative days only pay off for
+    # the price threshold and the capacity sizing (and are clustered once per profiles, prices and number of days)
+    use_representative_days = (profile_type != "Constant electricity price" and n_representative_days > 0
+                               and (strategy == profitable_only or show_threshold_sweep or show_sizing))
+    if use_representative_days:
+        aggregation = get_representative_days((profile_keys, series_key), demand, p_el, n_representative_days,
+                                              int(round(24 / delta_t)), cop_weights)
+        demand_eval, p_el_eval, weights = aggregation["demand"], aggregation["p_el"], aggregation["weights"]
+        cop_weights_eval = aggregation.get("cop_weights")
+        heat_error, cost_bound = energy_error_bounds(aggregation, demand, p_el, delta_t, cop_weights)
+        error_bound = allowable_investment_error_bound(heat_error, cost_bound, cop, p_th, interest_rate, lifetime,
+                                                       p_el_f)
+        st.info(f"Price threshold and capacity sizing are calculated on {n_representative_days} representative days. "
+                f"Running whenever there is heat demand, the allowable costs differ by at most "
+                f"{round(np.nanmax(error_bound), 0)} EUR/kW from the calculation on the full year.")
+    else:
+        demand_eval, p_el_eval, weights, cop_weights_eval = demand, p_el, None, cop_weights
 
+    if profile_type == scenario_type:
+        # every scenario is evaluated with the heat pump running whenever there is heat demand
+        price_params, residual_model, _ = load_price_parameters(ctr_sel, year_sel)
+        scaling_factors = {"trend": 1.0, "weekly_factor": 1.0, "hourly_factor": 1.0, "overall_factor": 1.0}
+        price_chunks = (chunk / 1000 for chunk in iter_price_scenarios(price_params, residual_model, n_scenarios,
+                                                                      p_el_profiles.mean(), scaling_factors, year_sel,
+                                                                      seed=0))
+        hour_index = alignment_index(first_profile["datetime"], np.datetime64(f"{year_sel}-01-01"),
+                                     np.timedelta64(1, "h"), year_sel)
+        scenario_costs = calculate_allowable_investment_scenarios(demand, price_chunks, cop, p_th, interest_rate,
+                                                                  lifetime, p_el_f, delta_t, hour_index, cop_weights)
+        allowable_costs = summarise_percentiles(scenario_costs, (10, 50, 90))
+    elif strategy == always_on:
+        # only the sums go through the time steps, all other inputs are applied in constant time
+        heat, electricity_costs = cached_sufficient_statistics(demand, p_el, st.session_state['sufficient_statistics'],
+                                                               profile_keys, [series_key], delta_t,
+                                                               cop_weights=cop_weights)
+        allowable_costs = calculate_allowable_investment_from_statistics(heat, electricity_costs, cop, p_th,
+                                                                         interest_rate, lifetime, p_el_f)
+    elif strategy == storage_strategy:
+        # storage dispatch needs the chronological full year, with time-varying cop on the weighted prices
+        dispatch_prices = np.broadcast_to(p_el, demand.shape) if cop_weights is None else p_el * cop_weights
+        if dispatch_mode == "Heuristic (fast)" and cop_weights is None:
+            heat_output = dispatch_storage_greedy(demand, p_el, storage_capacity, charge_power, loss_rate, hp_capacity,
+                                                  delta_t)
+        elif dispatch_mode == "Heuristic (fast)":
+            heat_output = np.vstack([dispatch_storage_greedy(d, p, storage_capacity, charge_power, loss_rate,
+                                                             hp_capacity, delta_t)
+                                     for d, p in zip(demand, dispatch_prices)])
+        else:
+            heat_output = np.vstack([dispatch_storage_lp(d, p, storage_capacity, charge_power, loss_rate,
+                                                         hp_capacity, delta_t) for d, p in zip(demand, dispatch_prices)])
+        allowable_costs = calculate_allowable_investment_storage(demand, heat_output, p_el, cop, p_th, interest_rate,
+                                                                 lifetime, p_el_f, hp_capacity, delta_t,
+                                                                 cop_weights)[:, None]
+        st.info("With thermal storage the allowable costs per kW_el of the heat pump have to cover heat pump and "
+                "storage.")
+    if strategy == profitable_only or show_threshold_sweep:
+        price_index = build_price_duration_index(demand_eval, p_el_eval, delta_t, weights, cop_weights_eval)
+    if strategy == profitable_only:
+        allowable_costs = calculate_allowable_investment_threshold(price_index, cop, p_th, interest_rate, lifetime,
+                                                                   p_el_f)
 
+    profile_names = [f"{name} {int(tl)}->{int(th)}" for name, tl, th in zip(demand_profiles, T_l, T_h)]
+    if profile_type == scenario_type:
+        total_costs = pd.DataFrame(allowable_costs, index=profile_names, columns=["P10", "P50", "P90"])
+        total_costs['Allowable costs in EUR/kW'] = total_costs["P50"]
+        st.markdown(f"Allowable costs in EUR/kW over {n_scenarios} synthetic price scenarios "
+                    f"(bars show the median, lines the range from P10 to P90)")
+        st.dataframe(total_costs[["P10", "P50", "P90"]].round(0))
+    else:
+        total_costs = pd.DataFrame({'Allowable costs in EUR/kW': allowable_costs[:, 0]}, index=profile_names)
 
     # st.table(total_costs.reset_index())
     # st.markdown(f"Allowable hp costs in EUR/kW: {round(allowable_costs, 1)}")
 
     # st.table(total_costs)
 
+    y_axis = alt.Y("index:N",
+                   title=None,
+                   sort=alt.EncodingSortField(field="Allowable costs in EUR/kW", order="descending"),
+                   axis=alt.Axis(labelLimit=600)
+                   )
     chart = (
         alt.Chart(total_costs.reset_index())
         .mark_bar(color="steelblue")
         .encode(
-            y=alt.Y("index:N",
-                    title=None,
-                    sort="-x",
-                    axis=alt.Axis(labelLimit=600)
-                    ),
+            y=y_axis,
             x=alt.X("Allowable costs in EUR/kW:Q", title="Allowable costs (EUR/kW)"),
         )
         .properties(
@@ -124,6 +227,60 @@ else:
             title="Allowable costs by process"
         )
     )
+    if "P10" in total_costs:
+        chart = chart + alt.Chart(total_costs.reset_index()).mark_rule(color="black").encode(
+            y=y_axis, x="P10:Q", x2="P90:Q"
+        )
+
+    with stage("page 3: render chart"):
+        st.altair_chart(chart, width='stretch')
+
+    if show_threshold_sweep:
+        # heat pump runs when the (multiplied) electricity price is at most the threshold, otherwise the alternative
+        # (with time-varying cop the threshold applies to the price weighted with design cop / cop)
+        prices = price_index["sorted_prices"] * p_el_f
+        thresholds = np.linspace(np.nanmin(prices), np.nanmax(prices), 200)
+        sweep = calculate_allowable_investment_threshold(price_index, cop, p_th, interest_rate, lifetime, p_el_f,
+                                                         thresholds)[:, 0]
+        sweep = pd.DataFrame(sweep.T, columns=profile_names)
+        sweep["Threshold (EUR/MWh)"] = thresholds * 1000
+        sweep = sweep.melt(id_vars="Threshold (EUR/MWh)", var_name="Process", value_name="Allowable costs (EUR/kW)")
+        threshold_chart = (
+            alt.Chart(sweep)
+            .mark_line()
+            .encode(
+                x=alt.X("Threshold (EUR/MWh):Q", title="Electricity price threshold (EUR/MWh)"),
+                y=alt.Y("Allowable costs (EUR/kW):Q", title="Allowable costs (EUR/kW)"),
+                color="Process:N",
+            )
+            .properties(title="Allowable costs by switching threshold")
+        )
+        with stage("page 3: render chart"):
+            st.altair_chart(threshold_chart, width='stretch')
 
-    st.altair_chart(chart, width='stretch')
+    if show_sizing:
+        # heat pump with capacity x (fraction of peak demand) covers min(demand, x) whenever there is demand
+        load_index = build_load_duration_index(demand_eval, p_el_eval, delta_t, weights, cop_weights_eval)
+        sizing = calculate_capacity_sweep(load_index, cop, p_th, interest_rate, lifetime, p_el_f)
+        optimum = optimal_capacity(sizing, cop, specific_cost)
+        st.markdown(f"**Capacity sizing** for a specific investment cost of {specific_cost} EUR/kWel "
+                    f"(heat pump runs whenever there is heat demand)")
+        st.dataframe(pd.DataFrame({
+            "Optimal capacity (% of peak demand)": optimum["capacity"][:, 0] * 100,
+            "Covered heat demand (%)": optimum["covered_heat_fraction"][:, 0] * 100,
+            "Allowable costs at optimum (EUR/kW)": optimum["allowable_investment"][:, 0],
+            "Net present value (EUR per kW peak heat demand)": optimum["net_present_value"][:, 0],
+        }, index=profile_names).round(1))
 
+        sizing_data = pd.concat([pd.DataFrame({
+            "Capacity (% of peak demand)": sizing["capacity"] * 100,
+            "Allowable costs (EUR/kW)": sizing["allowable_investment"][i, 0],
+            "Covered heat demand (%)": sizing["covered_heat_fraction"][i] * 100,
+            "Process": name,
+        }) for i, name in enumerate(profile_names)])
+        base = alt.Chart(sizing_data).encode(x=alt.X("Capacity (% of peak demand):Q"), color="Process:N")
+        with stage("page 3: render chart"):
+            st.altair_chart(base.mark_line().encode(y="Allowable costs (EUR/kW):Q").properties(
+                title="Allowable costs by heat pump capacity"), width='stretch')
+            st.altair_chart(base.mark_line().encode(y="Covered heat demand (%):Q").properties(
+                title="Covered heat demand by heat pump capacity"), width='stretch')
@@ -1,9 +1,10 @@
 import streamlit as st
 import altair as alt
-from src import manage_cash
-from src.cash_management import save_demand_profile
+from src.cash_management import manage_cash, save_demand_profile
+from src.instrumentation import stage
+from src.plotting import downsample_frame
 from src.demand_profile_generation import *
-import os
+from src.temperature_profiles import align_temperature_profiles, seasonal_temperature_profile
 
 manage_cash()
 
@@ -16,6 +17,20 @@ st.markdown("**Application**")
 T_l = st.number_input("Temperature of heat source in Celsius", value=30.0, min_value=-20.0, max_value=150.0, step=0.5)
 T_h = st.number_input("Temperature of heat sink in Celsius", value=90.0, min_value=0.0, max_value=250.0, step=0.5)
 
+seasonal_source = "Seasonal heat source (e.g. ambient air, river water)"
+uploaded_temperatures = "Upload temperature time series (csv)"
+temperature_type = st.selectbox("Temperatures over the year", ["Constant", seasonal_source, uploaded_temperatures])
+if temperature_type == seasonal_source:
+    st.markdown("The temperature of the heat source above is the annual mean.")
+    amplitude = st.number_input("Seasonal amplitude of heat source temperature in K", value=8.0, min_value=0.0,
+                                max_value=50.0, step=0.5)
+    coldest_day = st.number_input("Coldest day of the year (0 = January 1)", value=15, min_value=0, max_value=365)
+    daily_amplitude = st.number_input("Daily amplitude of heat source temperature in K", value=0.0, min_value=0.0,
+                                      max_value=30.0, step=0.5)
+elif temperature_type == uploaded_temperatures:
+    temperature_file = st.file_uploader("csv with columns datetime, T_l (heat source) and T_h (heat sink) in Celsius",
+                                        type="csv")
+
 profile_type = st.selectbox("", ["Use pre-generated demand profiles", "Create new demand profile"])
 
 if profile_type == "Create new demand profile":
@@ -70,41 +85,52 @@ if profile_type == "Create new demand profile":
             hour_off = st.number_input("Time of day when process stops (enter hour 0-24h)", min_value=0.0, max_value=24.0, step=0.25, value=24.0)
 
     # Generate process
-    df = generate_demand_profile_template(weekend_different, weekend_scale)
-
     if process_type == "Batch process":
-        df.loc[:, 'demand'] = generate_batch_process(hour_on, hour_off, length_on, length_off)
+        daily_pattern = daily_batch_pattern(hour_on, hour_off, length_on, length_off)
 
     elif process_type == "Continuous process":
-        df.loc[:, 'demand'] = generate_continuous_process(heat_demand["demand"].to_list())
+        daily_pattern = daily_continuous_pattern(heat_demand["demand"].to_list())
 
-    df['demand'] = df['demand'] * df['scaled_process']
+    compact_profile = CompactDemandProfile(daily_pattern, weekend_scale=weekend_scale / 100 if weekend_different else 1.0)
+    df = compact_profile.to_dataframe()
 
 else:
     st.markdown("Heat demand profiles are taken from https://www.semanticscholar.org/paper/Generation-of-industrial-electricity-and-heat-for-Sandhaas/f985f8986d241d2d8f856f84367e90135c7c3f92  \n"
                 "The data is available in a github repository https://github.com/asandhaa/ElectricalAndHeatProfiles/tree/main.")
     df = generate_demand_profile_template(False, 1)
+    compact_profile = None
 
-    processes_available = [f.replace(".csv", "") for f in os.listdir("data/industrial_heat_demand_profiles")
-                      if f.endswith(".csv")]
+    processes_available = available_industries()
 
     selected_process = st.selectbox("Select process", processes_available)
-    profile = pd.read_csv(f"data/industrial_heat_demand_profiles/{selected_process}.csv",
-                            index_col=0, header=[0,1,2,3])
-    profile.columns = profile.columns.droplevel([1,2,3])
-    # st.text(profile.index.weekday)
-
-    temperature_level_selected = st.selectbox("Select temperature level", profile.columns)
-    profile = profile[temperature_level_selected]
-    profile_max = profile.max()
-    profile_norm = profile / profile_max
-    profile_extended = profile_norm.to_list() + [profile_norm[-1]]
-    df['demand'] = profile_extended[0:len(df)]
 
+    temperature_level_selected = st.selectbox("Select temperature level", available_temperature_levels(selected_process))
+    profile_norm = load_industrial_demand_profile(selected_process, temperature_level_selected)
+    df['demand'] = profile_norm[0:len(df)].astype(float)
+
+
+temperatures = None
+if temperature_type == seasonal_source:
+    temperatures = pd.DataFrame({"datetime": df["datetime"],
+                                 "T_l": seasonal_temperature_profile(df["datetime"], T_l, amplitude, coldest_day,
+                                                                     daily_amplitude),
+                                 "T_h": T_h})
+elif temperature_type == uploaded_temperatures and temperature_file is not None:
+    try:
+        temperatures = align_temperature_profiles(pd.read_csv(temperature_file), df["datetime"])
+        T_l, T_h = temperatures["T_l"].mean(), temperatures["T_h"].mean()
+    except ValueError as e:
+        st.error(f"The temperature file cannot be used: {e}")
+if temperatures is not None:
+    st.info(f"Heat source between {round(temperatures['T_l'].min(), 1)} and {round(temperatures['T_l'].max(), 1)} "
+            f"Celsius, heat sink between {round(temperatures['T_h'].min(), 1)} and "
+            f"{round(temperatures['T_h'].max(), 1)} Celsius.")
 
 # Plot only...
-plotting_options = st.selectbox("Plot...", ["Full week", "Weekend", "Weekday"])
-if plotting_options == "Full week":
+plotting_options = st.selectbox("Plot...", ["Full week", "Weekend", "Weekday", "Full year"])
+if plotting_options == "Full year":
+    first, last = df['datetime'].iloc[0], df['datetime'].iloc[-1]
+elif plotting_options == "Full week":
     first = df.loc[df['datetime'].dt.weekday == 0, 'datetime'].iloc[0].normalize()
     last = first + pd.Timedelta(days=6, hours=23, minutes=45)
 elif plotting_options == "Weekend":
@@ -114,7 +140,16 @@ elif plotting_options == "Weekday":
     first = df.loc[df['datetime'].dt.weekday == 1, 'datetime'].iloc[0].normalize()
     last = first + pd.Timedelta(days=0, hours=23, minutes=45)
 
-df_plot = df[(df['datetime'] >= first) & (df['datetime'] <= last)]
+# zoom in with the time range: the chart only gets the lowest and highest demand per pixel, a short time range shows
+# the full resolution
+start, end = st.slider(
+    "Select time range",
+    min_value=first.to_pydatetime(),
+    max_value=last.to_pydatetime(),
+    value=(first.to_pydatetime(), last.to_pydatetime()),
+    step=pd.Timedelta(minutes=15).to_pytimedelta(),
+)
+df_plot = downsample_frame(df, "datetime", "demand", start, end)
 
 
 y_limits = (0, 1.1)
@@ -129,7 +164,8 @@ line = (
 
 chart = (line).properties(
     height=400, width=700
-).interactive()
+)
 
-st.altair_chart(chart, width='stretch')
-save_demand_profile(T_h, T_l, df)
\ No newline at end of file
+with stage("page 4: render chart"):
+    st.altair_chart(chart, width='stretch')
+save_demand_profile(T_h, T_l, df, compact_profile, temperatures)
\ No newline at end of file
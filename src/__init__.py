@@ -1 +0,0 @@
-from .cash_management import manage_cash
\ No newline at end of file
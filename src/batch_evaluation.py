@@ -0,0 +1,326 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .carnot_hp_calculations import calculate_annuity_factor
+from .instrumentation import instrumented
+
+# Number of (profile, price series) pairs kept by cached_sufficient_statistics
+MAX_CACHED_STATISTICS = 4096
+
+
+def stack_profiles(profiles: list, length: int = None) -> np.ndarray:
+    """
+    Stacks a list of equally spaced time series into a 2-D array (one row per series)
+
+    :param list profiles: list of 1-D arrays (or lists/Series)
+    :param int length: number of time steps to keep, defaults to the shortest series
+    :return: array with shape (number of series, length)
+    """
+    profiles = [np.asarray(p, dtype=float) for p in profiles]
+    if length is None:
+        length = min(len(p) for p in profiles)
+    if any(len(p) < length for p in profiles):
+        raise ValueError(f"All series need at least {length} time steps")
+    return np.vstack([p[:length] for p in profiles])
+
+
+@instrumented()
+def calculate_sufficient_statistics(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    delta_t: float = 0.25,
+    weights: ArrayLike = None,
+    cop_weights: ArrayLike = None,
+) -> tuple:
+    """
+    Reduces demand profiles and price series to the sums the allowable investment depends on
+
+    The allowable investment is linear in the annual heat demand H = sum(d) dt and the electricity costs
+    C = sum(d p_el) dt, so all other parameters can be changed without going through the time steps again.
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: electricity prices in [currency]/kWh with shape (n_series, n_steps), missing values are
+        treated as zero costs
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike weights: number of times each time step occurs in the year, e.g. for representative days (see
+        time_series_aggregation.aggregate_representative_days), by default every time step occurs once
+    :param ArrayLike cop_weights: weights of the electricity costs per time step for a cop that varies over the year
+        with shape (n_profiles, n_steps), see carnot_hp_calculations.calculate_cop_weights
+    :return: H with shape (n_profiles,), C with shape (n_profiles, n_series)
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    p_el = np.nan_to_num(np.atleast_2d(np.asarray(p_el, dtype=float)))
+    if demand.shape[1] != p_el.shape[1]:
+        raise ValueError(
+            f"Demand profiles ({demand.shape[1]} steps) and price series ({p_el.shape[1]} steps) "
+            f"need the same number of time steps"
+        )
+    if weights is not None:
+        demand = demand * np.asarray(weights, dtype=float)
+    electricity = (
+        demand if cop_weights is None else demand * np.asarray(cop_weights, dtype=float)
+    )
+    return demand.sum(axis=1) * delta_t, electricity @ p_el.T * delta_t
+
+
+def cached_sufficient_statistics(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    cache: dict,
+    profile_keys: list,
+    series_keys: list,
+    delta_t: float = 0.25,
+    weights: ArrayLike = None,
+    cop_weights: ArrayLike = None,
+    max_entries: int = MAX_CACHED_STATISTICS,
+) -> tuple:
+    """
+    Same as calculate_sufficient_statistics, but looks up the statistics of every (profile, price series) pair in a
+    cache. Only pairs that are not in the cache yet are calculated, the least recently used pairs are dropped when the
+    cache holds more than max_entries pairs.
+
+    The keys are given by the caller and have to be cheap to build (e.g. the name of a saved profile, country and year
+    of a price series), they have to change whenever the series, the time step, the weights or the cop weights change.
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: electricity prices in [currency]/kWh with shape (n_series, n_steps)
+    :param dict cache: dictionary holding the statistics (e.g. in the streamlit session state), updated in place
+    :param list profile_keys: hashable key per profile
+    :param list series_keys: hashable key per price series
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike weights: number of times each time step occurs in the year
+    :param ArrayLike cop_weights: weights of the electricity costs per time step with shape (n_profiles, n_steps)
+    :param int max_entries: maximal number of (profile, price series) pairs in the cache
+    :return: H with shape (n_profiles,), C with shape (n_profiles, n_series)
+    """
+    missing = [
+        (i, j)
+        for i, pk in enumerate(profile_keys)
+        for j, sk in enumerate(series_keys)
+        if (pk, sk) not in cache
+    ]
+    if missing:
+        demand = np.atleast_2d(np.asarray(demand, dtype=float))
+        p_el = np.atleast_2d(np.asarray(p_el, dtype=float))
+        rows = sorted({i for i, _ in missing})
+        columns = sorted({j for _, j in missing})
+        heat, electricity_costs = calculate_sufficient_statistics(
+            demand[rows],
+            p_el[columns],
+            delta_t,
+            weights,
+            None if cop_weights is None else np.atleast_2d(cop_weights)[rows],
+        )
+        for a, i in enumerate(rows):
+            for b, j in enumerate(columns):
+                cache[profile_keys[i], series_keys[j]] = (
+                    heat[a],
+                    electricity_costs[a, b],
+                )
+
+    entries = {}
+    for pk in profile_keys:
+        for sk in series_keys:
+            # move to the end, the first entry is the least recently used
+            entries[pk, sk] = cache[pk, sk] = cache.pop((pk, sk))
+    while len(cache) > max_entries:
+        del cache[next(iter(cache))]
+
+    heat = np.array([entries[pk, series_keys[0]][0] for pk in profile_keys])
+    electricity_costs = np.array(
+        [[entries[pk, sk][1] for sk in series_keys] for pk in profile_keys]
+    )
+    return heat, electricity_costs
+
+
+def calculate_allowable_investment_from_statistics(
+    heat: ArrayLike,
+    electricity_costs: ArrayLike,
+    cop: ArrayLike,
+    p_th: ArrayLike,
+    r: ArrayLike,
+    t: ArrayLike,
+    p_el_f: ArrayLike = 1,
+) -> np.ndarray:
+    """
+    Calculates the allowable investment per kW_el from the sufficient statistics (see calculate_sufficient_statistics)
+
+    :param ArrayLike heat: annual heat demand per profile with shape (n_profiles,)
+    :param ArrayLike electricity_costs: annual electricity costs with shape (n_profiles, n_series)
+    :param ArrayLike cop: cop of heat pump per profile, shape (n_profiles,) or (n_profiles, *parameter_shape)
+    :param ArrayLike p_th: cost of alternative heat generation in [currency]/kWh (broadcast to parameter_shape)
+    :param ArrayLike r: interest rate (decimal, broadcast to parameter_shape)
+    :param ArrayLike t: lifetime in years (broadcast to parameter_shape)
+    :param ArrayLike p_el_f: multiplier for the electricity prices (broadcast to parameter_shape)
+    :return: allowable investment costs in [currency]/kW_el with shape (n_profiles, n_series, *parameter_shape)
+    """
+    heat = np.asarray(heat, dtype=float)
+    electricity_costs = np.asarray(electricity_costs, dtype=float)
+    cop = np.asarray(cop, dtype=float)
+    if cop.ndim == 0:
+        cop = np.broadcast_to(cop, heat.shape)
+    parameter_shape = np.broadcast_shapes(
+        cop.shape[1:], np.shape(p_th), np.shape(r), np.shape(t), np.shape(p_el_f)
+    )
+    n = len(parameter_shape)
+    heat = heat.reshape(-1, 1, *[1] * n)
+    electricity_costs = electricity_costs.reshape(*electricity_costs.shape, *[1] * n)
+    cop = cop.reshape(cop.shape[0], 1, *[1] * (n + 1 - cop.ndim), *cop.shape[1:])
+
+    f = calculate_annuity_factor(r, t)
+    return (heat * np.asarray(p_th) * cop - electricity_costs * np.asarray(p_el_f)) * f
+
+
+@instrumented()
+def calculate_allowable_investment_batch(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    cop: ArrayLike,
+    p_th: ArrayLike,
+    r: ArrayLike,
+    t: ArrayLike,
+    p_el_f: ArrayLike = 1,
+    delta_t: float = 0.25,
+    weights: ArrayLike = None,
+    cop_weights: ArrayLike = None,
+) -> np.ndarray:
+    """
+    Calculates the allowable investment per kW_el for all combinations of demand profiles, price series and
+    parameters in one pass
+
+    Demand profiles are normalized to a peak of 1, so the heat pump has an electric capacity of 1/cop (same as on the
+    page 'Allowable investment cost (specific)'). The energy costs are reduced with one matrix product, all scalar
+    parameters are broadcast on top of it. For a cop that varies over the year pass the design cop as cop and the
+    cop_weights (see carnot_hp_calculations.calculate_cop_weights).
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: electricity prices in [currency]/kWh with shape (n_series, n_steps), missing values are
+        treated as zero costs
+    :param ArrayLike cop: cop of heat pump per profile, shape (n_profiles,) or (n_profiles, *parameter_shape)
+    :param ArrayLike p_th: cost of alternative heat generation in [currency]/kWh (broadcast to parameter_shape)
+    :param ArrayLike r: interest rate (decimal, broadcast to parameter_shape)
+    :param ArrayLike t: lifetime in years (broadcast to parameter_shape)
+    :param ArrayLike p_el_f: multiplier for the electricity prices (broadcast to parameter_shape)
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike weights: number of times each time step occurs in the year, e.g. for representative days (see
+        time_series_aggregation.aggregate_representative_days), by default every time step occurs once
+    :param ArrayLike cop_weights: weights of the electricity costs per time step with shape (n_profiles, n_steps)
+    :return: allowable investment costs in [currency]/kW_el with shape (n_profiles, n_series, *parameter_shape)
+    """
+    heat, electricity_costs = calculate_sufficient_statistics(
+        demand, p_el, delta_t, weights, cop_weights
+    )
+    return calculate_allowable_investment_from_statistics(
+        heat, electricity_costs, cop, p_th, r, t, p_el_f
+    )
+
+
+def aggregate_to_hourly_energy(
+    demand: ArrayLike,
+    delta_t: float = 0.25,
+    hour_index: ArrayLike = None,
+    n_hours: int = None,
+) -> np.ndarray:
+    """
+    Sums demand profiles to hourly energy (prices that are constant within an hour only need the hourly energy)
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike hour_index: hour of the price series for every time step (see time_alignment.alignment_index),
+        by default consecutive blocks of 1/delta_t time steps form one hour
+    :param int n_hours: number of hours of the price series (only used with hour_index)
+    :return: hourly energy with shape (n_profiles, n_hours)
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    if hour_index is not None:
+        hour_index = np.asarray(hour_index)
+        inside = (
+            (hour_index >= 0)
+            if n_hours is None
+            else (hour_index >= 0) & (hour_index < n_hours)
+        )
+        n_hours = hour_index.max() + 1 if n_hours is None else n_hours
+        return np.vstack(
+            [
+                np.bincount(
+                    hour_index[inside], weights=row[inside] * delta_t, minlength=n_hours
+                )
+                for row in demand
+            ]
+        )
+
+    steps_per_hour = int(round(1 / delta_t))
+    if demand.shape[1] % steps_per_hour:
+        raise ValueError("Demand profiles need to cover full hours")
+    return demand.reshape(demand.shape[0], -1, steps_per_hour).sum(axis=2) * delta_t
+
+
+@instrumented()
+def calculate_allowable_investment_scenarios(
+    demand: ArrayLike,
+    price_chunks,
+    cop: ArrayLike,
+    p_th: ArrayLike,
+    r: ArrayLike,
+    t: ArrayLike,
+    p_el_f: ArrayLike = 1,
+    delta_t: float = 0.25,
+    hour_index: ArrayLike = None,
+    cop_weights: ArrayLike = None,
+) -> np.ndarray:
+    """
+    Calculates the allowable investment per kW_el for many hourly price scenarios that are streamed in chunks
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param price_chunks: iterable of hourly electricity prices in [currency]/kWh, each with shape
+        (scenarios in chunk, n_hours)
+    :param ArrayLike cop: cop of heat pump per profile (see calculate_allowable_investment_batch)
+    :param ArrayLike p_th: cost of alternative heat generation in [currency]/kWh
+    :param ArrayLike r: interest rate (decimal)
+    :param ArrayLike t: lifetime in years
+    :param ArrayLike p_el_f: multiplier for the electricity prices
+    :param float delta_t: length of a time step of the demand profiles in hours
+    :param ArrayLike hour_index: hour of the price scenarios for every time step of the demand profiles, by default
+        the demand profiles start at the first hour of the scenarios
+    :param ArrayLike cop_weights: weights of the electricity costs per time step with shape (n_profiles, n_steps)
+    :return: allowable investment costs in [currency]/kW_el with shape (n_profiles, n_scenarios, *parameter_shape)
+    """
+    results = []
+    energy = None
+    for chunk in price_chunks:
+        if energy is None:
+            hourly_heat = aggregate_to_hourly_energy(
+                demand, delta_t, hour_index, chunk.shape[1]
+            )
+            heat = hourly_heat.sum(axis=1)
+            energy = (
+                hourly_heat
+                if cop_weights is None
+                else aggregate_to_hourly_energy(
+                    np.asarray(demand, dtype=float) * cop_weights,
+                    delta_t,
+                    hour_index,
+                    chunk.shape[1],
+                )
+            )
+        electricity_costs = energy @ np.nan_to_num(chunk[:, : energy.shape[1]]).T
+        results.append(
+            calculate_allowable_investment_from_statistics(
+                heat, electricity_costs, cop, p_th, r, t, p_el_f
+            )
+        )
+    return np.concatenate(results, axis=1)
+
+
+def summarise_percentiles(
+    values: ArrayLike, percentiles: tuple = (10, 50, 90), axis: int = 1
+) -> np.ndarray:
+    """
+    Calculates percentiles over the scenario axis
+
+    :param ArrayLike values: results, e.g. from calculate_allowable_investment_scenarios
+    :param tuple percentiles: percentiles to calculate (0-100)
+    :param int axis: scenario axis
+    :return: array with the percentiles on the last axis
+    """
+    return np.moveaxis(np.nanpercentile(values, percentiles, axis=axis), 0, -1)
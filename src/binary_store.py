@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+CACHE_PATH = "data/.cache"
+# Version 2: price stores hold statistics per year in their meta data
+STORE_VERSION = 2
+
+
+def source_signature(path: str) -> dict:
+    """
+    Returns a cheap signature of a source file that changes whenever the file is modified
+
+    :param str path: path to source file
+    :return: dictionary with size and modification time of the file
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_store_valid(store_path: str, sources: list) -> bool:
+    """
+    Checks if a binary store exists and was built from the current version of its source files
+
+    :param str store_path: directory of the store
+    :param list sources: paths of the source files the store was built from
+    :return: True if the store can be used
+    """
+    try:
+        with open(os.path.join(store_path, "meta.json")) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    if meta.get("version") != STORE_VERSION:
+        return False
+    try:
+        return meta["sources"] == {
+            os.path.basename(s): source_signature(s) for s in sources
+        }
+    except FileNotFoundError:
+        return False
+
+
+def _store_meta(arrays: list, sources: list, meta: dict = None) -> dict:
+    return {
+        "version": STORE_VERSION,
+        "sources": {os.path.basename(s): source_signature(s) for s in sources},
+        "arrays": arrays,
+        "meta": meta if meta is not None else {},
+    }
+
+
+def publish_store(build_path: str, store_path: str) -> None:
+    """
+    Moves a finished build directory (see begin_store) to the path of the store, replacing the old store
+
+    A directory cannot be replaced in one step, so the old store is first moved aside under a unique name. If another
+    process publishes the same store at the same time, one of the (equivalent) builds is discarded.
+
+    :param str build_path: directory of the finished build (see begin_store)
+    :param str store_path: directory of the store
+    """
+    old_path = build_path + ".old"
+    try:
+        os.rename(store_path, old_path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        # the old store is in use (e.g. memory-mapped on Windows), keep it
+        shutil.rmtree(build_path, ignore_errors=True)
+        return
+    try:
+        os.rename(build_path, store_path)
+    except OSError:
+        # another process published its build in the meantime
+        shutil.rmtree(build_path, ignore_errors=True)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def write_store(
+    store_path: str, arrays: dict, sources: list, meta: dict = None
+) -> None:
+    """
+    Writes a set of numpy arrays as .npy files plus a meta.json describing where they come from
+
+    The store is written to a temporary directory next to it and moved into place when complete, so concurrent
+    rebuilds and interrupted writes never leave a partially written store behind.
+
+    :param str store_path: directory of the store
+    :param dict arrays: arrays to store, keys are used as file names
+    :param list sources: paths of the source files the store is built from
+    :param dict meta: additional (json serializable) information to store
+    """
+    build_path = begin_store(store_path)
+    try:
+        for name, array in arrays.items():
+            np.save(
+                os.path.join(build_path, f"{name}.npy"), np.ascontiguousarray(array)
+            )
+        with open(os.path.join(build_path, "meta.json"), "w") as f:
+            json.dump(_store_meta(list(arrays.keys()), sources, meta), f)
+    except BaseException:
+        discard_store(build_path)
+        raise
+    publish_store(build_path, store_path)
+
+
+def begin_store(store_path: str) -> str:
+    """
+    Starts writing a store column by column in chunks (see append_to_store and finish_store)
+
+    Every build gets its own temporary directory next to the store, the current store stays readable until
+    finish_store replaces it.
+
+    :param str store_path: directory of the store
+    :return: directory of the build
+    """
+    store_path = os.path.normpath(store_path)
+    parent, name = os.path.split(store_path)
+    os.makedirs(parent or ".", exist_ok=True)
+    return tempfile.mkdtemp(prefix=f".{name}.", suffix=".build", dir=parent or ".")
+
+
+def append_to_store(build_path: str, arrays: dict) -> None:
+    """
+    Appends chunks to the columns of a store started with begin_store (the chunks are written to disk right away)
+
+    :param str build_path: directory of the build (see begin_store)
+    :param dict arrays: chunk per column, every column has to keep its dtype
+    """
+    for name, array in arrays.items():
+        with open(os.path.join(build_path, f"{name}.bin"), "ab") as f:
+            np.ascontiguousarray(array).tofile(f)
+
+
+def finish_store(
+    build_path: str,
+    store_path: str,
+    dtypes: dict,
+    sources: list,
+    meta: dict = None,
+    block_size: int = 1 << 24,
+) -> None:
+    """
+    Converts the columns appended with append_to_store into .npy files, writes the meta.json and replaces the store
+    with the build (see write_store)
+
+    The data is copied in blocks, so the memory does not depend on the size of the store.
+
+    :param str build_path: directory of the build (see begin_store)
+    :param str store_path: directory of the store
+    :param dict dtypes: dtype per column
+    :param list sources: paths of the source files the store is built from
+    :param dict meta: additional (json serializable) information to store
+    :param int block_size: bytes per copied block
+    """
+    try:
+        for name, dtype in dtypes.items():
+            raw_path = os.path.join(build_path, f"{name}.bin")
+            if not os.path.exists(raw_path):
+                open(raw_path, "wb").close()
+            dtype = np.dtype(dtype)
+            n = os.path.getsize(raw_path) // dtype.itemsize
+            with open(raw_path, "rb") as raw, open(
+                os.path.join(build_path, f"{name}.npy"), "wb"
+            ) as f:
+                np.lib.format.write_array_header_1_0(
+                    f,
+                    {
+                        "descr": np.lib.format.dtype_to_descr(dtype),
+                        "fortran_order": False,
+                        "shape": (n,),
+                    },
+                )
+                for block in iter(lambda: raw.read(block_size), b""):
+                    f.write(block)
+            os.remove(raw_path)
+
+        with open(os.path.join(build_path, "meta.json"), "w") as f:
+            json.dump(_store_meta(list(dtypes.keys()), sources, meta), f)
+    except BaseException:
+        discard_store(build_path)
+        raise
+    publish_store(build_path, store_path)
+
+
+def discard_store(build_path: str) -> None:
+    """
+    Removes an unfinished build (e.g. after an error while appending)
+
+    :param str build_path: directory of the build (see begin_store)
+    """
+    shutil.rmtree(build_path, ignore_errors=True)
+
+
+def read_store(store_path: str, mmap: bool = True) -> tuple:
+    """
+    Reads a binary store written by write_store
+
+    :param str store_path: directory of the store
+    :param bool mmap: memory-map the arrays instead of reading them into memory
+    :return: dictionary with arrays, dictionary with additional information
+    """
+    with open(os.path.join(store_path, "meta.json")) as f:
+        store_meta = json.load(f)
+    arrays = {
+        name: np.load(
+            os.path.join(store_path, f"{name}.npy"), mmap_mode="r" if mmap else None
+        )
+        for name in store_meta["arrays"]
+    }
+    return arrays, store_meta["meta"]
@@ -0,0 +1,182 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .carnot_hp_calculations import calculate_annuity_factor
+from .instrumentation import instrumented
+
+
+@instrumented()
+def build_load_duration_index(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    delta_t: float = 0.25,
+    weights: ArrayLike = None,
+    cop_weights: ArrayLike = None,
+) -> dict:
+    """
+    Sorts every demand profile once (load duration curve) and stores prefix sums of the demand, the prices and the
+    electricity costs in demand order
+
+    A heat pump with a capacity x (fraction of peak demand) covers min(d, x) in every time step. With the prefix sums
+    the covered heat and electricity costs for any x are one binary search away:
+    sum(min(d, x)) = sum(d <= x) + x * count(d > x), and the same with prices as weights.
+
+    :param ArrayLike demand: demand profiles normalized to a peak of 1 with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: electricity prices in [currency]/kWh with shape (n_series, n_steps), missing values are
+        treated as zero costs
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike weights: number of times each time step occurs in the year (e.g. for representative days)
+    :param ArrayLike cop_weights: weights of the electricity costs per time step for a cop that varies over the year
+        with shape (n_profiles, n_steps), see carnot_hp_calculations.calculate_cop_weights
+    :return: dictionary with the sorted demand and the prefix sums
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    p_el = np.nan_to_num(np.atleast_2d(np.asarray(p_el, dtype=float)))
+    if demand.shape[1] != p_el.shape[1]:
+        raise ValueError(
+            f"Demand profiles ({demand.shape[1]} steps) and price series ({p_el.shape[1]} steps) "
+            f"need the same number of time steps"
+        )
+    weights = (
+        np.ones(demand.shape[1])
+        if weights is None
+        else np.asarray(weights, dtype=float)
+    )
+
+    order = np.argsort(demand, axis=1, kind="stable")
+    sorted_demand = np.take_along_axis(demand, order, axis=1)
+    step_weights = weights[order] * delta_t
+    prices = p_el[:, order].transpose(1, 0, 2) * step_weights[:, None]
+    if cop_weights is not None:
+        prices = (
+            prices
+            * np.take_along_axis(
+                np.atleast_2d(np.asarray(cop_weights, dtype=float)), order, axis=1
+            )[:, None]
+        )
+
+    def prefix_sum(x):
+        return np.concatenate(
+            [np.zeros((*x.shape[:-1], 1)), np.cumsum(x, axis=-1)], axis=-1
+        )
+
+    return {
+        "sorted_demand": sorted_demand,
+        "cumulative_weights": prefix_sum(step_weights),
+        "cumulative_demand": prefix_sum(sorted_demand * step_weights),
+        "cumulative_prices": prefix_sum(prices),
+        "cumulative_costs": prefix_sum(prices * sorted_demand[:, None]),
+    }
+
+
+def capacity_statistics(index: dict, capacity: ArrayLike) -> tuple:
+    """
+    Returns the heat covered by the heat pump and its electricity costs for a range of capacities
+
+    :param dict index: result of build_load_duration_index
+    :param ArrayLike capacity: 1-D array of heat pump capacities as fraction of peak demand
+    :return: covered heat with shape (n_profiles, n_capacities), electricity costs (times cop) with shape
+        (n_profiles, n_series, n_capacities)
+    """
+    capacity = np.asarray(capacity, dtype=float)
+    position = np.stack(
+        [np.searchsorted(d, capacity, side="right") for d in index["sorted_demand"]]
+    )
+
+    def below(cumulative):
+        return np.take_along_axis(
+            cumulative,
+            np.broadcast_to(
+                position.reshape(position.shape[0], *[1] * (cumulative.ndim - 2), -1),
+                (*cumulative.shape[:-1], len(capacity)),
+            ),
+            axis=-1,
+        )
+
+    weights_above = index["cumulative_weights"][:, -1:] - below(
+        index["cumulative_weights"]
+    )
+    heat = below(index["cumulative_demand"]) + capacity * weights_above
+    prices_above = index["cumulative_prices"][..., -1:] - below(
+        index["cumulative_prices"]
+    )
+    costs = below(index["cumulative_costs"]) + capacity * prices_above
+    return heat, costs
+
+
+def calculate_capacity_sweep(
+    index: dict,
+    cop: ArrayLike,
+    p_th: float,
+    r: float,
+    t: float,
+    p_el_f: float = 1,
+    capacity: ArrayLike = None,
+) -> dict:
+    """
+    Calculates the allowable investment per kW_el and the covered share of the heat demand for heat pumps sized to a
+    fraction of the peak demand; the alternative heat provision covers the rest
+
+    The electric capacity of a heat pump with capacity x is x / cop; for an index with cop weights pass the design
+    cop (the electric capacity is then scaled with the capacity of the heat pump for the full peak demand).
+
+    :param dict index: result of build_load_duration_index
+    :param ArrayLike cop: cop of heat pump per profile with shape (n_profiles,)
+    :param float p_th: cost of alternative heat generation in [currency]/kWh
+    :param float r: interest rate (decimal)
+    :param float t: lifetime in years
+    :param float p_el_f: multiplier for the electricity prices
+    :param ArrayLike capacity: capacities as fraction of peak demand, defaults to 0 to 100 % in 1 % steps
+    :return: dictionary with 'capacity', 'covered_heat_fraction' (n_profiles, n_capacities) and
+        'allowable_investment' in [currency]/kW_el (n_profiles, n_series, n_capacities)
+    """
+    capacity = (
+        np.linspace(0, 1, 101)
+        if capacity is None
+        else np.asarray(capacity, dtype=float)
+    )
+    heat, costs = capacity_statistics(index, capacity)
+    total_heat = index["cumulative_demand"][:, -1:]
+    cop = np.asarray(cop, dtype=float).reshape(-1, 1, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        savings_per_capacity = (heat[:, None] * p_th * cop - costs * p_el_f) / capacity
+        covered_heat_fraction = heat / total_heat
+    return {
+        "capacity": capacity,
+        "covered_heat_fraction": covered_heat_fraction,
+        "allowable_investment": np.where(capacity > 0, savings_per_capacity, np.nan)
+        * calculate_annuity_factor(r, t),
+    }
+
+
+def optimal_capacity(sweep: dict, cop: ArrayLike, specific_cost: float) -> dict:
+    """
+    Finds the capacity with the highest net present value for a given specific investment cost
+
+    The net present value per kW of peak heat demand is (allowable investment - specific cost) * capacity / cop.
+
+    :param dict sweep: result of calculate_capacity_sweep
+    :param ArrayLike cop: cop of heat pump per profile with shape (n_profiles,)
+    :param float specific_cost: investment cost of the heat pump in [currency]/kW_el
+    :return: dictionary with 'capacity', 'covered_heat_fraction', 'allowable_investment' and 'net_present_value'
+        (per kW of peak heat demand) at the optimum, each with shape (n_profiles, n_series)
+    """
+    cop = np.asarray(cop, dtype=float).reshape(-1, 1, 1)
+    npv = np.nan_to_num(
+        (sweep["allowable_investment"] - specific_cost) * sweep["capacity"] / cop, nan=0
+    )
+    best = npv.argmax(axis=2)
+    n_series = npv.shape[1]
+    return {
+        "capacity": sweep["capacity"][best],
+        "covered_heat_fraction": np.take_along_axis(
+            np.repeat(sweep["covered_heat_fraction"][:, None], n_series, axis=1),
+            best[..., None],
+            axis=2,
+        )[..., 0],
+        "allowable_investment": np.take_along_axis(
+            sweep["allowable_investment"], best[..., None], axis=2
+        )[..., 0],
+        "net_present_value": np.take_along_axis(npv, best[..., None], axis=2)[..., 0],
+    }
@@ -1,52 +1,140 @@
-def calculate_cop(T_l:float, T_h:float, ex_eta:float=1) -> float:
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .cop_maps import interpolate_cop_map, load_cop_map
+
+
+def calculate_cop(T_l:ArrayLike, T_h:ArrayLike, ex_eta:ArrayLike=1, cop_map:str=None) -> np.ndarray:
     """
-    Calculates the cop of a carnot heat pump with an exergetic efficiency
+    Calculates the cop of a carnot heat pump with an exergetic efficiency, or interpolates it in a cop map
 
-    :param float T_l: Temperature of heat source in Celsius
-    :param float T_h: Temperature of heat sink in Celsius
-    :param float ex_eta: Exergetic efficiency 0<eta<1
+    All arguments can be scalars or arrays and are broadcast against each other. For T_h <= T_l (no temperature
+    lift) the cop is not defined and nan is returned.
+
+    :param ArrayLike T_l: Temperature of heat source in Celsius
+    :param ArrayLike T_h: Temperature of heat sink in Celsius
+    :param ArrayLike ex_eta: Exergetic efficiency 0<eta<1 (not used with a cop map)
+    :param str cop_map: name of a cop map in data/cop_maps (see cop_maps.available_cop_maps), by default the carnot
+        cop times the exergetic efficiency is used
     :return: cop of heat pump
     """
-    return (1 - (T_l + 273) / (T_h+ 273)) ** -1 * ex_eta
+    if cop_map is not None:
+        cop = interpolate_cop_map(load_cop_map(cop_map), T_l, T_h)
+        return np.broadcast_to(cop, np.broadcast_shapes(np.shape(cop), np.shape(ex_eta))).copy()[()]
+    T_l, T_h, ex_eta = np.broadcast_arrays(np.asarray(T_l, dtype=float), np.asarray(T_h, dtype=float),
+                                           np.asarray(ex_eta, dtype=float))
+    lift = T_h - T_l
+    valid = lift > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cop = np.where(valid, (T_h + 273) / np.where(valid, lift, 1) * ex_eta, np.nan)
+    return cop[()]
 
 
-def calculate_annuity_factor(r: float, t: float) -> float:
+def calculate_annuity_factor(r:ArrayLike, t:ArrayLike) -> np.ndarray:
     """
     Calculates the annuity factor based on lifetime and interest rate
 
-    Multiply the annualized costs with the annuity factor to get the up-front costs
+    Multiply the annualized costs with the annuity factor to get the up-front costs. Arguments are broadcast against
+    each other; for r = 0 the limit (the lifetime t) is returned.
 
-    :param float r: interest rate (decimal)
-    :param float t: lifetime in years
+    :param ArrayLike r: interest rate (decimal)
+    :param ArrayLike t: lifetime in years
     :return: annuity factor
     """
-    return (1-(1/(1+r)**t))/r
+    r, t = np.broadcast_arrays(np.asarray(r, dtype=float), np.asarray(t, dtype=float))
+    zero_rate = r == 0
+    r_safe = np.where(zero_rate, 1, r)
+    f = np.where(zero_rate, t, (1 - (1 + r_safe) ** -t) / r_safe)
+    return f[()]
+
 
-def calculate_profitable_relative_price(T_l:float, T_h:float, ex_eta:float=1) -> float:
+def calculate_profitable_relative_price(T_l:ArrayLike, T_h:ArrayLike, ex_eta:ArrayLike=1,
+                                        cop_map:str=None) -> np.ndarray:
     """
     Calculates the profitable relative price of a carnot heat pump
 
-    :param float T_l: Temperature of heat source in Celsius
-    :param float T_h: Temperature of heat sink in Celsius
-    :param float ex_eta: Exergetic efficiency 0<eta<1
+    :param ArrayLike T_l: Temperature of heat source in Celsius
+    :param ArrayLike T_h: Temperature of heat sink in Celsius
+    :param ArrayLike ex_eta: Exergetic efficiency 0<eta<1
+    :param str cop_map: name of a cop map, see calculate_cop
     :return: profitable relative price (same as cop)
     """
-    return calculate_cop(T_l, T_h, ex_eta)
+    return calculate_cop(T_l, T_h, ex_eta, cop_map)
 
-def calculate_allowable_investment_per_kw_el(T_l:float, T_h:float, h:int, p_th:float, p_el:float, r:float, t:float, ex_eta:float=1) -> float:
+
+def calculate_allowable_investment_per_kw_el(T_l:ArrayLike, T_h:ArrayLike, h:ArrayLike, p_th:ArrayLike,
+                                             p_el:ArrayLike, r:ArrayLike, t:ArrayLike,
+                                             ex_eta:ArrayLike=1, only_when_profitable:bool=False,
+                                             cop_map:str=None) -> np.ndarray:
     """
     Calculates the allowable investment per kW for a carnot heat pump
 
-    :param float T_l: Temperature of heat source in Celsius
-    :param float T_h: Temperature of heat sink in Celsius
-    :param int h: Operating hours per year
-    :param float p_th: Cost of alternative heat generation in [currency]/MWh
-    :param float p_el: Cost of electricity in [currency]/MWh
-    :param float r: interest rate (decimal)
-    :param float t: lifetime in years
-    :param float ex_eta: Exergetic efficiency 0<eta<1
+    All arguments can be scalars or arrays and are broadcast against each other, so a whole parameter screening can
+    be evaluated in one call. Combinations without temperature lift (T_h <= T_l) result in nan.
+
+    With only_when_profitable the heat pump does not run if electricity is more expensive than p_th * cop (the
+    alternative heat provision covers the demand), so the allowable investment does not become negative.
+
+    :param ArrayLike T_l: Temperature of heat source in Celsius
+    :param ArrayLike T_h: Temperature of heat sink in Celsius
+    :param ArrayLike h: Operating hours per year
+    :param ArrayLike p_th: Cost of alternative heat generation in [currency]/MWh
+    :param ArrayLike p_el: Cost of electricity in [currency]/MWh
+    :param ArrayLike r: interest rate (decimal)
+    :param ArrayLike t: lifetime in years
+    :param ArrayLike ex_eta: Exergetic efficiency 0<eta<1
+    :param bool only_when_profitable: run the heat pump only if it is cheaper than the alternative heat provision
+    :param str cop_map: name of a cop map, see calculate_cop
+    :return: allowable investment costs in [currency]/kW
+    """
+    cop = calculate_cop(T_l, T_h, ex_eta, cop_map)
+    return calculate_allowable_investment_from_cop(cop, h, p_th, p_el, r, t, only_when_profitable)
+
+
+def calculate_allowable_investment_from_cop(cop:ArrayLike, h:ArrayLike, p_th:ArrayLike, p_el:ArrayLike,
+                                            r:ArrayLike, t:ArrayLike, only_when_profitable:bool=False) -> np.ndarray:
+    """
+    Calculates the allowable investment per kW for a given cop, see calculate_allowable_investment_per_kw_el
+
+    :param ArrayLike cop: cop of heat pump
+    :param ArrayLike h: Operating hours per year
+    :param ArrayLike p_th: Cost of alternative heat generation in [currency]/MWh
+    :param ArrayLike p_el: Cost of electricity in [currency]/MWh
+    :param ArrayLike r: interest rate (decimal)
+    :param ArrayLike t: lifetime in years
+    :param bool only_when_profitable: run the heat pump only if it is cheaper than the alternative heat provision
     :return: allowable investment costs in [currency]/kW
     """
-    cop = calculate_cop(T_l, T_h, ex_eta)
     f = calculate_annuity_factor(r, t)
-    return (p_th*cop/1000 - p_el/1000) * h * f
+    savings = np.asarray(p_th) * np.asarray(cop) / 1000 - np.asarray(p_el) / 1000
+    if only_when_profitable:
+        savings = np.where(np.isnan(savings), np.nan, np.maximum(savings, 0))
+    return (savings * np.asarray(h) * f)[()]
+
+
+def calculate_cop_weights(demand:ArrayLike, cop:ArrayLike) -> tuple:
+    """
+    Splits a cop that varies over the year (time-varying source and sink temperatures) into the design cop of the
+    heat pump and a weight per time step
+
+    The electric capacity of the heat pump is the highest electricity demand max(d / cop_t) of the year, the design
+    cop is its inverse (demand normalized to a peak of 1). The electricity demand of a time step is
+    d / cop_t = d * w_t / design cop with w_t = design cop / cop_t, so every calculation for a constant cop holds with
+    the design cop and the electricity costs weighted with w_t. For a constant cop the design cop is the cop and all
+    weights are 1.
+
+    :param ArrayLike demand: demand profiles normalized to a peak of 1 with shape (n_profiles, n_steps)
+    :param ArrayLike cop: cop per profile with shape (n_profiles,) or per time step with shape (n_profiles, n_steps)
+    :return: design cop with shape (n_profiles,), weights with shape (n_profiles, n_steps)
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    cop = np.asarray(cop, dtype=float)
+    if cop.ndim < 2:
+        cop = np.broadcast_to(cop.reshape(-1, 1), demand.shape)
+    running = demand > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        electric_peak = np.max(np.where(running, demand / cop, 0), axis=1)
+        design_cop = np.where(electric_peak == 0, cop[:, 0], 1 / electric_peak)
+        # the heat pump can also run without demand (storage), only undefined cops without demand are ignored
+        weights = np.where(running | np.isfinite(cop), design_cop[:, None] / cop, 1.0)
+    return design_cop, weights
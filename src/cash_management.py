@@ -1,16 +1,124 @@
+import os
+
+import pandas as pd
 import streamlit as st
 
+from . import instrumentation, price_profile_generation, sensitivity, thermal_storage
+from .demand_profile_generation import CompactDemandProfile
+from .time_series_aggregation import aggregate_representative_days
+from .ui import show_debug_panel
+
+# Cached versions of the computational core for the streamlit pages (cache hits and misses are counted)
+fit_electricty_price_trends = instrumentation.track_cache(
+    st.cache_data, price_profile_generation.fit_electricty_price_trends
+)
+generate_electricity_price_profile = instrumentation.track_cache(
+    st.cache_data, price_profile_generation.generate_electricity_price_profile
+)
+load_electricity_price_profile = instrumentation.track_cache(
+    st.cache_data, price_profile_generation.load_electricity_price_profile
+)
+dispatch_storage_lp = instrumentation.track_cache(
+    st.cache_data, thermal_storage.dispatch_storage_lp
+)
+dispatch_storage_greedy = instrumentation.track_cache(
+    st.cache_data, thermal_storage.dispatch_storage_greedy
+)
+calculate_allowable_investment_sensitivity = instrumentation.track_cache(
+    st.cache_data, sensitivity.calculate_allowable_investment_sensitivity
+)
+
+# Number of aggregations to representative days kept per session
+MAX_REPRESENTATIVE_DAYS = 16
+
+# Set INSTRUMENTATION_LOG to a file path to write one json line per timed stage
+if os.environ.get("INSTRUMENTATION_LOG"):
+    instrumentation.configure_json_log(os.environ["INSTRUMENTATION_LOG"])
+# Set INSTRUMENTATION_TRACE_MEMORY=1 to record the peak memory of the stages (slows down the whole app)
+if os.environ.get("INSTRUMENTATION_TRACE_MEMORY") == "1":
+    instrumentation.enable_memory_tracing()
+
+
 def manage_cash():
-    if 'demand_profiles' not in st.session_state:
-        st.session_state['demand_profiles'] = {}
+    show_debug_panel()
+    if "demand_profiles" not in st.session_state:
+        st.session_state["demand_profiles"] = {}
+    if "sufficient_statistics" not in st.session_state:
+        # sums over the time steps per (profile name, price series), see batch_evaluation.cached_sufficient_statistics
+        st.session_state["sufficient_statistics"] = {}
+    if "cop_profiles" not in st.session_state:
+        # cop per time step of profiles with time-varying temperatures per (profile, efficiency, cop map), see
+        # ui.get_cop_profile
+        st.session_state["cop_profiles"] = {}
+    if "representative_days" not in st.session_state:
+        # aggregations per (profiles, price series, number of days), see get_representative_days
+        st.session_state["representative_days"] = {}
 
 
-def save_demand_profile(T_h, T_l, df):
+def save_demand_profile(T_h, T_l, df, compact_profile=None, temperatures=None):
     st.markdown("**Save heat demand profile**")
     profile_name = st.text_input("Profile name")
     if st.button("Save heat demand profile"):
-        if profile_name not in st.session_state['demand_profiles']:
-            st.session_state['demand_profiles'][profile_name] = {"T_h": T_h, "T_l":T_l, "profile": df[["datetime", "demand"]]}
+        if profile_name not in st.session_state["demand_profiles"]:
+            # Generated processes are kept as CompactDemandProfile, all others as Dataframe
+            profile = (
+                compact_profile
+                if compact_profile is not None
+                else df[["datetime", "demand"]]
+            )
+            st.session_state["demand_profiles"][profile_name] = {
+                "T_h": T_h,
+                "T_l": T_l,
+                "profile": profile,
+            }
+            if temperatures is not None:
+                # time-varying temperatures (columns datetime, T_l, T_h) on the time steps of the profile
+                st.session_state["demand_profiles"][profile_name][
+                    "temperatures"
+                ] = temperatures
             st.markdown(f"{profile_name} saved")
         else:
             st.markdown(f"{profile_name} already exists")
+
+
+def get_demand_profile_frame(profile_name) -> pd.DataFrame:
+    """
+    Returns a saved demand profile as Dataframe with columns datetime and demand
+
+    :param profile_name: name of the saved profile
+    :return: Dataframe with quarter-hourly demand
+    """
+    profile = st.session_state["demand_profiles"][profile_name]["profile"]
+    if isinstance(profile, CompactDemandProfile):
+        return profile.to_dataframe()
+    return profile
+
+
+def get_representative_days(
+    key, demand, p_el, n_days, steps_per_day, cop_weights=None
+) -> dict:
+    """
+    Returns the representative days of demand profiles and a price series (see
+    time_series_aggregation.aggregate_representative_days), clustered once per key and kept in the session state (the
+    least recently used aggregations are dropped)
+
+    :param key: hashable key of the profiles and the price series (e.g. profile names, country and year)
+    :param demand: demand profiles with shape (n_profiles, n_steps)
+    :param p_el: price series aligned to the demand profiles
+    :param n_days: number of representative days
+    :param steps_per_day: number of time steps per day
+    :param cop_weights: weights of the electricity costs per time step (for time-varying cop)
+    :return: dictionary with the reduced demand, p_el, weights and cop_weights
+    """
+    cache = st.session_state["representative_days"]
+    key = (key, int(n_days), int(steps_per_day))
+    if key in cache:
+        # move to the end, the first entry is the least recently used
+        cache[key] = cache.pop(key)
+    else:
+        cache[key] = aggregate_representative_days(
+            demand, p_el, n_days, steps_per_day, cop_weights=cop_weights
+        )
+        while len(cache) > MAX_REPRESENTATIVE_DAYS:
+            del cache[next(iter(cache))]
+    return cache[key]
@@ -0,0 +1,134 @@
+import functools
+import io
+import os
+
+import numpy as np
+
+from .carnot_hp_calculations import calculate_cop
+from .cop_maps import COP_MAP_PATH
+from .instrumentation import instrumented
+
+# Number of cop grids kept in memory (least recently used grids are dropped first)
+GRID_CACHE_SIZE = 8
+# Largest number of grid points (temperatures x efficiencies) of one grid
+MAX_GRID_POINTS = 5_000_000
+
+
+def _axis(start: float, stop: float, step: float) -> np.ndarray:
+    return start + step * np.arange(int(round((stop - start) / step)) + 1)
+
+
+@functools.lru_cache(maxsize=GRID_CACHE_SIZE)
+def _cop_grid(
+    T_source: tuple, T_sink: tuple, efficiency: tuple, cop_map: str, modified: float
+) -> dict:
+    T_l, T_h, ex_eta = _axis(*T_source), _axis(*T_sink), _axis(*efficiency)
+    if cop_map is not None:
+        # the cop map does not depend on the efficiency
+        ex_eta = ex_eta[:1]
+    if ex_eta.size * T_l.size * T_h.size > MAX_GRID_POINTS:
+        raise ValueError(
+            f"The cop grid has more than {MAX_GRID_POINTS} points, use larger steps"
+        )
+    cop = calculate_cop(T_l[:, None], T_h[None], 1, cop_map)
+    # the carnot cop is proportional to the efficiency
+    grid = {
+        "T_source": T_l,
+        "T_sink": T_h,
+        "efficiency": ex_eta,
+        "cop": (
+            (
+                np.asarray(cop, dtype=np.float32)[None]
+                * ex_eta[:, None, None].astype(np.float32)
+            )
+            if cop_map is None
+            else np.asarray(cop, dtype=np.float32)[None]
+        ),
+    }
+    for array in grid.values():
+        array.flags.writeable = False
+    return grid
+
+
+@instrumented()
+def calculate_cop_grid(
+    T_source: tuple,
+    T_sink: tuple,
+    efficiency: tuple = (0.0, 1.0, 0.05),
+    cop_map: str = None,
+) -> dict:
+    """
+    Computes the cop over a grid of source temperatures, sink temperatures and exergetic efficiencies
+
+    Grids are computed once per set of axes and cop map and kept in a cache of GRID_CACHE_SIZE grids (least recently
+    used first out), so slicing a grid for another efficiency or other prices does not recompute it. The cop is stored
+    as float32, nan without temperature lift or outside of the cop map.
+
+    :param tuple T_source: (first, last, step) of the source temperatures in Celsius
+    :param tuple T_sink: (first, last, step) of the sink temperatures in Celsius
+    :param tuple efficiency: (first, last, step) of the exergetic efficiencies (decimal), not used with a cop map
+    :param str cop_map: name of a cop map, None for the carnot cop (see carnot_hp_calculations.calculate_cop)
+    :return: dictionary with the axes 'T_source', 'T_sink', 'efficiency' and the 'cop' with shape
+        (n_efficiency, n_source, n_sink) (read-only)
+    """
+    modified = (
+        None
+        if cop_map is None
+        else os.path.getmtime(os.path.join(COP_MAP_PATH, f"{cop_map}.csv"))
+    )
+    return _cop_grid(
+        tuple(map(float, T_source)),
+        tuple(map(float, T_sink)),
+        tuple(map(float, efficiency)),
+        cop_map,
+        modified,
+    )
+
+
+def cop_grid_cache_info():
+    """
+    :return: hits, misses, maximal and current size of the cache of calculate_cop_grid
+    """
+    return _cop_grid.cache_info()
+
+
+def slice_cop_grid(grid: dict, ex_eta: float) -> np.ndarray:
+    """
+    Returns the cop of a grid for one exergetic efficiency, linearly interpolated between the efficiencies of the grid
+    (exact for the carnot cop)
+
+    :param dict grid: result of calculate_cop_grid
+    :param float ex_eta: exergetic efficiency (decimal), not used for grids of a cop map
+    :return: cop with shape (n_source, n_sink)
+    """
+    efficiency, cop = grid["efficiency"], grid["cop"]
+    if efficiency.size == 1:
+        return cop[0]
+    if not efficiency[0] <= ex_eta <= efficiency[-1]:
+        raise ValueError(
+            f"Efficiency {ex_eta} is outside of the grid ({efficiency[0]} to {efficiency[-1]})"
+        )
+    i = min(
+        int(np.searchsorted(efficiency, ex_eta, side="right")) - 1, efficiency.size - 2
+    )
+    fraction = np.float32(
+        (ex_eta - efficiency[i]) / (efficiency[i + 1] - efficiency[i])
+    )
+    return cop[i] + fraction * (cop[i + 1] - cop[i])
+
+
+def export_cop_grid(grid: dict, **slices) -> bytes:
+    """
+    Writes a cop grid and optionally slices of it (e.g. the allowable investment) as compressed npz file
+
+    :param dict grid: result of calculate_cop_grid
+    :param slices: additional arrays to store, e.g. allowable_investment=...
+    :return: content of the npz file (read with numpy.load)
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        **grid,
+        **{name: np.asarray(value, dtype=np.float32) for name, value in slices.items()},
+    )
+    return buffer.getvalue()
@@ -0,0 +1,246 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+COP_MAP_PATH = "data/cop_maps"
+# Step of the interpolation table of a cop map in Kelvin and the largest number of points of a table
+TABLE_RESOLUTION = 0.1
+MAX_TABLE_CELLS = 1 << 21
+
+
+def available_cop_maps() -> list:
+    """
+    :return: names of the cop maps in COP_MAP_PATH
+    """
+    if not os.path.isdir(COP_MAP_PATH):
+        return []
+    return sorted(
+        os.path.splitext(f)[0] for f in os.listdir(COP_MAP_PATH) if f.endswith(".csv")
+    )
+
+
+def read_cop_map(path: str) -> tuple:
+    """
+    Reads a cop map from a csv file
+
+    The first column holds the source temperatures (rows), the other column headers are the sink temperatures, both in
+    Celsius and ascending. Empty cells are operating points outside of the envelope of the heat pump.
+
+    :param str path: path of the csv file
+    :return: source temperatures (n_source,), sink temperatures (n_sink,), cop (n_source, n_sink)
+    """
+    frame = pd.read_csv(path, index_col=0)
+    T_source = frame.index.to_numpy(dtype=float)
+    T_sink = frame.columns.to_numpy(dtype=float)
+    if np.any(np.diff(T_source) <= 0) or np.any(np.diff(T_sink) <= 0):
+        raise ValueError(f"Temperatures of the cop map {path} need to be ascending")
+    return T_source, T_sink, frame.to_numpy(dtype=float)
+
+
+def write_cop_map(
+    path: str, T_source: ArrayLike, T_sink: ArrayLike, cop: ArrayLike
+) -> None:
+    """
+    Writes a cop map in the format of read_cop_map
+
+    :param str path: path of the csv file
+    :param ArrayLike T_source: source temperatures in Celsius (n_source,)
+    :param ArrayLike T_sink: sink temperatures in Celsius (n_sink,)
+    :param ArrayLike cop: cop with shape (n_source, n_sink), nan outside of the envelope
+    """
+    frame = pd.DataFrame(
+        np.asarray(cop, dtype=float),
+        index=pd.Index(np.asarray(T_source, dtype=float), name="T_source"),
+        columns=np.asarray(T_sink, dtype=float),
+    )
+    frame.round(3).to_csv(path)
+
+
+def _axis(values: np.ndarray) -> dict:
+    steps = np.diff(values)
+    return {
+        "values": values,
+        "start": values[0],
+        "inverse_step": 1 / steps[0],
+        "uniform": bool(np.allclose(steps, steps[0], rtol=1e-9, atol=0)),
+    }
+
+
+def _table_axis(values: np.ndarray, resolution: float) -> dict:
+    n_steps = max(int(round((values[-1] - values[0]) / resolution)), 1)
+    inverse_step = n_steps / (values[-1] - values[0])
+    return {
+        "values": np.linspace(values[0], values[-1], n_steps + 1),
+        # offset of the index of the closest point, the table has a border of nan on both sides
+        "offset": 1.5 - values[0] * inverse_step,
+        "inverse_step": inverse_step,
+        "last": n_steps + 2,
+    }
+
+
+@functools.lru_cache(maxsize=4)
+def _load_cop_map(path: str, modified: float, resolution: float) -> dict:
+    T_source, T_sink, cop = read_cop_map(path)
+    cop.flags.writeable = False
+    cop_map = {"T_source": _axis(T_source), "T_sink": _axis(T_sink), "cop": cop}
+    # coarser table if the fine one would not fit into MAX_TABLE_CELLS
+    area = (T_source[-1] - T_source[0]) * (T_sink[-1] - T_sink[0])
+    resolution = max(resolution, np.sqrt(area / MAX_TABLE_CELLS))
+    source, sink = _table_axis(T_source, resolution), _table_axis(T_sink, resolution)
+    table = np.pad(
+        _interpolate_bilinear(cop_map, source["values"][:, None], sink["values"][None]),
+        1,
+        constant_values=np.nan,
+    )
+    table.flags.writeable = False
+    cop_map["table"] = {"T_source": source, "T_sink": sink, "cop": table.ravel()}
+    return cop_map
+
+
+def load_cop_map(name: str, resolution: float = TABLE_RESOLUTION) -> dict:
+    """
+    Loads a cop map and prepares it for interpolation (cached until the file changes)
+
+    The map is interpolated bilinearly once on a dense uniform table, so that looking up a cop is an index computation
+    and a gather (see interpolate_cop_map).
+
+    :param str name: name of the cop map (see available_cop_maps)
+    :param float resolution: step of the table in Kelvin (coarser for maps with very large temperature ranges)
+    :return: dictionary with the temperature axes, the cop grid and the table
+    """
+    path = os.path.join(COP_MAP_PATH, f"{name}.csv")
+    return _load_cop_map(path, os.path.getmtime(path), resolution)
+
+
+def _position(axis: dict, x: np.ndarray) -> tuple:
+    """
+    :return: index of the grid cell, position inside of the cell (0-1, outside of the grid below 0 or above 1)
+    """
+    values = axis["values"]
+    if axis["uniform"]:
+        position = (x - axis["start"]) * axis["inverse_step"]
+        index = np.clip(np.floor(position), 0, len(values) - 2).astype(np.intp)
+        position -= index
+        return index, position
+    index = np.clip(np.searchsorted(values, x, side="right") - 1, 0, len(values) - 2)
+    return index, (x - values[index]) / (values[index + 1] - values[index])
+
+
+def _interpolate_corners(
+    flat: np.ndarray, n: int, k: np.ndarray, u: np.ndarray, v: np.ndarray
+) -> np.ndarray:
+    """
+    :return: bilinear interpolation that only uses the corners with a weight above zero
+    """
+    result = np.zeros(k.shape)
+    for offset, weight in (
+        (0, (1 - u) * (1 - v)),
+        (1, (1 - u) * v),
+        (n, u * (1 - v)),
+        (n + 1, u * v),
+    ):
+        result += np.where(weight > 0, weight * np.take(flat, k + offset), 0)
+    return result
+
+
+def _interpolate_bilinear(
+    cop_map: dict, T_l: np.ndarray, T_h: np.ndarray
+) -> np.ndarray:
+    """
+    :return: cop interpolated bilinearly between the operating points of the map (nan outside of the map)
+    """
+    cop = cop_map["cop"]
+    i, u = _position(cop_map["T_source"], T_l)
+    j, v = _position(cop_map["T_sink"], T_h)
+    n = cop.shape[1]
+    k = i * n + j
+    # corners of the cells as offsets into the flattened grid
+    flat = cop.ravel()
+    low = np.take(flat, k)
+    low += v * (np.take(flat[1:], k) - low)
+    high = np.take(flat[n:], k)
+    high += v * (np.take(flat[n + 1 :], k) - high)
+    high -= low
+    high *= u
+    high += low
+    # points next to an empty cell only need the corners they are not on
+    retry = np.isnan(high)
+    if retry.any():
+        k, u_all, v_all = np.broadcast_arrays(k, u, v)
+        high[retry] = _interpolate_corners(
+            flat, n, k[retry], u_all[retry], v_all[retry]
+        )
+    high[(u < 0) | (u > 1) | (v < 0) | (v > 1)] = np.nan
+    return high
+
+
+def _limit_temperatures(
+    cop_map: dict, T_l: np.ndarray, T_h: np.ndarray, extrapolation: str
+) -> tuple:
+    """
+    :return: temperatures clipped to the map ('clamp'), unchanged ('nan'), raises a ValueError outside of the map
+        ('raise')
+    """
+    T_source, T_sink = cop_map["T_source"]["values"], cop_map["T_sink"]["values"]
+    if extrapolation == "clamp":
+        return np.clip(T_l, T_source[0], T_source[-1]), np.clip(
+            T_h, T_sink[0], T_sink[-1]
+        )
+    if extrapolation == "raise":
+        if np.any((T_l < T_source[0]) | (T_l > T_source[-1])) or np.any(
+            (T_h < T_sink[0]) | (T_h > T_sink[-1])
+        ):
+            raise ValueError(
+                f"Operating points outside of the cop map (source {T_source[0]} to {T_source[-1]} Celsius, sink "
+                f"{T_sink[0]} to {T_sink[-1]} Celsius)"
+            )
+        return T_l, T_h
+    if extrapolation != "nan":
+        raise ValueError(
+            f"Unknown extrapolation {extrapolation}, use 'nan', 'clamp' or 'raise'"
+        )
+    return T_l, T_h
+
+
+def _table_index(axis: dict, x: np.ndarray) -> np.ndarray:
+    """
+    :return: index of the closest point of the table, the nan border outside of the axis and for nan
+    """
+    position = x * axis["inverse_step"]
+    position += axis["offset"]
+    # fmax and fmin replace nan with the border
+    np.fmax(position, 0, out=position)
+    np.fmin(position, axis["last"], out=position)
+    return position.astype(np.intp)
+
+
+def interpolate_cop_map(
+    cop_map: dict, T_l: ArrayLike, T_h: ArrayLike, extrapolation: str = "nan"
+) -> np.ndarray:
+    """
+    Interpolates the cop bilinearly between the operating points of a cop map
+
+    The temperatures are rounded to the closest point of the table of load_cop_map (0.1 K apart by default), the
+    lookup is then an index computation and a gather. Operating points between an empty cell and its neighbours are
+    nan, the operating points of the map keep their value. Outside of the map and for nan temperatures the cop is nan
+    by default (like calculate_cop without temperature lift).
+
+    :param dict cop_map: result of load_cop_map
+    :param ArrayLike T_l: Temperature of heat source in Celsius
+    :param ArrayLike T_h: Temperature of heat sink in Celsius
+    :param str extrapolation: outside of the map 'nan', 'clamp' (cop at the closest temperatures of the map) or
+        'raise' (ValueError)
+    :return: cop of heat pump with the broadcast shape of T_l and T_h
+    """
+    T_l, T_h = np.asarray(T_l, dtype=float), np.asarray(T_h, dtype=float)
+    T_l, T_h = _limit_temperatures(cop_map, T_l, T_h, extrapolation)
+    table = cop_map["table"]
+    index = _table_index(table["T_source"], np.atleast_1d(T_l))
+    index *= table["T_sink"]["last"] + 1
+    index = index + _table_index(table["T_sink"], np.atleast_1d(T_h))
+    return np.take(table["cop"], index).reshape(
+        np.broadcast_shapes(T_l.shape, T_h.shape)
+    )[()]
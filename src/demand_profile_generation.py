@@ -1,42 +1,74 @@
 import math
+import os
+from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 
+from .binary_store import CACHE_PATH, is_store_valid, read_store, write_store
+from .instrumentation import instrumented
 
-def generate_batch_process(hour_on:float, hour_off:float, length_on:float, length_off:float) -> list:
+DEMAND_PROFILE_PATH = "data/industrial_heat_demand_profiles"
+
+
+STEPS_PER_DAY = 24 * 4
+
+
+def daily_batch_pattern(hour_on:float, hour_off:float, length_on:float, length_off:float) -> np.ndarray:
     """
-    Generates a batch process for a full year with every day having the same profile
+    Generates the quarter-hourly demand of one day of a batch process
 
     :param float hour_on: Starting hour of the day (before, demand is 0)
     :param float hour_off: Ending hour of the day (after, demand is 0)
     :param float length_on: length of process in hours
     :param float length_off: pause between process in hours
-    :return: annual quarter-hourly demand profile
+    :return: quarter-hourly demand of one day (96 values)
     """
     available_time_per_day = hour_off - hour_on
     batches_per_day = available_time_per_day/(length_off+length_on)
 
-    profile_one_batch = [1] * int(length_on * 4) + [0] * int(length_off * 4)
-    profile_n_batches = profile_one_batch * math.floor(batches_per_day)
-    profile_day_beginning = [0] * int(hour_on * 4) + profile_n_batches
-    hours_missing = 24*4 - len(profile_day_beginning)
-    profile_day = profile_day_beginning + [0]*int(hours_missing)
-    profile_year = profile_day * 365
-    return profile_year
+    profile_one_batch = np.r_[np.ones(int(length_on * 4)), np.zeros(int(length_off * 4))]
+    profile_n_batches = np.tile(profile_one_batch, math.floor(batches_per_day))
+    profile_day = np.zeros(STEPS_PER_DAY)
+    profile_day_beginning = np.r_[np.zeros(int(hour_on * 4)), profile_n_batches][:STEPS_PER_DAY]
+    profile_day[:len(profile_day_beginning)] = profile_day_beginning
+    return profile_day
+
+
+def daily_continuous_pattern(hourly_demand: list) -> np.ndarray:
+    """
+    Generates the quarter-hourly demand of one day of a continuous process from hourly demand values
+
+    :param list hourly_demand: list of length 24 with hourly demand values
+    :return: quarter-hourly demand of one day (96 values)
+    """
+    return np.repeat(np.asarray(hourly_demand, dtype=float), 4)
 
 
-def generate_continuous_process(hourly_demand: list) -> list:
+def generate_batch_process(hour_on:float, hour_off:float, length_on:float, length_off:float) -> np.ndarray:
+    """
+    Generates a batch process for a full year with every day having the same profile
+
+    :param float hour_on: Starting hour of the day (before, demand is 0)
+    :param float hour_off: Ending hour of the day (after, demand is 0)
+    :param float length_on: length of process in hours
+    :param float length_off: pause between process in hours
+    :return: annual quarter-hourly demand profile
+    """
+    return np.tile(daily_batch_pattern(hour_on, hour_off, length_on, length_off), 365)
+
+
+def generate_continuous_process(hourly_demand: list) -> np.ndarray:
     """
     Generate a continuous quarter-hourly demand profile from hourly demand profile
 
     :param list hourly_demand: list of length 24 with hourly demand values
     :return: annual quarter-hourly demand profile
     """
-    profile_day = [x for x in hourly_demand for _ in range(4)]
-    profile_year = profile_day * 365
-    return profile_year
+    return np.tile(daily_continuous_pattern(hourly_demand), 365)
 
 
+@instrumented()
 def generate_demand_profile_template(weekend_different: bool, weekend_scale: float) -> pd.DataFrame:
     date_rng = pd.date_range(start='2025-01-01', end='2025-12-31 23:45:00', freq='15min')
     df = pd.DataFrame(date_rng, columns=['datetime'])
@@ -44,6 +76,190 @@ def generate_demand_profile_template(weekend_different: bool, weekend_scale: flo
     df['day_of_week'] = df['datetime'].dt.dayofweek
     df['scaled_process'] = 1
     if weekend_different:
-        df['scaled_process'] = df['day_of_week'].isin([5, 6]).apply(lambda x: weekend_scale / 100 if x else 1)
+        df['scaled_process'] = np.where(df['day_of_week'].isin([5, 6]), weekend_scale / 100, 1)
 
     return df
+
+
+@dataclass
+class CompactDemandProfile:
+    """
+    Demand profile stored as one daily pattern plus a calendar modifier
+
+    Every day of the year has the same daily pattern, scaled with weekend_scale on Saturdays and Sundays and with
+    holiday_scale on holidays. The full year is only generated on request (to_array), at any resolution that is a
+    multiple or a divisor of the resolution of the daily pattern.
+
+    :param np.ndarray daily_pattern: demand of one day, equally spaced (e.g. 96 quarter-hourly values)
+    :param int year: calendar year of the profile
+    :param float weekend_scale: scaling factor of the demand on weekends
+    :param tuple holidays: dates of holidays (anything accepted by np.datetime64)
+    :param float holiday_scale: scaling factor of the demand on holidays
+    """
+    daily_pattern: np.ndarray
+    year: int = 2025
+    weekend_scale: float = 1.0
+    holidays: tuple = ()
+    holiday_scale: float = 0.0
+
+    def __post_init__(self):
+        self.daily_pattern = np.asarray(self.daily_pattern, dtype=float)
+        if (24 * 60) % len(self.daily_pattern):
+            raise ValueError("The daily pattern has to consist of a whole number of minutes per time step")
+
+    @property
+    def resolution(self) -> int:
+        """
+        :return: resolution of the daily pattern in minutes
+        """
+        return 24 * 60 // len(self.daily_pattern)
+
+    def days(self) -> np.ndarray:
+        """
+        :return: all days of the year as datetime64[D]
+        """
+        return np.arange(np.datetime64(f"{self.year}-01-01"), np.datetime64(f"{self.year + 1}-01-01"))
+
+    def day_scales(self) -> np.ndarray:
+        """
+        :return: scaling factor of every day of the year
+        """
+        days = self.days()
+        # 1970-01-01 was a Thursday (weekday 3)
+        weekend = (days.astype(np.int64) + 3) % 7 >= 5
+        scales = np.where(weekend, self.weekend_scale, 1.0)
+        if len(self.holidays):
+            holidays = np.asarray(self.holidays, dtype="datetime64[D]")
+            scales = np.where(np.isin(days, holidays), self.holiday_scale, scales)
+        return scales
+
+    def pattern_at(self, resolution:int) -> np.ndarray:
+        """
+        Returns the daily pattern at another resolution (repeated for finer, averaged for coarser resolutions)
+
+        :param int resolution: resolution in minutes
+        :return: daily pattern with 24 * 60 / resolution values
+        """
+        if resolution <= self.resolution:
+            if self.resolution % resolution:
+                raise ValueError(f"Resolution {resolution} min is not a divisor of {self.resolution} min")
+            return np.repeat(self.daily_pattern, self.resolution // resolution)
+        if resolution % self.resolution or (24 * 60) % resolution:
+            raise ValueError(f"Resolution {resolution} min is not a multiple of {self.resolution} min")
+        return self.daily_pattern.reshape(-1, resolution // self.resolution).mean(axis=1)
+
+    def to_array(self, resolution:int=15) -> np.ndarray:
+        """
+        Generates the demand of the full year
+
+        :param int resolution: resolution in minutes
+        :return: demand for every time step of the year
+        """
+        return (self.day_scales()[:, None] * self.pattern_at(resolution)[None, :]).ravel()
+
+    def datetimes(self, resolution:int=15) -> np.ndarray:
+        """
+        :param int resolution: resolution in minutes
+        :return: start of every time step of the year as datetime64
+        """
+        return np.arange(np.datetime64(f"{self.year}-01-01T00:00"), np.datetime64(f"{self.year + 1}-01-01T00:00"),
+                         np.timedelta64(resolution, "m"))
+
+    def to_dataframe(self, resolution:int=15) -> pd.DataFrame:
+        """
+        :param int resolution: resolution in minutes
+        :return: Dataframe with columns datetime and demand
+        """
+        return pd.DataFrame({"datetime": self.datetimes(resolution).astype("datetime64[ns]"),
+                             "demand": self.to_array(resolution)})
+
+    def annual_energy(self) -> float:
+        """
+        :return: demand integrated over the year (demand unit times hours)
+        """
+        return self.daily_pattern.sum() * self.resolution / 60 * self.day_scales().sum()
+
+    def peak(self) -> float:
+        """
+        :return: highest demand of the year
+        """
+        scales = self.day_scales()
+        return max(self.daily_pattern.max() * scales.max(), self.daily_pattern.min() * scales.min())
+
+
+def available_industries() -> list:
+    """
+    Lists all industries for which pre-generated heat demand profiles are available
+
+    :return: list of industry names
+    """
+    return sorted(f.replace(".csv", "") for f in os.listdir(DEMAND_PROFILE_PATH) if f.endswith(".csv"))
+
+
+@instrumented()
+def build_demand_profile_store(industry:str) -> str:
+    """
+    Converts the heat demand profile csv of an industry into a binary store
+
+    The store holds one normalized float32 row per temperature level (contiguous, so selecting a level is a slice),
+    the peak demand and normalization factor of every level and the int64 timestamps. It is only rebuilt if the csv
+    changed since the last conversion.
+
+    :param str industry: industry name (name of the csv file)
+    :return: path to the store
+    """
+    source = os.path.join(DEMAND_PROFILE_PATH, f"{industry}.csv")
+    store_path = os.path.join(CACHE_PATH, "heat_demand_profiles", industry)
+    if is_store_valid(store_path, [source]):
+        return store_path
+
+    # Three header rows: application/temperature level, unit and index name
+    profile = pd.read_csv(source, index_col=0, header=[0, 1, 2])
+    profile.columns = profile.columns.droplevel([1, 2])
+
+    values = profile.to_numpy(dtype=float).T
+    peak = values.max(axis=1)
+    normalization = np.divide(1, peak, out=np.zeros_like(peak), where=peak > 0)
+    arrays = {
+        "normalized_profiles": (values * normalization[:, None]).astype(np.float32),
+        "peak": peak,
+        "normalization": normalization,
+        "datetime": pd.to_datetime(profile.index, format="%Y-%m-%d %H:%M:%S").values.astype("datetime64[ns]").view(np.int64),
+    }
+    write_store(store_path, arrays, [source], {"industry": industry, "temperature_levels": profile.columns.tolist()})
+    return store_path
+
+
+def load_demand_profile_store(industry:str, mmap:bool=True) -> tuple:
+    """
+    Loads the memory-mapped heat demand profiles of an industry (builds the binary store if required)
+
+    :param str industry: industry name (name of the csv file)
+    :param bool mmap: memory-map the arrays instead of reading them into memory
+    :return: dictionary with arrays (normalized_profiles, peak, normalization, datetime), list of temperature levels
+    """
+    arrays, meta = read_store(build_demand_profile_store(industry), mmap)
+    return arrays, meta["temperature_levels"]
+
+
+def available_temperature_levels(industry:str) -> list:
+    """
+    Lists the temperature levels (and other applications) available for an industry
+
+    :param str industry: industry name
+    :return: list of temperature levels
+    """
+    return load_demand_profile_store(industry)[1]
+
+
+@instrumented()
+def load_industrial_demand_profile(industry:str, temperature_level:str) -> np.ndarray:
+    """
+    Returns the quarter-hourly heat demand profile of an industry and temperature level normalized to its peak
+
+    :param str industry: industry name
+    :param str temperature_level: temperature level (column of the original csv)
+    :return: memory-mapped array with normalized demand (read-only)
+    """
+    arrays, temperature_levels = load_demand_profile_store(industry)
+    return arrays["normalized_profiles"][temperature_levels.index(temperature_level)]
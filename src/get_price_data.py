@@ -1,14 +1,217 @@
+import functools
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
+from .instrumentation import instrumented
+
+# EUROSTAT extracts of industrial energy prices (nrg_pc_205 and nrg_pc_203), as .csv and/or .xlsx
+PRICE_SOURCES = {"electricity": "data/industrial_el_prices", "gas": "data/industrial_gas_prices"}
+# The bundled csv files hold the xlsx sheets with all taxes and levies in Euro per kWh
+CSV_VARIANT = {"Taxes": "All taxes and levies included", "Currency": "Euro", "Unit of measure": "Kilowatt-hour"}
+CSV_BANDS = {"electricity": "Consumption from 500 MWh to 1 999 MWh - band IC",
+             "gas": "Consumption from 10 000 GJ to 99 999 GJ - band I3"}
 
+
+@instrumented()
 def process_price_data(path:str) -> pd.DataFrame:
     df = pd.read_csv(path, index_col=0).apply(pd.to_numeric, errors='coerce')
     df = df.dropna(axis=1, how='all')
     return df.dropna(axis=0, how='any')
 
 
+def parse_semester(label:str) -> tuple:
+    """
+    :param str label: EUROSTAT time label, e.g. '2024-S1'
+    :return: year, semester (1 or 2)
+    """
+    match = re.fullmatch(r"\s*(\d{4})-S([12])\s*", str(label))
+    if match is None:
+        raise ValueError(f"{label} is not a semester (e.g. 2024-S1)")
+    return int(match.group(1)), int(match.group(2))
+
+
+def read_eurostat_csv(path:str) -> pd.DataFrame:
+    """
+    Reads a EUROSTAT csv extract with countries as rows and semesters as columns
+
+    :param str path: path of the csv file
+    :return: prices with countries as index and semester labels as columns, nan for missing values (':')
+    """
+    frame = pd.read_csv(path, index_col=0, na_values=":", encoding="utf-8-sig")
+    frame = frame.loc[:, [not str(column).startswith("Unnamed") for column in frame.columns]]
+    frame.index = frame.index.str.strip()
+    return frame.apply(pd.to_numeric, errors="coerce")
+
+
+def read_eurostat_xlsx(path:str) -> list:
+    """
+    Reads all data sheets of a EUROSTAT xlsx extract (needs the optional package openpyxl)
+
+    Every sheet holds one combination of consumption band, unit, taxes and currency, described in the rows above the
+    table. Columns with flags next to the values are dropped.
+
+    :param str path: path of the xlsx file
+    :return: list of (description, prices) per sheet, description is a dictionary such as {'Taxes': ...,
+        'Currency': ..., 'Energy consumption': ..., 'Unit of measure': ...}, prices as in read_eurostat_csv
+    """
+    try:
+        sheets = pd.read_excel(path, sheet_name=None, header=None, engine="openpyxl")
+    except ImportError as e:
+        raise ImportError("Reading EUROSTAT xlsx files needs openpyxl (pip install openpyxl), or use the csv "
+                          "extracts") from e
+
+    tables = []
+    for sheet in sheets.values():
+        first_column = sheet[0].astype(str).str.strip()
+        if not (first_column == "TIME").any():
+            # summary sheet
+            continue
+        header = int(np.flatnonzero(first_column == "TIME")[0])
+        description = {first_column[i]: str(sheet.iloc[i, 2]).strip() for i in range(header)
+                       if pd.notna(sheet.iloc[i, 0]) and sheet.shape[1] > 2 and pd.notna(sheet.iloc[i, 2])}
+        labels = sheet.iloc[header]
+        columns = [i for i in range(1, sheet.shape[1]) if re.fullmatch(r"\d{4}-S[12]", str(labels[i]).strip())]
+        rows = sheet.iloc[header + 1:]
+        rows = rows[rows[0].astype(str).str.strip() != "GEO (Labels)"]
+        # the table ends with an empty row before the notes about special values and flags
+        empty = rows[0].isna().to_numpy()
+        if empty.any():
+            rows = rows.iloc[:int(np.argmax(empty))]
+        prices = rows[columns].apply(pd.to_numeric, errors="coerce")
+        prices.index = rows[0].astype(str).str.strip()
+        prices.columns = [str(labels[i]).strip() for i in columns]
+        tables.append((description, prices))
+    return tables
+
+
+def _read_source(source:str, taxes:str, currency:str) -> tuple:
+    """
+    :return: prices per kWh (countries x semester labels) and consumption band of a csv or xlsx source
+    """
+    if source.endswith(".xlsx"):
+        for description, prices in read_eurostat_xlsx(source):
+            if (description.get("Taxes") == taxes and description.get("Currency") == currency
+                    and description.get("Unit of measure") == "Kilowatt-hour"):
+                return prices, description.get("Energy consumption")
+        raise ValueError(f"{source} has no sheet with prices per kWh, taxes '{taxes}' and currency '{currency}'")
+    if taxes != CSV_VARIANT["Taxes"] or currency != CSV_VARIANT["Currency"]:
+        raise ValueError(f"The csv extracts only hold prices with '{CSV_VARIANT['Taxes']}' in "
+                         f"{CSV_VARIANT['Currency']}, use the xlsx files for other taxes or currencies")
+    return read_eurostat_csv(source), None
+
+
+def _source_path(base:str, file_format:str) -> str:
+    if file_format is None:
+        file_format = "csv" if os.path.exists(f"{base}.csv") else "xlsx"
+    return f"{base}.{file_format}"
+
+
+@functools.lru_cache(maxsize=8)
+def _load_price_cube(sources:tuple, modified:tuple, taxes:str, currency:str) -> dict:
+    frames, bands = {}, {}
+    for carrier, source in sources:
+        frames[carrier], band = _read_source(source, taxes, currency)
+        bands[carrier] = band or CSV_BANDS.get(carrier)
+
+    carriers = list(frames)
+    countries = list(dict.fromkeys(country for frame in frames.values() for country in frame.index))
+    semesters = sorted({parse_semester(label) for frame in frames.values() for label in frame.columns})
+    prices = np.full((len(carriers), len(countries), len(semesters)), np.nan)
+    country_index = {country: i for i, country in enumerate(countries)}
+    semester_index = {semester: i for i, semester in enumerate(semesters)}
+    for c, carrier in enumerate(carriers):
+        frame = frames[carrier]
+        rows = [country_index[country] for country in frame.index]
+        columns = [semester_index[parse_semester(label)] for label in frame.columns]
+        prices[c][np.ix_(rows, columns)] = frame.to_numpy(dtype=float)
+
+    # annual means of the semesters with data
+    years = sorted({year for year, _ in semesters})
+    year_index = {year: i for i, year in enumerate(years)}
+    semester_years = np.array([year_index[year] for year, _ in semesters])
+    totals = np.zeros((*prices.shape[:2], len(years)))
+    counts = np.zeros_like(totals)
+    np.add.at(totals, (slice(None), slice(None), semester_years), np.nan_to_num(prices))
+    np.add.at(counts, (slice(None), slice(None), semester_years), np.isfinite(prices))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annual = np.where(counts > 0, totals / counts, np.nan)
+
+    cube = {
+        "carriers": carriers, "countries": countries, "semesters": semesters, "years": years,
+        "prices": prices, "annual_prices": annual, "bands": bands, "taxes": taxes, "currency": currency,
+        "index": {"carrier": {carrier: i for i, carrier in enumerate(carriers)}, "country": country_index,
+                  "semester": semester_index, "year": year_index},
+    }
+    prices.flags.writeable = False
+    annual.flags.writeable = False
+    return cube
+
+
+@instrumented()
+def load_price_cube(sources:dict=None, taxes:str=CSV_VARIANT["Taxes"], currency:str=CSV_VARIANT["Currency"],
+                    file_format:str=None) -> dict:
+    """
+    Loads the EUROSTAT industrial energy prices as carrier x country x semester cube
+
+    The cube is built once and cached until one of the source files changes. Lookups by carrier, country, year and
+    semester are dictionary lookups (see lookup_price); the 'prices' array allows vectorized queries over all
+    countries and semesters (see relative_prices).
+
+    :param dict sources: path without extension per energy carrier, defaults to PRICE_SOURCES
+    :param str taxes: EUROSTAT tax variant, e.g. 'Excluding taxes and levies' (other than CSV_VARIANT only with the
+        xlsx files)
+    :param str currency: 'Euro', 'Purchasing Power Standard' or 'National currency'
+    :param str file_format: 'csv' or 'xlsx' (needs openpyxl), by default csv if it exists
+    :return: dictionary with the labels ('carriers', 'countries', 'semesters' as (year, semester), 'years'), the
+        'prices' in [currency]/kWh with shape (n_carriers, n_countries, n_semesters), their 'annual_prices' (mean of
+        the semesters with data), the consumption 'bands' per carrier and the 'index' of every label (read-only)
+    """
+    sources = tuple((carrier, _source_path(base, file_format))
+                    for carrier, base in (sources or PRICE_SOURCES).items())
+    modified = tuple(os.path.getmtime(source) for _, source in sources)
+    return _load_price_cube(sources, modified, taxes, currency)
+
+
+def lookup_price(cube:dict, carrier:str, country:str, year:int, semester:int=None) -> float:
+    """
+    :param dict cube: result of load_price_cube
+    :param str carrier: energy carrier, e.g. 'electricity' or 'gas'
+    :param str country: country as labelled by EUROSTAT
+    :param int year: year
+    :param int semester: 1 or 2, None for the annual mean
+    :return: price in [currency]/kWh, nan if there is no data
+    """
+    index = cube["index"]
+    c, i = index["carrier"][carrier], index["country"].get(country)
+    if i is None:
+        return np.nan
+    if semester is None:
+        k = index["year"].get(year)
+        return np.nan if k is None else float(cube["annual_prices"][c, i, k])
+    k = index["semester"].get((year, semester))
+    return np.nan if k is None else float(cube["prices"][c, i, k])
+
+
+def relative_prices(cube:dict, numerator:str="electricity", denominator:str="gas") -> pd.DataFrame:
+    """
+    Divides the prices of two energy carriers for all countries and semesters at once
+
+    :param dict cube: result of load_price_cube
+    :param str numerator: energy carrier, e.g. 'electricity'
+    :param str denominator: energy carrier, e.g. 'gas'
+    :return: relative prices with countries as index and semester labels as columns, nan without data
+    """
+    index = cube["index"]["carrier"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = cube["prices"][index[numerator]] / cube["prices"][index[denominator]]
+    return pd.DataFrame(ratio, index=cube["countries"],
+                        columns=[f"{year}-S{semester}" for year, semester in cube["semesters"]])
+
+
 def get_relative_prices() -> pd.DataFrame:
-    p_el = process_price_data("data/industrial_el_prices.csv")
-    p_th = process_price_data("data/industrial_gas_prices.csv")
-    p_rel = p_el.divide(p_th)
-    return p_rel.dropna(axis=0, how='any')
+    p_rel = relative_prices(load_price_cube())
+    p_rel = p_rel.dropna(axis=1, how='all')
+    return p_rel.dropna(axis=0, how='any').sort_index()
@@ -0,0 +1,205 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Statistics per stage name of the process, used by all threads without own statistics (see use_stats)
+STATS = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _empty_stats() -> dict:
+    return {
+        "calls": 0,
+        "total_seconds": 0.0,
+        "max_seconds": 0.0,
+        "peak_memory_bytes": None,
+        "cache_hits": 0,
+        "cache_misses": 0,
+    }
+
+
+def use_stats(stats: dict = None) -> None:
+    """
+    Records the stages of the current thread in a separate dictionary, e.g. in the session state of a streamlit
+    session (every run of a page runs in its own thread)
+
+    :param dict stats: dictionary holding the statistics per stage name, None for the statistics of the process
+    """
+    _local.stats = stats
+
+
+def _current_stats() -> dict:
+    stats = getattr(_local, "stats", None)
+    return STATS if stats is None else stats
+
+
+def enable_memory_tracing(enabled: bool = True) -> None:
+    """
+    Starts or stops tracing of the peak memory of stages with tracemalloc (slows down allocations noticeably)
+
+    Tracing applies to the whole process, so it is switched on once at start-up (see cash_management) and not per
+    session.
+
+    :param bool enabled: True to start, False to stop
+    """
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset_stats() -> None:
+    """
+    Removes all statistics recorded by the current thread (see use_stats)
+    """
+    with _lock:
+        _current_stats().clear()
+
+
+def _record(
+    name: str, seconds: float, peak_memory: int = None, cache_hit: bool = None
+) -> None:
+    with _lock:
+        stats = _current_stats().setdefault(name, _empty_stats())
+        if cache_hit is None:
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if peak_memory is not None:
+                stats["peak_memory_bytes"] = max(
+                    stats["peak_memory_bytes"] or 0, peak_memory
+                )
+        else:
+            stats["cache_hits" if cache_hit else "cache_misses"] += 1
+
+    if logger.isEnabledFor(logging.DEBUG):
+        record = {"stage": name}
+        if cache_hit is None:
+            record["seconds"] = round(seconds, 6)
+            if peak_memory is not None:
+                record["peak_memory_bytes"] = peak_memory
+        else:
+            record["cache_hit"] = cache_hit
+        logger.debug(json.dumps(record))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Measures wall time (and peak memory if memory tracing is enabled) of a block of code
+
+    Usage: with stage("page 3: evaluation"): ...
+
+    :param str name: name of the stage in the statistics
+    """
+    tracing = tracemalloc.is_tracing()
+    stack = _local.__dict__.setdefault("peaks", [])
+    if tracing:
+        start_memory, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # keep the peak of the enclosing stage before resetting it for this stage
+            stack[-1] = max(stack[-1], peak)
+        tracemalloc.reset_peak()
+        stack.append(0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        peak_memory = None
+        if tracing and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, stack.pop())
+            peak_memory = peak - start_memory
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+        elif tracing:
+            stack.pop()
+        _record(name, seconds, peak_memory)
+
+
+def instrumented(name: str = None):
+    """
+    Decorator recording every call of a function as stage (see stage)
+
+    :param str name: name of the stage, defaults to the function name
+    """
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def track_cache(cache_decorator, func, name: str = None):
+    """
+    Applies a cache decorator (e.g. st.cache_data) and counts cache hits and misses of the cached function
+
+    :param cache_decorator: decorator that caches the results of a function
+    :param func: function to cache
+    :param str name: name of the stage, defaults to 'cached ' + function name
+    :return: cached function
+    """
+    stage_name = name or f"cached {func.__name__}"
+    computed = threading.local()
+
+    @functools.wraps(func)
+    def compute(*args, **kwargs):
+        computed.miss = True
+        return func(*args, **kwargs)
+
+    cached = cache_decorator(compute)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        computed.miss = False
+        with stage(stage_name):
+            result = cached(*args, **kwargs)
+        _record(stage_name, 0.0, cache_hit=not computed.miss)
+        return result
+
+    return wrapper
+
+
+def stats_table() -> list:
+    """
+    :return: list of dictionaries with the statistics of all stages recorded by the current thread (see use_stats),
+        slowest total time first
+    """
+    with _lock:
+        rows = [{"stage": name, **stats} for name, stats in _current_stats().items()]
+    return sorted(rows, key=lambda row: row["total_seconds"], reverse=True)
+
+
+def configure_json_log(path: str) -> None:
+    """
+    Writes one json line per recorded stage to a file
+
+    :param str path: path of the log file
+    """
+    path = os.path.abspath(path)
+    if any(
+        getattr(handler, "baseFilename", None) == path for handler in logger.handlers
+    ):
+        return
+    handler = logging.FileHandler(path)
+    handler.setFormatter(
+        logging.Formatter('{"time": "%(asctime)s", "record": %(message)s}')
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+from .instrumentation import instrumented
+
+# Width of the charts of the pages in pixels
+CHART_WIDTH = 700
+
+
+def _as_numbers(x: ArrayLike) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").view(np.int64).astype(float)
+    return x.astype(float)
+
+
+def min_max_indices(x: ArrayLike, y: ArrayLike, n_buckets: int) -> np.ndarray:
+    """
+    Selects the first, last, lowest and highest point of every bucket of equal width along x (e.g. one bucket per
+    pixel), so that peaks and dips stay visible in a line chart
+
+    :param ArrayLike x: ascending x values (numbers or datetimes)
+    :param ArrayLike y: y values without nan
+    :param int n_buckets: number of buckets
+    :return: ascending indices of the selected points (at most 4 per bucket, with the first, last, lowest and highest
+        point of all)
+    """
+    x, y = _as_numbers(x), np.asarray(y, dtype=float)
+    if len(x) <= 4 * n_buckets:
+        return np.arange(len(x))
+    span = x[-1] - x[0]
+    bucket = (
+        np.minimum(((x - x[0]) / span * n_buckets).astype(np.intp), n_buckets - 1)
+        if span > 0
+        else np.zeros(len(x), dtype=np.intp)
+    )
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(x)] - 1
+    # lowest and highest point per bucket: sort by bucket, then by y
+    order = np.lexsort((y, bucket))
+    lowest, highest = order[starts], order[ends]
+    return np.unique(np.concatenate([starts, ends, lowest, highest]))
+
+
+def lttb_indices(x: ArrayLike, y: ArrayLike, n_out: int) -> np.ndarray:
+    """
+    Selects points with the largest triangle three buckets algorithm (Steinarsson 2013), which keeps the visual shape
+    of a line with few points
+
+    The first, last, lowest and highest point are always kept, LTTB selects the others.
+
+    :param ArrayLike x: ascending x values (numbers or datetimes)
+    :param ArrayLike y: y values without nan
+    :param int n_out: maximal number of points to keep (at least 4)
+    :return: ascending indices of the selected points
+    """
+    x, y = _as_numbers(x), np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 4:
+        raise ValueError("LTTB needs to keep at least 4 points")
+    # two points are kept for the global extremes
+    n_lttb = n_out - 2
+    # buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_lttb - 1).astype(np.intp)
+    # average point of every bucket, the next bucket of the last one is the last point
+    x_mean = np.r_[np.add.reduceat(x[:-1], edges[:-1])[1:] / np.diff(edges)[1:], x[-1]]
+    y_mean = np.r_[np.add.reduceat(y[:-1], edges[:-1])[1:] / np.diff(edges)[1:], y[-1]]
+
+    selected = np.empty(n_lttb, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_lttb - 2):
+        start, end = edges[i], edges[i + 1]
+        # twice the area of the triangles previous point - candidate - average of the next bucket
+        area = np.abs(
+            (x[previous] - x_mean[i]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (y_mean[i] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return np.union1d(selected, [np.argmin(y), np.argmax(y)])
+
+
+@instrumented()
+def downsample_frame(
+    frame: pd.DataFrame,
+    x: str,
+    y: str,
+    start=None,
+    end=None,
+    width: int = CHART_WIDTH,
+    group: str = None,
+    method: str = "minmax",
+) -> pd.DataFrame:
+    """
+    Reduces a time series to the points a line chart of a given width can show
+
+    The frame is first cut to the selected range, so zooming in (a smaller range) returns more detail, up to the full
+    resolution once the range has fewer points than the chart has pixels. Rows with missing y values are dropped.
+
+    :param pd.DataFrame frame: data of the chart, sorted by x within every group
+    :param str x: column of the x axis (e.g. datetimes)
+    :param str y: column of the y axis
+    :param start: first x value to show, None for the first one
+    :param end: last x value to show, None for the last one
+    :param int width: width of the chart in pixels
+    :param str group: column with the name of the line if the frame holds several lines
+    :param str method: 'minmax' (lowest and highest point per pixel, keeps all peaks) or 'lttb' (largest triangle
+        three buckets, two points per pixel)
+    :return: rows of frame to plot
+    """
+    selected = frame[frame[y].notna()]
+    if start is not None:
+        selected = selected[selected[x] >= start]
+    if end is not None:
+        selected = selected[selected[x] <= end]
+
+    parts = (
+        [selected]
+        if group is None
+        else [part for _, part in selected.groupby(group, sort=False)]
+    )
+    result = []
+    for part in parts:
+        if method == "minmax":
+            rows = min_max_indices(part[x].to_numpy(), part[y].to_numpy(), width)
+        elif method == "lttb":
+            rows = lttb_indices(part[x].to_numpy(), part[y].to_numpy(), 2 * width)
+        else:
+            raise ValueError(f"Unknown method {method}, use 'minmax' or 'lttb'")
+        result.append(part.iloc[rows])
+    return pd.concat(result) if result else selected
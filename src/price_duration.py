@@ -0,0 +1,159 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .carnot_hp_calculations import calculate_annuity_factor
+from .instrumentation import instrumented
+
+
+@instrumented()
+def build_price_duration_index(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    delta_t: float = 0.25,
+    weights: ArrayLike = None,
+    cop_weights: ArrayLike = None,
+) -> dict:
+    """
+    Sorts every price series once and stores prefix sums of the heat demand and electricity costs in price order
+
+    The heat demand and electricity costs of all time steps with a price below any threshold can then be looked up
+    with a binary search instead of a scan over all time steps.
+
+    For a cop that varies over the year the prices are weighted per profile with the cop weights (p_el * w_t, the
+    electricity costs per unit of heat times the design cop) and sorted per profile, so that the heat pump runs in
+    the time steps with the cheapest heat.
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: electricity prices in [currency]/kWh with shape (n_series, n_steps), missing values are
+        treated as zero costs
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike weights: number of times each time step occurs in the year (e.g. for representative days)
+    :param ArrayLike cop_weights: weights of the electricity costs per time step with shape (n_profiles, n_steps), see
+        carnot_hp_calculations.calculate_cop_weights
+    :return: dictionary with the sorted prices (n_series, n_steps), or the sorted weighted prices per profile
+        (n_profiles, n_series, n_steps) with cop_weights, and the prefix sums of heat demand and electricity costs
+        (n_profiles, n_series, n_steps + 1)
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    p_el = np.nan_to_num(np.atleast_2d(np.asarray(p_el, dtype=float)))
+    if demand.shape[1] != p_el.shape[1]:
+        raise ValueError(
+            f"Demand profiles ({demand.shape[1]} steps) and price series ({p_el.shape[1]} steps) "
+            f"need the same number of time steps"
+        )
+    if weights is not None:
+        demand = demand * np.asarray(weights, dtype=float)
+
+    if cop_weights is None:
+        order = np.argsort(p_el, axis=1, kind="stable")
+        sorted_prices = np.take_along_axis(p_el, order, axis=1)
+        heat = demand[:, order] * delta_t
+        costs = heat * sorted_prices[None]
+    else:
+        prices = (
+            p_el[None] * np.atleast_2d(np.asarray(cop_weights, dtype=float))[:, None]
+        )
+        order = np.argsort(prices, axis=2, kind="stable")
+        sorted_prices = np.take_along_axis(prices, order, axis=2)
+        heat = (
+            np.take_along_axis(
+                np.broadcast_to(demand[:, None], prices.shape), order, axis=2
+            )
+            * delta_t
+        )
+        costs = heat * sorted_prices
+    zeros = np.zeros((*heat.shape[:2], 1))
+    return {
+        "sorted_prices": sorted_prices,
+        "cumulative_heat": np.concatenate([zeros, np.cumsum(heat, axis=2)], axis=2),
+        "cumulative_costs": np.concatenate([zeros, np.cumsum(costs, axis=2)], axis=2),
+    }
+
+
+def threshold_statistics(index: dict, price_limit: ArrayLike) -> tuple:
+    """
+    Returns the heat demand and electricity costs of all time steps with a price up to a limit
+
+    :param dict index: result of build_price_duration_index
+    :param ArrayLike price_limit: price limits in [currency]/kWh, a scalar or an array whose first axis are the
+        profiles, e.g. (n_profiles,) or (n_profiles, n_thresholds)
+    :return: heat demand and electricity costs, each with shape (n_profiles, n_series, *price_limit.shape[1:])
+    """
+    n_profiles, n_series = index["cumulative_heat"].shape[:2]
+    price_limit = np.asarray(price_limit, dtype=float)
+    if price_limit.ndim == 0:
+        price_limit = np.broadcast_to(price_limit, (n_profiles,))
+    shape = price_limit.shape[1:]
+    flat_limit = price_limit.reshape(n_profiles, -1)
+
+    heat = np.empty((n_profiles, n_series, flat_limit.shape[1]))
+    costs = np.empty_like(heat)
+    sorted_prices = index["sorted_prices"]
+    for s in range(n_series):
+        if sorted_prices.ndim == 2:
+            position = np.searchsorted(sorted_prices[s], flat_limit, side="right")
+        else:
+            # prices sorted per profile (time-varying cop)
+            position = np.stack(
+                [
+                    np.searchsorted(sorted_prices[i, s], flat_limit[i], side="right")
+                    for i in range(n_profiles)
+                ]
+            )
+        heat[:, s] = np.take_along_axis(
+            index["cumulative_heat"][:, s], position, axis=1
+        )
+        costs[:, s] = np.take_along_axis(
+            index["cumulative_costs"][:, s], position, axis=1
+        )
+    return heat.reshape(n_profiles, n_series, *shape), costs.reshape(
+        n_profiles, n_series, *shape
+    )
+
+
+def calculate_allowable_investment_threshold(
+    index: dict,
+    cop: ArrayLike,
+    p_th: float,
+    r: float,
+    t: float,
+    p_el_f: float = 1,
+    threshold: ArrayLike = None,
+) -> np.ndarray:
+    """
+    Calculates the allowable investment per kW_el if the heat pump only runs when the electricity price is at most a
+    threshold; the alternative heat provision covers the demand in all other time steps
+
+    Without threshold the heat pump runs whenever it is cheaper than the alternative (p_el_f * p_el <= p_th * cop),
+    which gives the highest allowable investment. For an index with cop weights pass the design cop; the thresholds
+    then apply to the weighted price p_el_f * p_el * w_t.
+
+    :param dict index: result of build_price_duration_index
+    :param ArrayLike cop: cop of heat pump per profile with shape (n_profiles,)
+    :param float p_th: cost of alternative heat generation in [currency]/kWh
+    :param float r: interest rate (decimal)
+    :param float t: lifetime in years
+    :param float p_el_f: multiplier for the electricity prices
+    :param ArrayLike threshold: switching thresholds for the (multiplied) electricity price in [currency]/kWh, a
+        scalar or 1-D array of thresholds used for all profiles
+    :return: allowable investment costs in [currency]/kW_el with shape (n_profiles, n_series) or
+        (n_profiles, n_series, n_thresholds)
+    """
+    cop = np.asarray(cop, dtype=float)
+    n_profiles = index["cumulative_heat"].shape[0]
+    threshold = (
+        np.broadcast_to(p_th * cop, (n_profiles,))
+        if threshold is None
+        else np.broadcast_to(
+            np.asarray(threshold, dtype=float), (n_profiles, *np.shape(threshold))
+        )
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # without electricity costs (p_el_f = 0) the heat pump always runs
+        price_limit = np.where(p_el_f > 0, threshold / p_el_f, np.inf)
+    heat, costs = threshold_statistics(index, price_limit)
+
+    cop = np.broadcast_to(cop, (n_profiles,)).reshape(
+        n_profiles, *[1] * (heat.ndim - 1)
+    )
+    return (heat * p_th * cop - costs * p_el_f) * calculate_annuity_factor(r, t)
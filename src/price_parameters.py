@@ -0,0 +1,293 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .binary_store import (
+    CACHE_PATH,
+    begin_store,
+    discard_store,
+    publish_store,
+    source_signature,
+)
+from .instrumentation import instrumented
+from .price_profile_generation import (
+    PRICE_DATA_PATH,
+    available_price_countries,
+    build_price_store,
+    complete_price_years,
+    fit_electricty_price_trends,
+    load_electricity_price_profile,
+)
+from .price_scenarios import fit_residual_model
+
+PARAMETER_STORE_PATH = os.path.join(CACHE_PATH, "price_parameters")
+# Increase when the fitted parameters or the layout of the store change, all countries are refitted then
+PARAMETER_STORE_VERSION = 1
+
+# One lock per country, so that sessions of the app do not write the store of a country at the same time
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def source_hash(path: str) -> str:
+    """
+    :param str path: path of a file
+    :return: sha256 hash of the content of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_path(country: str) -> str:
+    return os.path.join(PRICE_DATA_PATH, f"{country}.csv")
+
+
+def _store_path(country: str) -> str:
+    return os.path.join(PARAMETER_STORE_PATH, country)
+
+
+def _country_lock(country: str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(country, threading.Lock())
+
+
+def _read_meta(country: str) -> dict:
+    try:
+        with open(os.path.join(_store_path(country), "meta.json")) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    return meta if meta.get("version") == PARAMETER_STORE_VERSION else None
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    # unique temporary file, concurrent writers never share it
+    handle, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=path)
+    with os.fdopen(handle, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def is_fit_current(country: str) -> bool:
+    """
+    Checks if the stored parameters of a country were fitted from the current price csv
+
+    The size and modification time of the csv are compared first; only if they changed the content hash is compared
+    (e.g. after a checkout that touched the file without changing it).
+
+    :param str country: country name (name of the csv file)
+    :return: True if the stored parameters can be used
+    """
+    meta = _read_meta(country)
+    if meta is None:
+        return False
+    source = _source_path(country)
+    signature = source_signature(source)
+    if meta["signature"] == signature:
+        return True
+    if meta["sha256"] != source_hash(source):
+        return False
+    meta["signature"] = signature
+    with _country_lock(country):
+        _write_meta(_store_path(country), meta)
+    return True
+
+
+def _fit_country_year(country: str, year: int) -> tuple:
+    """
+    Fits trend, weekly and hourly cycle and the residual model of one country and year (runs in worker processes)
+    """
+    p = load_electricity_price_profile(country, year)
+    p_fitted, params = fit_electricty_price_trends(p, year)
+    residual_model = fit_residual_model(p_fitted)
+    scalars = {
+        "trend": {key: float(value) for key, value in params["trend"].items()},
+        "weekly_cycle": {
+            key: float(value) for key, value in params["weekly_cycle"].items()
+        },
+        "residual_model": {
+            "block_days": residual_model["block_days"],
+            "window_days": residual_model["window_days"],
+        },
+        "mean_price": float(p_fitted["p"].mean()),
+    }
+    arrays = {
+        "hourly_cycle_table": params["hourly_cycle_table"],
+        "residuals": residual_model["residuals"],
+    }
+    return scalars, arrays
+
+
+def _write_country(country: str, sha256: str, results: dict) -> None:
+    """
+    Writes the store of a country into a temporary directory and replaces the old store with it (see
+    binary_store.publish_store)
+    """
+    arrays = {
+        f"{year}_{name}": array
+        for year, (_, year_arrays) in results.items()
+        for name, array in year_arrays.items()
+    }
+    meta = {
+        "version": PARAMETER_STORE_VERSION,
+        "sha256": sha256,
+        "signature": source_signature(_source_path(country)),
+        "years": {str(year): scalars for year, (scalars, _) in sorted(results.items())},
+    }
+    with _country_lock(country):
+        build_path = begin_store(_store_path(country))
+        try:
+            np.savez(os.path.join(build_path, "arrays.npz"), **arrays)
+            _write_meta(build_path, meta)
+        except BaseException:
+            discard_store(build_path)
+            raise
+        publish_store(build_path, _store_path(country))
+
+
+@instrumented()
+def fit_all_price_parameters(
+    countries: list = None, n_workers: int = None, force: bool = False
+) -> dict:
+    """
+    Fits the price model of every full year of every country in PRICE_DATA_PATH and stores the parameters
+
+    Only countries whose price csv changed since the last fit (or that were never fitted) are fitted. The
+    country-years are fitted in parallel processes, the parameters of each country are stored in
+    PARAMETER_STORE_PATH/<country> (meta.json with the scalar parameters and the hash of the csv, arrays.npz with the
+    hourly cycle tables and residuals).
+
+    :param list countries: countries to fit, all available countries by default
+    :param int n_workers: number of processes, None uses all cores, 1 fits in this process
+    :param bool force: refit all countries
+    :return: dictionary with the fitted years per country ('up to date' for countries that were not refitted)
+    """
+    countries = available_price_countries() if countries is None else countries
+    stale = [country for country in countries if force or not is_fit_current(country)]
+    summary = {country: "up to date" for country in countries if country not in stale}
+    if not stale:
+        return summary
+
+    # build the binary price stores here, so that the workers only read them
+    tasks = []
+    for country in stale:
+        build_price_store(country)
+        tasks += [(country, year) for year in complete_price_years(country)]
+    if n_workers == 1 or len(tasks) <= 1:
+        fits = [_fit_country_year(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            fits = list(executor.map(_fit_country_year, *zip(*tasks)))
+
+    for country in stale:
+        results = {
+            year: fit
+            for (task_country, year), fit in zip(tasks, fits)
+            if task_country == country
+        }
+        _write_country(country, source_hash(_source_path(country)), results)
+        summary[country] = sorted(results)
+    return summary
+
+
+def fitted_years(country: str) -> list:
+    """
+    :param str country: country name (name of the csv file)
+    :return: years with stored parameters, or all full years if the parameters of the country are missing or
+        outdated (their parameters are fitted on request by load_price_parameters)
+    """
+    if not is_fit_current(country):
+        return complete_price_years(country)
+    return sorted(int(year) for year in _read_meta(country)["years"])
+
+
+@functools.lru_cache(maxsize=32)
+def _fit_on_request(country: str, year: int, signature: tuple) -> tuple:
+    scalars, arrays = _fit_country_year(country, year)
+    # shared by all sessions
+    for array in arrays.values():
+        array.flags.writeable = False
+    return scalars, arrays
+
+
+def load_price_parameters(country: str, year: int) -> tuple:
+    """
+    Loads the fitted price model of a country and year from the parameter store
+
+    If the parameters of the country are missing or outdated, only the requested year is fitted in this process (and
+    kept in memory until the price csv changes). The store of all countries is filled with
+    python -m src.price_parameters, so that the app does not start processes.
+
+    :param str country: country name (name of the csv file)
+    :param int year: full year of the price data
+    :return: parameters as from fit_electricty_price_trends (trend, weekly_cycle, hourly_cycle_table), residual
+        model as from price_scenarios.fit_residual_model, mean price of the year in EUR/MWh
+    """
+    current = is_fit_current(country)
+    years = fitted_years(country)
+    if year not in years:
+        raise ValueError(
+            f"No fitted price parameters for {country} in {year}, fitted years are {years}"
+        )
+    if not current:
+        signature = source_signature(_source_path(country))
+        # sessions asking for the same year wait for the first fit
+        with _country_lock(country):
+            meta, arrays = _fit_on_request(
+                country, year, (signature["size"], signature["mtime_ns"])
+            )
+        return _parameters(meta, arrays)
+    meta = _read_meta(country)["years"][str(year)]
+    with np.load(os.path.join(_store_path(country), "arrays.npz")) as arrays:
+        return _parameters(
+            meta,
+            {
+                name: arrays[f"{year}_{name}"]
+                for name in ["hourly_cycle_table", "residuals"]
+            },
+        )
+
+
+def _parameters(meta: dict, arrays: dict) -> tuple:
+    params = {
+        "trend": meta["trend"],
+        "weekly_cycle": meta["weekly_cycle"],
+        "hourly_cycle_table": arrays["hourly_cycle_table"],
+    }
+    residual_model = {"residuals": arrays["residuals"], **meta["residual_model"]}
+    return params, residual_model, meta["mean_price"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fits the price model of all countries and full years "
+        "(run from the repository root: python -m src.price_parameters)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of processes (default: all cores)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="refit countries whose price csv did not change",
+    )
+    args = parser.parse_args()
+    for country, years in fit_all_price_parameters(
+        n_workers=args.workers, force=args.force
+    ).items():
+        print(
+            f"{country}: {years if isinstance(years, str) else 'fitted ' + ', '.join(map(str, years))}"
+        )
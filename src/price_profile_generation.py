@@ -1,33 +1,102 @@
+import json
+import os
+
 import numpy as np
 import pandas as pd
-import streamlit as st
-from statsmodels import api as sm
+
+from .binary_store import CACHE_PATH, append_to_store, begin_store, discard_store, finish_store, is_store_valid, \
+    read_store
+from .instrumentation import instrumented
+
+PRICE_DATA_PATH = "data/european_wholesale_electricity_price_data_hourly"
+# Columns of the price csv files (ember-energy.org format)
+PRICE_COLUMNS = {"country": "Country", "datetime_utc": "Datetime (UTC)", "datetime_local": "Datetime (Local)",
+                 "price": "Price (EUR/MWhe)"}
+PRICE_DTYPES = {"datetime_local": np.int64, "datetime_utc": np.int64, "price": np.float32}
 
 def unlog_prices(p: pd.Series) -> pd.Series:
     return pd.Series(np.exp(p))
 
-def fit_trends(X, y) -> dict:
+def fit_simple_linear_regression(x, y, standard_errors:bool=False) -> dict:
+    """
+    Fits y = const + slope * x with ordinary least squares in closed form
+
+    :param x: regressor (array-like)
+    :param y: dependent variable (array-like)
+    :param bool standard_errors: also return the standard errors of the coefficients
+    :return: dictionary with const, slope (and const_se, slope_se)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_mean = x.mean()
+    y_mean = y.mean()
+    x_centered = x - x_mean
+    s_xx = x_centered @ x_centered
+    slope = (x_centered @ (y - y_mean)) / s_xx
+    const = y_mean - slope * x_mean
+    coefficients = {"const": const, "slope": slope}
+
+    if standard_errors:
+        residuals = y - const - slope * x
+        sigma_squared = (residuals @ residuals) / (len(x) - 2)
+        coefficients["const_se"] = np.sqrt(sigma_squared * (1 / len(x) + x_mean ** 2 / s_xx))
+        coefficients["slope_se"] = np.sqrt(sigma_squared / s_xx)
+    return coefficients
+
+
+def fit_statsmodels_regression(x, y, standard_errors:bool=False) -> dict:
+    """
+    Fits y = const + slope * x with statsmodels OLS (reference implementation of fit_simple_linear_regression)
+
+    :param x: regressor (array-like)
+    :param y: dependent variable (array-like)
+    :param bool standard_errors: also return the standard errors of the coefficients
+    :return: dictionary with const, slope (and const_se, slope_se)
+    """
+    from statsmodels import api as sm
+
+    model = sm.OLS(np.asarray(y, dtype=float), sm.add_constant(np.asarray(x, dtype=float))).fit()
+    coefficients = {"const": model.params[0], "slope": model.params[1]}
+    if standard_errors:
+        coefficients["const_se"] = model.bse[0]
+        coefficients["slope_se"] = model.bse[1]
+    return coefficients
+
+
+REGRESSION_BACKENDS = {
+    "numpy": fit_simple_linear_regression,
+    "statsmodels": fit_statsmodels_regression,
+}
+
+
+@instrumented()
+def fit_trends(X, y, backend:str="numpy", standard_errors:bool=False) -> dict:
+    coefficients = REGRESSION_BACKENDS[backend](X, y, standard_errors)
     trend_params = {}
-    X = sm.add_constant(X)
-    model = sm.OLS(y, X).fit()
-    trend_params["X_0"] = model.params["const"]
-    trend_params["gamma"] = model.params["int_time_step"]
+    trend_params["X_0"] = coefficients["const"]
+    trend_params["gamma"] = coefficients["slope"]
+    if standard_errors:
+        trend_params["X_0_se"] = coefficients["const_se"]
+        trend_params["gamma_se"] = coefficients["slope_se"]
     return trend_params
 
 def determine_year_shift(p: pd.DataFrame) -> float:
     idxmin = p.groupby(["weekday", "hour"]).mean()["log(p) no trend"].idxmin()
     weekday, hour = idxmin
 
-    year_shift = p[(p["weekday"] == weekday) & (p["hour"] == hour)]["int_time_step"][0]
+    year_shift = p[(p["weekday"] == weekday) & (p["hour"] == hour)]["int_time_step"].iloc[0]
     rho = (year_shift) * np.pi / 168
     return rho
 
-def fit_week_cycle(X, y, rho) -> dict:
+@instrumented()
+def fit_week_cycle(X, y, rho, backend:str="numpy", standard_errors:bool=False) -> dict:
+    coefficients = REGRESSION_BACKENDS[backend](X, y, standard_errors)
     weekly_trend = {}
-    X = sm.add_constant(X)
-    model = sm.OLS(y, X).fit()
-    weekly_trend["alpha"] = model.params["const"]
-    weekly_trend["beta"] = model.params["int_time_step"]
+    weekly_trend["alpha"] = coefficients["const"]
+    weekly_trend["beta"] = coefficients["slope"]
+    if standard_errors:
+        weekly_trend["alpha_se"] = coefficients["const_se"]
+        weekly_trend["beta_se"] = coefficients["slope_se"]
     return weekly_trend
 
 
@@ -38,7 +107,7 @@ def add_time_columns(p: pd.DataFrame, selected_year=None) -> pd.DataFrame:
     p["day"] = p.index.day
     p["hour"] = p.index.hour
     if selected_year is not None:
-        p = p[p["year"] == selected_year]
+        p = p[p["year"] == selected_year].copy()
 
     p["int_time_step"] = range(len(p))
 
@@ -54,6 +123,7 @@ def add_time_columns(p: pd.DataFrame, selected_year=None) -> pd.DataFrame:
     p["weekend"] = p["weekday"].isin([5, 6])
     return p
 
+@instrumented()
 def fit_daily_cycle(p: pd.DataFrame) -> dict:
     hourly_means = p.groupby(["winter", "spring", "summer", "autumn", "weekend", "hour"]).mean()[
         "log(p) no weekly cycle"]
@@ -62,19 +132,59 @@ def fit_daily_cycle(p: pd.DataFrame) -> dict:
 
     return hourly_means
 
-@st.cache_data
-def fit_electricty_price_trends(p: pd.DataFrame, selected_years) -> tuple:
+
+# Season index (0 winter, 1 spring, 2 summer, 3 autumn) for the months 1-12 (index 0 is unused)
+SEASON_OF_MONTH = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+
+def hourly_cycle_to_table(hourly_cycle: pd.Series) -> np.ndarray:
+    """
+    Converts the fitted hourly cycle into a dense season x weekend x hour lookup table
+
+    Combinations that were not part of the fitted data are set to 0 (no hourly deviation).
+
+    :param pd.Series hourly_cycle: hourly cycle as returned by fit_daily_cycle
+    :return: array with shape (4, 2, 24)
+    """
+    table = np.zeros((4, 2, 24))
+    winter, spring, summer, autumn, weekend, hour = (np.asarray(level) for level in
+                                                      zip(*hourly_cycle.index.to_list()))
+    season = np.argmax(np.column_stack([winter, spring, summer, autumn]), axis=1)
+    table[season, weekend.astype(int), hour.astype(int)] = hourly_cycle.to_numpy()
+    return table
+
+
+def hourly_calendar(year:int) -> tuple:
+    """
+    Returns season, weekend and hour index of every hour of a year (local time without daylight saving time)
+
+    :param int year: year
+    :return: arrays season (0-3), weekend (0/1) and hour (0-23)
+    """
+    hours = np.arange(np.datetime64(f"{year}-01-01T00", "h"), np.datetime64(f"{year + 1}-01-01T00", "h"))
+    days = hours.astype("datetime64[D]").astype(np.int64)
+    months = hours.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    # 1970-01-01 was a Thursday (weekday 3)
+    weekend = ((days + 3) % 7 >= 5).astype(int)
+    return SEASON_OF_MONTH[months], weekend, np.arange(len(hours)) % 24
+
+@instrumented()
+def fit_electricty_price_trends(p: pd.DataFrame, selected_years, backend:str="numpy",
+                                standard_errors:bool=False) -> tuple:
     """
     Fits electricity price trends (drift over the year, annual, weekly, daily) based on
     https://www.sciencedirect.com/science/article/pii/S0140988311001721#f0015
 
     :param pd.DataFrame p: Dataframe with datetime index and column p
+    :param selected_years: year to fit the trends for (None uses the full data)
+    :param str backend: regression backend for trend and weekly cycle ("numpy" or "statsmodels")
+    :param bool standard_errors: add standard errors of the regression coefficients to the parameters
     :return: dictonary with fitting coefficients
     """
     params = {}
 
     # add time_cols
-    p = add_time_columns(p, selected_years)
+    p = add_time_columns(p.copy(), selected_years)
 
     # Remove negative prices
     p["p_non_neg"] = np.where(p["p"] <= 0, 0.01, p["p"])
@@ -82,7 +192,7 @@ def fit_electricty_price_trends(p: pd.DataFrame, selected_years) -> tuple:
     p["log(p)"] = np.log(p["p_non_neg"])
 
     # Fit trend
-    trend_params = fit_trends(p["int_time_step"], p["log(p)"])
+    trend_params = fit_trends(p["int_time_step"], p["log(p)"], backend, standard_errors)
     params["trend"] = trend_params
 
     p["trend"] = trend_params["X_0"] + trend_params["gamma"] * p["int_time_step"]
@@ -92,7 +202,7 @@ def fit_electricty_price_trends(p: pd.DataFrame, selected_years) -> tuple:
     phase_shift = determine_year_shift(p)
     x = np.abs(np.sin(p["int_time_step"] * np.pi / 168 - phase_shift))
     y = p["log(p) no trend"]
-    week_params = fit_week_cycle(x, y, phase_shift)
+    week_params = fit_week_cycle(x, y, phase_shift, backend, standard_errors)
     params["weekly_cycle"] = week_params
     params["weekly_cycle"]["phase_shift"] = phase_shift
 
@@ -103,6 +213,7 @@ def fit_electricty_price_trends(p: pd.DataFrame, selected_years) -> tuple:
     # Fit hourly cycle
     week_params = fit_daily_cycle(p)
     params["hourly_cycle"] = week_params
+    params["hourly_cycle_table"] = hourly_cycle_to_table(week_params)
 
     p["hourly_mean"] = p.groupby(["winter", "spring", "summer", "autumn", "weekend", "hour"])[
         "log(p) no weekly cycle"].transform("mean")
@@ -114,33 +225,318 @@ def fit_electricty_price_trends(p: pd.DataFrame, selected_years) -> tuple:
 
     return p, params
 
-@st.cache_data
+def generate_log_price_cycles(params, scaling_factors, years) -> np.ndarray:
+    """
+    Generates the logarithmic hourly price cycle (trend, weekly and hourly cycle) for many profiles at once
+
+    The hourly cycle is evaluated with a season x weekend x hour lookup table. The values of scaling_factors and years
+    can be scalars or 1-D arrays and are broadcast against each other, each element is one profile.
+
+    :param dict params: fitted parameters (see fit_electricty_price_trends)
+    :param dict scaling_factors: scaling factors trend, weekly_factor and hourly_factor
+    :param years: year(s) of the profiles
+    :return: array with shape (number of profiles, 8784), hours after the end of a non-leap year are nan
+    """
+    table = params.get("hourly_cycle_table")
+    if table is None:
+        table = hourly_cycle_to_table(params["hourly_cycle"])
+
+    factor_names = ["trend", "weekly_factor", "hourly_factor"]
+    years, *factors = np.broadcast_arrays(np.atleast_1d(years),
+                                          *(np.atleast_1d(scaling_factors[name]) for name in factor_names))
+    trend_f, weekly_f, hourly_f = (np.asarray(f, dtype=float)[:, None] for f in factors)
+
+    n_hours = 8784
+    time_step = np.arange(n_hours)
+    unique_years, year_index = np.unique(years, return_inverse=True)
+    hourly_cycle = np.full((len(unique_years), n_hours), np.nan)
+    for i, year in enumerate(unique_years):
+        season, weekend, hour = hourly_calendar(int(year))
+        hourly_cycle[i, :len(hour)] = table[season, weekend, hour]
+
+    trend = params["trend"]["X_0"] + params["trend"]["gamma"] * time_step * trend_f
+    weekly_cycle = (params["weekly_cycle"]["alpha"] + params["weekly_cycle"]["beta"] * np.abs(
+        np.sin(time_step * np.pi / 168 - params["weekly_cycle"]["phase_shift"]))) * weekly_f
+
+    return trend + weekly_cycle + hourly_cycle[year_index] * hourly_f
+
+
+def scale_price_profiles(log_prices:np.ndarray, p_mean, overall_factor, reference_mean=None) -> np.ndarray:
+    """
+    Converts logarithmic price profiles into prices with a given mean and scaled deviation from the mean
+
+    :param np.ndarray log_prices: logarithmic prices with shape (number of profiles, number of hours), nan is ignored
+    :param p_mean: average electricity price (scalar or one value per profile)
+    :param overall_factor: scaling factor of the deviation from the mean (scalar or one value per profile)
+    :param reference_mean: price level that is moved to p_mean (scalar or one value per profile), None for the mean
+        of every profile, so that every profile has the mean p_mean
+    :return: prices with the same shape as log_prices
+    """
+    price_profile = np.exp(log_prices)
+    p_mean = np.reshape(p_mean, (-1, 1))
+    overall_factor = np.reshape(overall_factor, (-1, 1))
+    if reference_mean is None:
+        reference_mean = np.nanmean(price_profile, axis=1, keepdims=True)
+    else:
+        reference_mean = np.reshape(reference_mean, (-1, 1))
+    price_profile_zero_mean = (price_profile - reference_mean) * overall_factor
+    return price_profile_zero_mean + p_mean
+
+
+def generate_electricity_price_profiles(params, p_mean, scaling_factors, years) -> np.ndarray:
+    """
+    Generates hourly electricity price profiles for many years and/or scaling factor combinations at once
+
+    The values of scaling_factors, p_mean and years can be scalars or 1-D arrays and are broadcast against each other,
+    each element is one profile.
+
+    :param dict params: fitted parameters (see fit_electricty_price_trends)
+    :param p_mean: average electricity price
+    :param dict scaling_factors: scaling factors trend, weekly_factor, hourly_factor and overall_factor
+    :param years: year(s) of the profiles
+    :return: array with shape (number of profiles, 8784), hours after the end of a non-leap year are nan
+    """
+    years, p_mean, overall_factor = np.broadcast_arrays(np.atleast_1d(years), np.atleast_1d(p_mean),
+                                                        np.atleast_1d(scaling_factors["overall_factor"]))
+    log_prices = generate_log_price_cycles(params, scaling_factors, years)
+    return scale_price_profiles(log_prices, p_mean, overall_factor)
+
+
+@instrumented()
 def generate_electricity_price_profile(params, p_mean, scaling_factors, year):
     date_rng = pd.date_range(start=str(year) + '-01-01', end=str(year) + '-12-31 23:45:00', freq='1h')
     p = pd.DataFrame(index=date_rng)
     p = add_time_columns(p)
 
-    trend = (params["trend"]["X_0"] + params["trend"]["gamma"] * p["int_time_step"]* scaling_factors["trend"])
+    p["p"] = generate_electricity_price_profiles(params, p_mean, scaling_factors, year)[0, :len(p)]
 
-    weekly_cycle = (params["weekly_cycle"]["alpha"] + params["weekly_cycle"]["beta"] * np.abs(
-        np.sin(p["int_time_step"] * np.pi / 168 -  params["weekly_cycle"]["phase_shift"])))*scaling_factors["weekly_factor"]
+    return p
 
-    hourly_cycle = pd.merge(p, params["hourly_cycle"],right_on=["winter", "spring", "summer", "autumn", "weekend", "hour"], left_on=["winter", "spring", "summer", "autumn", "weekend", "hour"])
-    hourly_cycle = hourly_cycle["hourly_cycle_log"] * scaling_factors["hourly_factor"]
+def available_price_countries() -> list:
+    """
+    Lists all countries for which hourly wholesale electricity prices are available
 
-    price_profile = np.exp(trend.values + weekly_cycle.values + hourly_cycle.values)
+    :return: list of country names
+    """
+    return sorted(f.replace(".csv", "") for f in os.listdir(PRICE_DATA_PATH) if f.endswith(".csv"))
 
-    price_profile_zero_mean = (price_profile - price_profile.mean()) * scaling_factors["overall_factor"]
 
-    p["p"] = price_profile_zero_mean + p_mean
+def _add_year_statistics(statistics:dict, country:str, local_time:np.ndarray, price:np.ndarray,
+                         first_row:int) -> None:
+    """
+    Adds the rows of a chunk to the running statistics per year (local time) of a country
+    """
+    years = local_time.view("datetime64[ns]").astype("datetime64[Y]").astype(np.int64) + 1970
+    unique_years, start = np.unique(years, return_index=True)
+    valid = np.isfinite(price)
+    values = np.where(valid, price, 0).astype(float)
+    rows = np.arange(len(years)) + first_row
+    for year, i in zip(unique_years, start):
+        in_year = years == year
+        year_values = values[in_year & valid]
+        entry = statistics.setdefault((country, int(year)), {
+            "hours": 0, "valid": 0, "sum": 0.0, "sum_squares": 0.0, "min": np.inf, "max": -np.inf,
+            "first_row": int(rows[i]), "last_row": int(rows[i])})
+        entry["hours"] += int(in_year.sum())
+        entry["valid"] += len(year_values)
+        entry["sum"] += float(year_values.sum())
+        entry["sum_squares"] += float((year_values ** 2).sum())
+        if len(year_values):
+            entry["min"] = min(entry["min"], float(year_values.min()))
+            entry["max"] = max(entry["max"], float(year_values.max()))
+        entry["last_row"] = int(rows[in_year][-1])
+
+
+def _year_statistics(entry:dict, year:int) -> dict:
+    """
+    :return: json serializable statistics of a year from the running statistics
+    """
+    hours_in_year = int((np.datetime64(f"{year + 1}-01-01") - np.datetime64(f"{year}-01-01")).astype(int) * 24)
+    mean = entry["sum"] / entry["valid"] if entry["valid"] else None
+    return {
+        "hours": entry["hours"],
+        "missing_prices": entry["hours"] - entry["valid"],
+        "completeness": entry["valid"] / hours_in_year,
+        # same criterion as before the statistics were stored (at least 8760 hours, daylight saving time included)
+        "complete": entry["hours"] >= 8760,
+        "mean": mean,
+        "std": float(np.sqrt(max(entry["sum_squares"] / entry["valid"] - mean ** 2, 0))) if entry["valid"] else None,
+        "min": entry["min"] if entry["valid"] else None,
+        "max": entry["max"] if entry["valid"] else None,
+        # rows of the year in the store, the year is contiguous if last_row - first_row + 1 == hours
+        "first_row": entry["first_row"],
+        "last_row": entry["last_row"],
+    }
+
+
+@instrumented()
+def ingest_price_csv(source:str, store_root:str=None, country:str=None, columns:dict=None, chunk_size:int=1 << 16,
+                     datetime_format:str="%Y-%m-%d %H:%M:%S") -> dict:
+    """
+    Streams a csv of hourly prices (one or many countries) in chunks into one columnar binary store per country
+
+    Only one chunk is in memory at a time, the columns are appended to the stores on disk. Per country and year (local
+    time) the number of hours, missing prices, completeness, mean, standard deviation, min and max are computed on the
+    fly and stored in the meta data of the store (see load_price_statistics).
+
+    :param str source: path of the csv file (e.g. ember-energy.org exports or ENTSO-E exports with columns mapped)
+    :param str store_root: directory of the stores, one subdirectory per country (the loaders, e.g.
+        load_price_columns, take the same store_root)
+    :param str country: store all rows under this name (e.g. the file name), by default the rows are split by the
+        country column
+    :param dict columns: csv column of 'country', 'datetime_utc', 'datetime_local' and 'price' (EUR/MWh), defaults
+        to PRICE_COLUMNS
+    :param int chunk_size: rows per chunk
+    :param str datetime_format: format of the datetimes
+    :return: dictionary with the statistics per year per country
+    """
+    store_root = _price_store_root(store_root)
+    columns = {**PRICE_COLUMNS, **(columns or {})}
+    usecols = [columns[name] for name in ["datetime_utc", "datetime_local", "price"]]
+    if country is None:
+        usecols.append(columns["country"])
+
+    statistics, rows, builds = {}, {}, {}
+    try:
+        for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunk_size):
+            arrays = {
+                "datetime_local": pd.to_datetime(chunk[columns["datetime_local"]], format=datetime_format).to_numpy(
+                    dtype="datetime64[ns]").view(np.int64),
+                "datetime_utc": pd.to_datetime(chunk[columns["datetime_utc"]], format=datetime_format).to_numpy(
+                    dtype="datetime64[ns]").view(np.int64),
+                "price": pd.to_numeric(chunk[columns["price"]], errors="coerce").to_numpy(dtype=np.float32),
+            }
+            chunk_countries = np.full(len(chunk), country, dtype=object) if country is not None else \
+                chunk[columns["country"]].astype(str).str.strip().to_numpy()
+            for name in pd.unique(chunk_countries):
+                in_country = chunk_countries == name
+                if name not in rows:
+                    builds[name] = begin_store(os.path.join(store_root, name))
+                    rows[name] = 0
+                country_arrays = {key: array[in_country] for key, array in arrays.items()}
+                append_to_store(builds[name], country_arrays)
+                _add_year_statistics(statistics, name, country_arrays["datetime_local"], country_arrays["price"],
+                                     rows[name])
+                rows[name] += int(in_country.sum())
+    except BaseException:
+        for build_path in builds.values():
+            discard_store(build_path)
+        raise
+
+    result = {}
+    for name in rows:
+        years = {str(year): _year_statistics(entry, year) for (entry_country, year), entry in sorted(statistics.items())
+                 if entry_country == name}
+        finish_store(builds[name], os.path.join(store_root, name), PRICE_DTYPES, [source],
+                     {"country": name, "source": os.path.abspath(source), "years": years})
+        result[name] = years
+    return result
+
+
+def _price_store_root(store_root:str=None) -> str:
+    return store_root or os.path.join(CACHE_PATH, "electricity_prices")
+
+
+def _price_source(store_path:str, ctr_sel:str) -> str:
+    """
+    :return: csv the store was ingested from (e.g. a csv with many countries), PRICE_DATA_PATH/<ctr_sel>.csv for stores
+        without a recorded source or whose source was moved
+    """
+    try:
+        with open(os.path.join(store_path, "meta.json")) as f:
+            source = json.load(f)["meta"].get("source")
+    except (FileNotFoundError, KeyError):
+        source = None
+    if source is None or not os.path.exists(source):
+        source = os.path.join(PRICE_DATA_PATH, f"{ctr_sel}.csv")
+    return source
+
+
+@instrumented()
+def build_price_store(ctr_sel:str, store_root:str=None) -> str:
+    """
+    Converts the hourly price csv of a country into a columnar binary store (float32 prices, int64 timestamps)
 
+    The store is only rebuilt if its csv changed since the last conversion. Stores ingested from another csv (e.g. one
+    with many countries, see ingest_price_csv) are rebuilt from that csv, all others from PRICE_DATA_PATH/<ctr_sel>.csv.
+    The csv is streamed in chunks, so the memory does not grow with the length of the price history.
 
-    return p
+    :param str ctr_sel: country name (name of the csv file or of the country in the ingested csv)
+    :param str store_root: directory of the stores, defaults to the cache of the bundled prices
+    :return: path to the store
+    """
+    store_root = _price_store_root(store_root)
+    store_path = os.path.join(store_root, ctr_sel)
+    source = _price_source(store_path, ctr_sel)
+    if not is_store_valid(store_path, [source]):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"No price data for {ctr_sel}: {source} does not exist")
+        if os.path.basename(source) == f"{ctr_sel}.csv":
+            ingest_price_csv(source, store_root, ctr_sel)
+        else:
+            # the csv holds several countries, the stores of all of them are rebuilt
+            ingest_price_csv(source, store_root)
+    return store_path
+
+
+def load_price_columns(ctr_sel:str, mmap:bool=True, store_root:str=None) -> dict:
+    """
+    Loads the memory-mapped price columns of a country (builds the binary store if required)
 
-@st.cache_data
-def load_electricity_price_profile(ctr_sel):
-    p = pd.read_csv(f"data/european_wholesale_electricity_price_data_hourly/{ctr_sel}.csv", header=[0])
-    p.index =  pd.to_datetime(p["Datetime (Local)"])
-    p = p[["Price (EUR/MWhe)"]]
-    p.columns = ["p"]
-    return p
+    :param str ctr_sel: country name (name of the csv file)
+    :param bool mmap: memory-map the arrays instead of reading them into memory
+    :param str store_root: directory of the stores (see build_price_store)
+    :return: dictionary with int64 arrays datetime_local, datetime_utc (ns since epoch) and float32 array price
+    """
+    arrays, _ = read_store(build_price_store(ctr_sel, store_root), mmap)
+    return arrays
+
+
+def load_price_statistics(ctr_sel:str, store_root:str=None) -> dict:
+    """
+    Returns the statistics per year of the prices of a country, computed when the csv was converted (see
+    ingest_price_csv)
+
+    :param str ctr_sel: country name (name of the csv file)
+    :param str store_root: directory of the stores (see build_price_store)
+    :return: dictionary with hours, missing_prices, completeness, complete, mean, std, min, max, first_row and
+        last_row per year (int)
+    """
+    _, meta = read_store(build_price_store(ctr_sel, store_root))
+    return {int(year): statistics for year, statistics in meta["years"].items()}
+
+
+def complete_price_years(ctr_sel:str, store_root:str=None) -> list:
+    """
+    :param str ctr_sel: country name (name of the csv file)
+    :param str store_root: directory of the stores (see build_price_store)
+    :return: years with prices for the whole year (at least 8760 hours)
+    """
+    return [year for year, statistics in load_price_statistics(ctr_sel, store_root).items()
+            if statistics["complete"]]
+
+
+@instrumented()
+def load_electricity_price_profile(ctr_sel, year:int=None, store_root:str=None):
+    """
+    Loads the hourly prices of a country
+
+    :param ctr_sel: country name (name of the csv file)
+    :param int year: only load this year (local time), all years by default
+    :param str store_root: directory of the stores (see build_price_store)
+    :return: Dataframe with datetime index (local time) and column p in EUR/MWh
+    """
+    columns = load_price_columns(ctr_sel, store_root=store_root)
+    rows = slice(None)
+    if year is not None:
+        statistics = load_price_statistics(ctr_sel, store_root).get(year)
+        if statistics is None:
+            rows = slice(0)
+        elif statistics["last_row"] - statistics["first_row"] + 1 == statistics["hours"]:
+            rows = slice(statistics["first_row"], statistics["last_row"] + 1)
+        else:
+            local_time = np.asarray(columns["datetime_local"]).view("datetime64[ns]")
+            rows = np.flatnonzero(local_time.astype("datetime64[Y]").astype(np.int64) + 1970 == year)
+    index = pd.DatetimeIndex(np.asarray(columns["datetime_local"][rows]).view("datetime64[ns]"),
+                             name="Datetime (Local)")
+    return pd.DataFrame({"p": np.asarray(columns["price"][rows], dtype=float)}, index=index)
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrumented
+from .price_profile_generation import generate_log_price_cycles, scale_price_profiles
+
+
+@instrumented()
+def fit_residual_model(
+    p: pd.DataFrame, block_days: int = 7, window_days: int = 14
+) -> dict:
+    """
+    Prepares a block bootstrap of the random part of the logarithmic electricity price
+
+    Scenarios are built from blocks of whole days of the fitted residuals. Each block is drawn from the same time of the
+    year (shifted by at most window_days, in whole weeks), so that seasonal and weekday patterns in the residuals are
+    kept.
+
+    :param pd.DataFrame p: Dataframe returned by fit_electricty_price_trends (uses column 'log(p) randomness')
+    :param int block_days: length of the bootstrap blocks in days
+    :param int window_days: maximal shift of a block from its position in the year in days
+    :return: dictionary describing the residual model
+    """
+    residuals = p["log(p) randomness"].to_numpy(dtype=float)
+    residuals = residuals[~np.isnan(residuals)]
+    n_days = len(residuals) // 24
+    if n_days < block_days:
+        raise ValueError(
+            f"At least {block_days} days of residuals are required for the block bootstrap"
+        )
+    return {
+        "residuals": residuals[: n_days * 24].astype(np.float32),
+        "block_days": block_days,
+        "window_days": window_days,
+    }
+
+
+def sample_residuals(
+    residual_model: dict, n_scenarios: int, n_hours: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draws random logarithmic price deviations with the block bootstrap
+
+    :param dict residual_model: model as returned by fit_residual_model
+    :param int n_scenarios: number of scenarios
+    :param int n_hours: number of hours per scenario
+    :param np.random.Generator rng: random number generator
+    :return: array with shape (n_scenarios, n_hours)
+    """
+    residuals = residual_model["residuals"]
+    block_length = residual_model["block_days"] * 24
+    n_blocks = -(-n_hours // block_length)
+    last_start_day = len(residuals) // 24 - residual_model["block_days"]
+    block_start_days = np.arange(n_blocks) * residual_model["block_days"]
+
+    # shift blocks by whole weeks only, so that weekday patterns in the residuals stay aligned
+    max_shift = residual_model["window_days"] // 7
+    start_days = (
+        block_start_days
+        + rng.integers(-max_shift, max_shift + 1, size=(n_scenarios, n_blocks)) * 7
+    )
+    start_days = np.where(start_days < 0, start_days % 7, start_days)
+    start_days = np.where(
+        start_days > last_start_day,
+        start_days - 7 * -(-(start_days - last_start_day) // 7),
+        start_days,
+    )
+    starts = np.clip(start_days, 0, last_start_day) * 24
+
+    index = (starts[:, :, None] + np.arange(block_length)).reshape(n_scenarios, -1)[
+        :, :n_hours
+    ]
+    return residuals[index]
+
+
+def expected_price_level(log_cycle: np.ndarray, residual_model: dict) -> float:
+    """
+    Mean price of the fitted year rebuilt from a logarithmic price cycle and the residuals at their own hours, the
+    level around which the block bootstrap draws scenarios (before scaling)
+
+    :param np.ndarray log_cycle: logarithmic price cycle without nan
+    :param dict residual_model: model as returned by fit_residual_model
+    :return: mean of exp(cycle + residuals)
+    """
+    n = min(len(log_cycle), len(residual_model["residuals"]))
+    return float(
+        np.mean(np.exp(log_cycle[:n] + residual_model["residuals"][:n].astype(float)))
+    )
+
+
+def iter_price_scenarios(
+    params: dict,
+    residual_model: dict,
+    n_scenarios: int,
+    p_mean: float,
+    scaling_factors: dict,
+    year: int,
+    chunk_size: int = 1000,
+    seed: int = None,
+    dtype=np.float32,
+    fixed_mean: bool = False,
+):
+    """
+    Generates synthetic hourly electricity price years chunk by chunk (fitted cycle plus random deviations)
+
+    All scenarios are shifted by the same amount, so that p_mean is the expected mean price. The mean of every single
+    scenario varies with the drawn blocks of residuals (uncertainty of the price level), unless fixed_mean is set.
+
+    :param dict params: fitted parameters (see fit_electricty_price_trends)
+    :param dict residual_model: model as returned by fit_residual_model
+    :param int n_scenarios: total number of scenarios
+    :param float p_mean: expected average electricity price of the scenarios
+    :param dict scaling_factors: scaling factors trend, weekly_factor, hourly_factor and overall_factor
+    :param int year: year of the scenarios (calendar of the hourly cycle)
+    :param int chunk_size: maximal number of scenarios per chunk
+    :param int seed: seed of the random number generator
+    :param dtype: data type of the returned arrays
+    :param bool fixed_mean: shift every scenario to the mean p_mean (only the pattern within the year varies)
+    :return: generator of arrays with shape (scenarios in chunk, hours of year)
+    """
+    rng = np.random.default_rng(seed)
+    log_cycle = generate_log_price_cycles(params, scaling_factors, year)[0]
+    log_cycle = log_cycle[~np.isnan(log_cycle)]
+    reference_mean = (
+        None if fixed_mean else expected_price_level(log_cycle, residual_model)
+    )
+
+    for start in range(0, n_scenarios, chunk_size):
+        n = min(chunk_size, n_scenarios - start)
+        log_prices = log_cycle + sample_residuals(
+            residual_model, n, len(log_cycle), rng
+        )
+        yield scale_price_profiles(
+            log_prices, p_mean, scaling_factors["overall_factor"], reference_mean
+        ).astype(dtype)
+
+
+@instrumented()
+def generate_price_scenarios(
+    params: dict,
+    residual_model: dict,
+    n_scenarios: int,
+    p_mean: float,
+    scaling_factors: dict,
+    year: int,
+    chunk_size: int = 1000,
+    seed: int = None,
+    dtype=np.float32,
+    fixed_mean: bool = False,
+) -> np.ndarray:
+    """
+    Generates synthetic hourly electricity price years (fitted cycle plus random deviations)
+
+    :param dict params: fitted parameters (see fit_electricty_price_trends)
+    :param dict residual_model: model as returned by fit_residual_model
+    :param int n_scenarios: number of scenarios
+    :param float p_mean: expected average electricity price of the scenarios
+    :param dict scaling_factors: scaling factors trend, weekly_factor, hourly_factor and overall_factor
+    :param int year: year of the scenarios (calendar of the hourly cycle)
+    :param int chunk_size: number of scenarios generated at once (limits temporary memory)
+    :param int seed: seed of the random number generator
+    :param dtype: data type of the returned array
+    :param bool fixed_mean: shift every scenario to the mean p_mean (see iter_price_scenarios)
+    :return: array with shape (n_scenarios, hours of year)
+    """
+    scenarios = None
+    start = 0
+    for chunk in iter_price_scenarios(
+        params,
+        residual_model,
+        n_scenarios,
+        p_mean,
+        scaling_factors,
+        year,
+        chunk_size,
+        seed,
+        dtype,
+        fixed_mean,
+    ):
+        if scenarios is None:
+            scenarios = np.empty((n_scenarios, chunk.shape[1]), dtype=dtype)
+        scenarios[start : start + len(chunk)] = chunk
+        start += len(chunk)
+    return scenarios
@@ -0,0 +1,262 @@
+import functools
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .carnot_hp_calculations import calculate_allowable_investment_per_kw_el
+from .instrumentation import instrumented
+
+# Inputs of carnot_hp_calculations.calculate_allowable_investment_per_kw_el
+PARAMETERS = ["T_l", "T_h", "h", "p_th", "p_el", "r", "t", "ex_eta"]
+
+
+def inverse_cdf(distribution: tuple, u: ArrayLike) -> np.ndarray:
+    """
+    Transforms uniform samples in [0, 1) into samples of a distribution
+
+    Supported distributions: ("uniform", low, high), ("triangular", low, mode, high), ("normal", mean, std),
+    ("constant", value).
+
+    :param tuple distribution: name of the distribution and its parameters
+    :param ArrayLike u: uniform samples
+    :return: samples of the distribution
+    """
+    kind, *params = distribution
+    u = np.asarray(u, dtype=float)
+    if kind == "uniform":
+        low, high = params
+        return low + u * (high - low)
+    if kind == "triangular":
+        low, mode, high = params
+        if high <= low:
+            return np.full_like(u, low)
+        split = (mode - low) / (high - low)
+        return np.where(
+            u < split,
+            low + np.sqrt(u * (high - low) * (mode - low)),
+            high - np.sqrt((1 - u) * (high - low) * (high - mode)),
+        )
+    if kind == "normal":
+        from scipy.special import ndtri
+
+        mean, std = params
+        return mean + std * ndtri(u)
+    if kind == "constant":
+        return np.full_like(u, params[0])
+    raise ValueError(
+        f"Unknown distribution {kind}, use 'uniform', 'triangular', 'normal' or 'constant'"
+    )
+
+
+def _uniform_samples(
+    n_dimensions: int, start: int, n: int, seed: int, sampling: str
+) -> np.ndarray:
+    """
+    :return: samples start to start + n of the sampling sequence with shape (n, n_dimensions), the same for any
+        chunking
+    """
+    if sampling == "sobol":
+        from scipy.stats import qmc
+
+        sampler = qmc.Sobol(n_dimensions, seed=seed)
+        if start:
+            sampler.fast_forward(start)
+        with warnings.catch_warnings():
+            # the balance properties only hold for powers of two in total, not per chunk
+            warnings.simplefilter("ignore", UserWarning)
+            return sampler.random(n)
+    if sampling == "random":
+        return np.random.default_rng([seed, start]).random((n, n_dimensions))
+    raise ValueError(f"Unknown sampling {sampling}, use 'sobol' or 'random'")
+
+
+def _evaluate_chunk(
+    model,
+    distributions: dict,
+    start: int,
+    n: int,
+    seed: int,
+    sampling: str,
+    shift: float,
+) -> dict:
+    """
+    Evaluates the model on one chunk of the Saltelli design and returns the sums of the Sobol estimators
+    """
+    names = list(distributions)
+    d = len(names)
+    u = _uniform_samples(2 * d, start, n, seed, sampling)
+    a, b = u[:, :d], u[:, d:]
+
+    # rows: f(A), f(B), f(AB_i) with column i of A taken from B
+    from_b = np.zeros((d + 2, d), dtype=bool)
+    from_b[1] = True
+    from_b[np.arange(d) + 2, np.arange(d)] = True
+    inputs = {
+        name: inverse_cdf(
+            distributions[name], np.where(from_b[:, [i]], b[:, i], a[:, i])
+        )
+        for i, name in enumerate(names)
+    }
+    f = np.broadcast_to(model(**inputs), (d + 2, n)) - shift
+
+    valid = np.all(np.isfinite(f), axis=0)
+    f = f[:, valid]
+    f_a, f_b, f_ab = f[0], f[1], f[2:]
+    return {
+        "n": int(valid.sum()),
+        "n_invalid": int(n - valid.sum()),
+        "sum": f_a.sum() + f_b.sum(),
+        "sum_squares": (f_a**2).sum() + (f_b**2).sum(),
+        "first_order": (f_b * (f_ab - f_a)).sum(axis=1),
+        "total_order": ((f_a - f_ab) ** 2).sum(axis=1),
+    }
+
+
+@instrumented()
+def calculate_sobol_indices(
+    model,
+    distributions: dict,
+    n_samples: int,
+    chunk_size: int = 2**14,
+    n_workers: int = 1,
+    seed: int = 0,
+    sampling: str = "sobol",
+) -> dict:
+    """
+    Estimates first order and total Sobol indices of a vectorized model with Saltelli sampling
+
+    The model is evaluated on n_samples * (n_inputs + 2) points (matrices A, B and A with one column from B per input)
+    in chunks of chunk_size base samples, so the memory does not grow with n_samples. Only the sums of the estimators
+    of Saltelli et al. (2010) for the first order and Jansen for the total indices are kept. Chunks can be evaluated in
+    several processes; the results do not depend on chunk_size or n_workers. Samples for which the model is not
+    finite (e.g. without temperature lift) are left out and counted.
+
+    :param model: function of the inputs as keyword arguments that broadcasts over arrays (e.g.
+        calculate_allowable_investment_per_kw_el), has to be picklable for n_workers > 1
+    :param dict distributions: distribution per input (see inverse_cdf), inputs with a 'constant' distribution get an
+        index of zero
+    :param int n_samples: number of base samples
+    :param int chunk_size: base samples per chunk
+    :param int n_workers: number of processes, 1 evaluates in this process, None uses all cores
+    :param int seed: seed of the sampling sequence
+    :param str sampling: 'sobol' (scrambled Sobol sequence, faster convergence) or 'random'
+    :return: dictionary with 'names', 'first_order' and 'total_order' indices, 'mean' and 'std' of the output and the
+        number of used ('n_samples') and left out ('n_invalid') base samples
+    """
+    names = list(distributions)
+    # shift the outputs by the value at the medians for numerically stable sums of squares
+    shift = float(
+        np.nan_to_num(
+            model(**{name: inverse_cdf(distributions[name], 0.5) for name in names})
+        )
+    )
+    chunks = [
+        (start, min(chunk_size, n_samples - start))
+        for start in range(0, n_samples, chunk_size)
+    ]
+
+    if n_workers == 1 or len(chunks) == 1:
+        results = [
+            _evaluate_chunk(model, distributions, start, n, seed, sampling, shift)
+            for start, n in chunks
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+            futures = [
+                executor.submit(
+                    _evaluate_chunk,
+                    model,
+                    distributions,
+                    start,
+                    n,
+                    seed,
+                    sampling,
+                    shift,
+                )
+                for start, n in chunks
+            ]
+            results = [future.result() for future in futures]
+
+    totals = {key: sum(result[key] for result in results) for key in results[0]}
+    n = totals["n"]
+    mean = totals["sum"] / (2 * n)
+    variance = totals["sum_squares"] / (2 * n) - mean**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first_order = totals["first_order"] / n / variance
+        total_order = totals["total_order"] / (2 * n) / variance
+    return {
+        "names": names,
+        "first_order": first_order,
+        "total_order": total_order,
+        "mean": mean + shift,
+        "std": np.sqrt(variance),
+        "n_samples": n,
+        "n_invalid": totals["n_invalid"],
+    }
+
+
+def calculate_tornado(model, base: dict, ranges: dict) -> dict:
+    """
+    Changes one input at a time to the ends of its range (all others at the base case) for a tornado chart
+
+    :param model: function of the inputs as keyword arguments that broadcasts over arrays
+    :param dict base: value per input in the base case
+    :param dict ranges: (low, high) per input to vary
+    :return: dictionary with the output in the base case ('base') and per input the outputs at (low, high)
+    """
+    names = list(ranges)
+    inputs = {
+        name: np.full(2 * len(names), value, dtype=float)
+        for name, value in base.items()
+    }
+    for i, name in enumerate(names):
+        inputs[name][2 * i : 2 * i + 2] = ranges[name]
+    values = np.broadcast_to(model(**inputs), (2 * len(names),))
+    return {
+        "base": float(model(**base)),
+        **{name: (values[2 * i], values[2 * i + 1]) for i, name in enumerate(names)},
+    }
+
+
+def allowable_investment_model(cop_map: str = None):
+    """
+    :param str cop_map: name of a cop map, None for the carnot cop
+    :return: calculate_allowable_investment_per_kw_el as model of the inputs in PARAMETERS (picklable)
+    """
+    return functools.partial(calculate_allowable_investment_per_kw_el, cop_map=cop_map)
+
+
+def calculate_allowable_investment_sensitivity(
+    distributions: dict,
+    n_samples: int,
+    cop_map: str = None,
+    n_workers: int = 1,
+    seed: int = 0,
+    sampling: str = "sobol",
+) -> dict:
+    """
+    Sobol indices of the allowable investment per kW (calculate_allowable_investment_per_kw_el) for distributions of
+    its inputs, see calculate_sobol_indices
+
+    :param dict distributions: distribution per input in PARAMETERS (see inverse_cdf)
+    :param int n_samples: number of base samples
+    :param str cop_map: name of a cop map, None for the carnot cop
+    :param int n_workers: number of processes
+    :param int seed: seed of the sampling sequence
+    :param str sampling: 'sobol' or 'random'
+    :return: see calculate_sobol_indices
+    """
+    unknown = set(distributions) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown inputs {sorted(unknown)}, use {PARAMETERS}")
+    return calculate_sobol_indices(
+        allowable_investment_model(cop_map),
+        distributions,
+        n_samples,
+        n_workers=n_workers,
+        seed=seed,
+        sampling=sampling,
+    )
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+from .time_alignment import align_series, to_datetime64
+
+
+def seasonal_temperature_profile(
+    datetimes: ArrayLike,
+    mean: float,
+    amplitude: float,
+    coldest_day: float = 15,
+    daily_amplitude: float = 0.0,
+    coldest_hour: float = 5,
+) -> np.ndarray:
+    """
+    Generates a temperature with an annual and a daily cosine cycle, e.g. of ambient air or river water as heat source
+
+    :param ArrayLike datetimes: datetimes of the time steps
+    :param float mean: annual mean temperature in Celsius
+    :param float amplitude: amplitude of the annual cycle in Kelvin (half the difference of summer and winter)
+    :param float coldest_day: day of the year with the lowest temperature (0 = January 1)
+    :param float daily_amplitude: amplitude of the daily cycle in Kelvin
+    :param float coldest_hour: hour of the day with the lowest temperature
+    :return: temperature in Celsius for every time step
+    """
+    datetimes = to_datetime64(datetimes)
+    days = (datetimes - datetimes.astype("datetime64[Y]")) / np.timedelta64(1, "D")
+    hours = days % 1 * 24
+    return (
+        mean
+        - amplitude * np.cos(2 * np.pi * (days - coldest_day) / 365.25)
+        - daily_amplitude * np.cos(2 * np.pi * (hours - coldest_hour) / 24)
+    )
+
+
+def align_temperature_profiles(
+    temperatures: pd.DataFrame, datetimes: ArrayLike
+) -> pd.DataFrame:
+    """
+    Aligns measured source and sink temperatures to the time steps of a demand profile
+
+    The temperatures can have any regular step (the most common step is used) and are moved to the year of the
+    demand profile by time of the year.
+
+    :param pd.DataFrame temperatures: Dataframe with columns datetime, T_l (heat source) and T_h (heat sink) in Celsius
+    :param ArrayLike datetimes: datetimes of the demand profile
+    :return: Dataframe with columns datetime, T_l and T_h at the datetimes, missing time steps are filled with the
+        previous value
+    """
+    missing = [c for c in ["datetime", "T_l", "T_h"] if c not in temperatures.columns]
+    if missing:
+        raise ValueError(
+            f"Temperature profiles need the columns datetime, T_l and T_h, missing: {', '.join(missing)}"
+        )
+    if len(temperatures) < 2:
+        raise ValueError("Temperature profiles need at least two time steps")
+    source = to_datetime64(pd.to_datetime(temperatures["datetime"]))
+    step = pd.Series(np.diff(source)).mode()[0].to_timedelta64()
+    years, counts = np.unique(
+        source.astype("datetime64[Y]").astype(int) + 1970, return_counts=True
+    )
+    aligned = pd.DataFrame({"datetime": pd.to_datetime(datetimes)})
+    for column in ["T_l", "T_h"]:
+        values = align_series(
+            source,
+            temperatures[column].to_numpy(dtype=float),
+            aligned["datetime"],
+            years[counts.argmax()],
+            step,
+        )
+        aligned[column] = pd.Series(values).ffill().bfill().to_numpy()
+    return aligned
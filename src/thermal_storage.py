@@ -0,0 +1,228 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .batch_evaluation import (
+    calculate_allowable_investment_from_statistics,
+    calculate_sufficient_statistics,
+)
+from .instrumentation import instrumented
+
+
+def check_storage_inputs(demand: np.ndarray, hp_capacity: float) -> None:
+    """
+    Raises a ValueError if the heat pump cannot cover the peak demand (there is no other heat provision)
+
+    :param np.ndarray demand: demand profiles normalized to a peak of 1
+    :param float hp_capacity: heat output of heat pump as fraction of peak demand
+    """
+    if np.nanmax(demand) > hp_capacity + 1e-9:
+        raise ValueError(
+            f"The heat pump capacity ({hp_capacity}) needs to cover the peak demand "
+            f"({np.nanmax(demand)})"
+        )
+
+
+@instrumented()
+def dispatch_storage_lp(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    storage_capacity: float,
+    charge_power: float,
+    loss_rate: float = 0.0,
+    hp_capacity: float = 1.0,
+    delta_t: float = 0.25,
+    horizon_hours: int = 48,
+    commit_hours: int = 24,
+) -> np.ndarray:
+    """
+    Finds the heat pump operation with thermal storage that minimizes the electricity costs (linear program, solved
+    with a rolling horizon)
+
+    Each window of horizon_hours is solved with scipy's HiGHS solver, the first commit_hours are kept and the next
+    window starts with the resulting storage level. The heat pump always covers the full demand, directly or from the
+    storage.
+
+    :param ArrayLike demand: demand profile normalized to a peak of 1 with shape (n_steps,)
+    :param ArrayLike p_el: electricity prices with shape (n_steps,), missing values are treated as zero
+    :param float storage_capacity: storage capacity in hours of peak demand
+    :param float charge_power: maximal charge and discharge power as fraction of peak demand
+    :param float loss_rate: share of the stored heat lost per hour
+    :param float hp_capacity: heat output of heat pump as fraction of peak demand (at least 1)
+    :param float delta_t: length of a time step in hours
+    :param int horizon_hours: length of the optimization windows in hours
+    :param int commit_hours: hours of each window that are kept before the next window is solved
+    :return: heat output of the heat pump with shape (n_steps,)
+    """
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    demand = np.asarray(demand, dtype=float)
+    p_el = np.nan_to_num(np.asarray(p_el, dtype=float))
+    check_storage_inputs(demand, hp_capacity)
+    retention = 1 - loss_rate * delta_t
+    n_horizon = int(round(horizon_hours / delta_t))
+    n_commit = int(round(commit_hours / delta_t))
+
+    heat_output = np.empty_like(demand)
+    level = 0.0
+    for start in range(0, len(demand), n_commit):
+        d = demand[start : start + n_horizon]
+        n = len(d)
+        # variables: heat output q (n), storage level s (n); s_t - retention * s_t-1 - dt * q_t = -dt * d_t
+        a_eq = sparse.hstack(
+            [-delta_t * sparse.eye(n), sparse.eye(n) - retention * sparse.eye(n, k=-1)]
+        ).tocsc()
+        b_eq = -delta_t * d
+        b_eq[0] += retention * level
+        bounds = np.r_[
+            np.c_[
+                np.maximum(0, d - charge_power),
+                np.minimum(hp_capacity, d + charge_power),
+            ],
+            np.c_[np.zeros(n), np.full(n, storage_capacity)],
+        ]
+        cost = np.r_[p_el[start : start + n] * delta_t, np.zeros(n)]
+        result = linprog(cost, A_eq=a_eq, b_eq=b_eq, bounds=bounds, method="highs")
+        if not result.success:
+            raise RuntimeError(
+                f"Storage dispatch failed at time step {start}: {result.message}"
+            )
+
+        keep = min(n_commit, n)
+        heat_output[start : start + keep] = result.x[:keep]
+        level = result.x[n + keep - 1]
+    return heat_output
+
+
+@instrumented()
+def dispatch_storage_greedy(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    storage_capacity: float,
+    charge_power: float,
+    loss_rate: float = 0.0,
+    hp_capacity: float = 1.0,
+    delta_t: float = 0.25,
+    window_hours: int = 24,
+    quantiles: tuple = (0.25, 0.75),
+) -> np.ndarray:
+    """
+    Heuristic heat pump operation with thermal storage for fast screening of many profiles
+
+    The storage is charged when the price is in the lower quantile of its window, up to the heat that can be
+    discharged in the upper price quantile later in the same window. It is discharged when the price is in the upper
+    quantile and above the average price of the stored heat.
+
+    :param ArrayLike demand: demand profiles normalized to a peak of 1 with shape (n_steps,) or (n_profiles, n_steps)
+    :param ArrayLike p_el: electricity prices with shape (n_steps,), missing values are treated as zero
+    :param float storage_capacity: storage capacity in hours of peak demand
+    :param float charge_power: maximal charge and discharge power as fraction of peak demand
+    :param float loss_rate: share of the stored heat lost per hour
+    :param float hp_capacity: heat output of heat pump as fraction of peak demand (at least 1)
+    :param float delta_t: length of a time step in hours
+    :param int window_hours: window in which the price quantiles are determined
+    :param tuple quantiles: price quantiles below which the storage is charged and above which it is discharged
+    :return: heat output of the heat pump with the shape of demand
+    """
+    demand = np.asarray(demand, dtype=float)
+    p_el = np.nan_to_num(np.asarray(p_el, dtype=float))
+    check_storage_inputs(demand, hp_capacity)
+    retention = 1 - loss_rate * delta_t
+
+    n_window = int(round(window_hours / delta_t))
+    n_steps = len(p_el)
+    n_pad = -n_steps % n_window
+    padded = np.r_[p_el, np.full(n_pad, np.nan)].reshape(-1, n_window)
+    low, high = np.nanquantile(padded, quantiles, axis=1)
+    low = np.repeat(low, n_window)[:n_steps]
+    high = np.repeat(high, n_window)[:n_steps]
+
+    # heat that can still be discharged in expensive time steps later in the same window (charging target)
+    profiles = np.atleast_2d(demand)
+    dischargeable = (
+        np.where(p_el >= high, np.minimum(profiles, charge_power), 0) * delta_t
+    )
+    dischargeable = np.pad(dischargeable, ((0, 0), (0, n_pad))).reshape(
+        len(profiles), -1, n_window
+    )
+    later = np.cumsum(dischargeable[..., ::-1], axis=2)[..., ::-1] - dischargeable
+    target = np.minimum(later.reshape(len(profiles), -1)[:, :n_steps], storage_capacity)
+
+    heat_output = np.empty_like(profiles)
+    level = np.zeros(len(profiles))
+    stored_price = np.zeros(len(profiles))
+    for i in range(n_steps):
+        d = profiles[:, i]
+        level = level * retention
+        q = d
+        if p_el[i] <= low[i]:
+            q = np.minimum(
+                np.minimum(hp_capacity, d + charge_power),
+                d + (target[:, i] - level) / delta_t,
+            )
+            q = np.maximum(q, d)
+            charged = (q - d) * delta_t
+            stored_price = np.where(
+                charged > 0,
+                (stored_price * level + p_el[i] * charged)
+                / np.maximum(level + charged, 1e-12),
+                stored_price,
+            )
+        elif p_el[i] >= high[i]:
+            discharge = (p_el[i] > stored_price / retention) & (level > 0)
+            q = np.where(
+                discharge,
+                np.maximum(np.maximum(0, d - charge_power), d - level / delta_t),
+                d,
+            )
+        level = np.clip(level + (q - d) * delta_t, 0, storage_capacity)
+        heat_output[:, i] = q
+    return heat_output.reshape(demand.shape)
+
+
+def calculate_allowable_investment_storage(
+    demand: ArrayLike,
+    heat_output: ArrayLike,
+    p_el: ArrayLike,
+    cop: ArrayLike,
+    p_th: float,
+    r: float,
+    t: float,
+    p_el_f: float = 1,
+    hp_capacity: float = 1.0,
+    delta_t: float = 0.25,
+    cop_weights: ArrayLike = None,
+) -> np.ndarray:
+    """
+    Calculates the allowable investment per kW_el of a heat pump with thermal storage
+
+    The heat pump replaces the alternative heat provision for the full demand, but buys electricity for its actual
+    heat output (including storage losses). The result has to cover the investment in heat pump and storage.
+    For a cop that varies over the year pass the design cop and the cop weights, and dispatch the storage on the
+    weighted prices p_el * w_t of each profile.
+
+    :param ArrayLike demand: demand profiles normalized to a peak of 1 with shape (n_profiles, n_steps)
+    :param ArrayLike heat_output: heat output of the heat pump with shape (n_profiles, n_steps), see
+        dispatch_storage_lp and dispatch_storage_greedy
+    :param ArrayLike p_el: electricity prices in [currency]/kWh with shape (n_steps,)
+    :param ArrayLike cop: cop of heat pump per profile with shape (n_profiles,)
+    :param float p_th: cost of alternative heat generation in [currency]/kWh
+    :param float r: interest rate (decimal)
+    :param float t: lifetime in years
+    :param float p_el_f: multiplier for the electricity prices
+    :param float hp_capacity: heat output of heat pump as fraction of peak demand
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike cop_weights: weights of the electricity costs per time step with shape (n_profiles, n_steps), see
+        carnot_hp_calculations.calculate_cop_weights
+    :return: allowable investment costs in [currency]/kW_el with shape (n_profiles,)
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    heat_output = np.atleast_2d(np.asarray(heat_output, dtype=float))
+    heat, _ = calculate_sufficient_statistics(demand, p_el, delta_t)
+    _, electricity_costs = calculate_sufficient_statistics(
+        heat_output, p_el, delta_t, cop_weights=cop_weights
+    )
+    allowable = calculate_allowable_investment_from_statistics(
+        heat, electricity_costs, cop, p_th, r, t, p_el_f
+    )
+    return allowable[:, 0] / hp_capacity
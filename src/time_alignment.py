@@ -0,0 +1,174 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .instrumentation import instrumented
+
+# Offset from January 1 at which February 29 starts in a leap year (and March 1 in other years)
+FEB_29_OFFSET = np.timedelta64(59, "D")
+
+
+def to_datetime64(datetimes: ArrayLike) -> np.ndarray:
+    """
+    Converts datetimes (DatetimeIndex, Series, datetime64 or int64 ns since epoch) into a datetime64[ns] array
+
+    :param ArrayLike datetimes: datetimes
+    :return: datetime64[ns] array
+    """
+    datetimes = np.asarray(datetimes)
+    if np.issubdtype(datetimes.dtype, np.integer):
+        return datetimes.astype(np.int64).view("datetime64[ns]")
+    return datetimes.astype("datetime64[ns]")
+
+
+def is_leap_year(years: ArrayLike) -> np.ndarray:
+    """
+    :param ArrayLike years: years as integers
+    :return: True for leap years
+    """
+    years = np.asarray(years)
+    return (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+
+def shift_to_year(datetimes: ArrayLike, year: int) -> np.ndarray:
+    """
+    Moves datetimes to the same wall-clock date and time in another year
+
+    February 29 is mapped to February 28 if the target year is no leap year. If the target year is a leap year and the
+    original year is not, February 29 of the target year is skipped.
+
+    :param ArrayLike datetimes: datetimes
+    :param int year: target year
+    :return: datetime64[ns] array
+    """
+    datetimes = to_datetime64(datetimes)
+    start_of_year = datetimes.astype("datetime64[Y]")
+    offset = datetimes - start_of_year.astype("datetime64[ns]")
+    source_leap = is_leap_year(start_of_year.astype(np.int64) + 1970)
+    target_leap = is_leap_year(year)
+    after_feb_28 = offset >= FEB_29_OFFSET
+    one_day = np.timedelta64(1, "D")
+    offset = offset - np.where(
+        source_leap & ~target_leap & after_feb_28, one_day, np.timedelta64(0, "D")
+    )
+    offset = offset + np.where(
+        ~source_leap & target_leap & after_feb_28, one_day, np.timedelta64(0, "D")
+    )
+    return np.datetime64(f"{year}-01-01", "ns") + offset
+
+
+def regularize_series(
+    datetimes: ArrayLike,
+    values: ArrayLike,
+    step: np.timedelta64 = np.timedelta64(1, "h"),
+    fill_gaps: bool = True,
+) -> tuple:
+    """
+    Puts an irregular local-time series on a regular grid
+
+    Values that fall into the same step (e.g. the repeated hour when daylight saving time ends) are averaged. Steps
+    without value (e.g. the skipped hour when daylight saving time starts, or missing values) are filled with the
+    previous value.
+
+    :param ArrayLike datetimes: datetimes of the values
+    :param ArrayLike values: values
+    :param np.timedelta64 step: step of the regular grid
+    :param bool fill_gaps: fill empty steps with the previous value (otherwise nan)
+    :return: start of the grid (datetime64[ns]), values on the grid
+    """
+    datetimes = to_datetime64(datetimes)
+    values = np.asarray(values, dtype=float)
+    step = np.timedelta64(step).astype("timedelta64[ns]")
+    start = datetimes.min()
+    start = start - (start - np.datetime64(0, "ns")) % step
+
+    slot = ((datetimes - start) // step).astype(np.int64)
+    valid = ~np.isnan(values)
+    n_steps = slot.max() + 1
+    sums = np.bincount(slot[valid], weights=values[valid], minlength=n_steps)
+    counts = np.bincount(slot[valid], minlength=n_steps)
+    regular = np.full(n_steps, np.nan)
+    np.divide(sums, counts, out=regular, where=counts > 0)
+
+    if fill_gaps:
+        last_valid = np.maximum.accumulate(np.where(counts > 0, np.arange(n_steps), 0))
+        regular = regular[last_valid]
+    return start, regular
+
+
+def resample_regular(
+    values: ArrayLike, from_step: int, to_step: int, how: str = "mean"
+) -> np.ndarray:
+    """
+    Changes the resolution of regular series (last axis) with repeat or reshape
+
+    :param ArrayLike values: values, the time axis is the last axis
+    :param int from_step: current step in minutes
+    :param int to_step: target step in minutes (divisor or multiple of from_step)
+    :param str how: 'mean' for power/price like values, 'sum' for energy like values
+    :return: resampled values
+    """
+    values = np.asarray(values, dtype=float)
+    if to_step <= from_step:
+        if from_step % to_step:
+            raise ValueError(f"{to_step} min is not a divisor of {from_step} min")
+        repeats = from_step // to_step
+        resampled = np.repeat(values, repeats, axis=-1)
+        return resampled / repeats if how == "sum" else resampled
+    if to_step % from_step:
+        raise ValueError(f"{to_step} min is not a multiple of {from_step} min")
+    group = to_step // from_step
+    n = values.shape[-1] // group * group
+    grouped = values[..., :n].reshape(*values.shape[:-1], -1, group)
+    return grouped.sum(axis=-1) if how == "sum" else grouped.mean(axis=-1)
+
+
+def alignment_index(
+    target_datetimes: ArrayLike,
+    source_start: np.datetime64,
+    source_step: np.timedelta64,
+    source_year: int = None,
+) -> np.ndarray:
+    """
+    Returns for each target datetime the position of the step of a regular source series that contains it
+
+    :param ArrayLike target_datetimes: datetimes to align to (e.g. of a demand profile)
+    :param np.datetime64 source_start: start of the regular source series
+    :param np.timedelta64 source_step: step of the regular source series
+    :param int source_year: if given, the target datetimes are first moved to this year (see shift_to_year)
+    :return: integer positions in the source series
+    """
+    target_datetimes = to_datetime64(target_datetimes)
+    if source_year is not None:
+        target_datetimes = shift_to_year(target_datetimes, source_year)
+    source_step = np.timedelta64(source_step).astype("timedelta64[ns]")
+    return (
+        (target_datetimes - np.datetime64(source_start, "ns")) // source_step
+    ).astype(np.int64)
+
+
+@instrumented()
+def align_series(
+    source_datetimes: ArrayLike,
+    source_values: ArrayLike,
+    target_datetimes: ArrayLike,
+    source_year: int = None,
+    source_step: np.timedelta64 = np.timedelta64(1, "h"),
+) -> np.ndarray:
+    """
+    Aligns a local-time series (e.g. hourly prices) to other datetimes (e.g. quarter-hourly demand) by time
+
+    The source series is put on a regular grid (daylight saving time shifts are removed, see regularize_series) and
+    each target datetime gets the value of the step containing it. Target datetimes outside the source series are nan.
+
+    :param ArrayLike source_datetimes: datetimes of the source series (local time)
+    :param ArrayLike source_values: values of the source series
+    :param ArrayLike target_datetimes: datetimes to align to
+    :param int source_year: if given, the target datetimes are moved to this year first (e.g. a demand profile of 2025
+        is combined with prices of 2023)
+    :param np.timedelta64 source_step: step of the source series
+    :return: source values at the target datetimes
+    """
+    start, regular = regularize_series(source_datetimes, source_values, source_step)
+    index = alignment_index(target_datetimes, start, source_step, source_year)
+    inside = (index >= 0) & (index < len(regular))
+    return np.where(inside, regular[np.clip(index, 0, len(regular) - 1)], np.nan)
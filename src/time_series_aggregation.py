@@ -0,0 +1,299 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .carnot_hp_calculations import calculate_annuity_factor
+from .instrumentation import instrumented
+
+
+def to_daily_vectors(series: ArrayLike, steps_per_day: int) -> np.ndarray:
+    """
+    Cuts time series into days
+
+    :param ArrayLike series: time series with shape (n_series, n_steps), n_steps needs to cover full days
+    :param int steps_per_day: number of time steps per day
+    :return: array with shape (n_series, n_days, steps_per_day)
+    """
+    series = np.atleast_2d(np.asarray(series, dtype=float))
+    if series.shape[1] % steps_per_day:
+        raise ValueError(
+            f"Time series with {series.shape[1]} steps do not cover full days of {steps_per_day} steps"
+        )
+    return series.reshape(series.shape[0], -1, steps_per_day)
+
+
+def daily_features(
+    demand: ArrayLike, p_el: ArrayLike, steps_per_day: int
+) -> np.ndarray:
+    """
+    Builds one feature vector per day from all demand profiles and price series
+
+    Each series is divided by its standard deviation over the year, so that all series have the same influence on the
+    clustering independent of their unit.
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: price series with shape (n_series, n_steps)
+    :param int steps_per_day: number of time steps per day
+    :return: array with shape (n_days, (n_profiles + n_series) * steps_per_day)
+    """
+    series = np.vstack(
+        [
+            np.atleast_2d(np.asarray(demand, dtype=float)),
+            np.nan_to_num(np.atleast_2d(np.asarray(p_el, dtype=float))),
+        ]
+    )
+    scale = series.std(axis=1, keepdims=True)
+    series = series / np.where(scale > 0, scale, 1)
+    days = to_daily_vectors(series, steps_per_day)
+    return days.transpose(1, 0, 2).reshape(days.shape[1], -1)
+
+
+def squared_distances(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    :param np.ndarray x: points with shape (n, n_features)
+    :param np.ndarray y: points with shape (m, n_features)
+    :return: squared euclidean distances with shape (n, m)
+    """
+    d = (x**2).sum(axis=1)[:, None] - 2 * x @ y.T + (y**2).sum(axis=1)[None, :]
+    return np.maximum(d, 0)
+
+
+def kmeans_plus_plus(
+    features: np.ndarray, k: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Chooses k initial cluster centers with the k-means++ rule
+
+    :param np.ndarray features: points with shape (n, n_features)
+    :param int k: number of centers
+    :param np.random.Generator rng: random number generator
+    :return: indices of the chosen points
+    """
+    chosen = [rng.integers(len(features))]
+    closest = squared_distances(features, features[chosen])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        new = (
+            rng.choice(len(features), p=closest / total)
+            if total > 0
+            else rng.integers(len(features))
+        )
+        chosen.append(new)
+        closest = np.minimum(
+            closest, squared_distances(features, features[[new]])[:, 0]
+        )
+    return np.array(chosen)
+
+
+def cluster_kmeans(
+    features: np.ndarray, k: int, max_iter: int = 100, seed: int = 0
+) -> tuple:
+    """
+    Clusters points with the k-means algorithm (Lloyd iterations, k-means++ start)
+
+    :param np.ndarray features: points with shape (n, n_features)
+    :param int k: number of clusters
+    :param int max_iter: maximal number of iterations
+    :param int seed: seed of the random number generator
+    :return: cluster of each point, cluster centers
+    """
+    rng = np.random.default_rng(seed)
+    centers = features[kmeans_plus_plus(features, k, rng)]
+    labels = None
+    for _ in range(max_iter):
+        new_labels = squared_distances(features, centers).argmin(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, features)
+        centers = np.where(
+            counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers
+        )
+    return labels, centers
+
+
+def cluster_kmedoids(
+    features: np.ndarray, k: int, max_iter: int = 100, seed: int = 0
+) -> tuple:
+    """
+    Clusters points with the k-medoids algorithm (alternating assignment and medoid update, k-means++ start)
+
+    :param np.ndarray features: points with shape (n, n_features)
+    :param int k: number of clusters
+    :param int max_iter: maximal number of iterations
+    :param int seed: seed of the random number generator
+    :return: cluster of each point, indices of the medoids
+    """
+    rng = np.random.default_rng(seed)
+    distances = np.sqrt(squared_distances(features, features))
+    medoids = kmeans_plus_plus(features, k, rng)
+    for _ in range(max_iter):
+        labels = distances[:, medoids].argmin(axis=1)
+        new_medoids = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(labels == c)
+            if len(members):
+                new_medoids[c] = members[
+                    distances[np.ix_(members, members)].sum(axis=0).argmin()
+                ]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+    return distances[:, medoids].argmin(axis=1), medoids
+
+
+@instrumented()
+def aggregate_representative_days(
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    k: int,
+    steps_per_day: int = 96,
+    method: str = "kmeans",
+    seed: int = 0,
+    cop_weights: ArrayLike = None,
+) -> dict:
+    """
+    Reduces demand profiles and price series of one year to k weighted representative days
+
+    The days are clustered on the joint (demand, price) daily vectors, so that days with the same combination of
+    demand and prices are represented together. With 'kmedoids' the representative days are real days of the year, with
+    'kmeans' they are the mean of all days of the cluster (the annual heat demand is then kept exactly).
+
+    :param ArrayLike demand: demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: price series with shape (n_series, n_steps), aligned to the demand profiles
+    :param int k: number of representative days
+    :param int steps_per_day: number of time steps per day
+    :param str method: 'kmedoids' or 'kmeans'
+    :param int seed: seed of the random number generator
+    :param ArrayLike cop_weights: weights of the electricity costs per time step for a cop that varies over the year
+        with shape (n_profiles, n_steps), see carnot_hp_calculations.calculate_cop_weights
+    :return: dictionary with the reduced demand and p_el (k * steps_per_day time steps), the weights per time step
+        ('weights', number of days represented), the cluster of each day ('labels') and the represented days
+        ('day_weights'), with cop_weights also the reduced 'cop_weights'
+    """
+    demand = np.atleast_2d(np.asarray(demand, dtype=float))
+    n_profiles = demand.shape[0]
+    if cop_weights is not None:
+        # the weighted electricity demand is clustered and reduced together with the heat demand
+        demand = np.vstack([demand, demand * np.asarray(cop_weights, dtype=float)])
+    demand_days = to_daily_vectors(demand, steps_per_day)
+    price_days = to_daily_vectors(
+        np.nan_to_num(np.asarray(p_el, dtype=float)), steps_per_day
+    )
+    k = min(k, demand_days.shape[1])
+    features = daily_features(demand, p_el, steps_per_day)
+
+    if method == "kmedoids":
+        labels, medoids = cluster_kmedoids(features, k, seed=seed)
+        demand_repr = demand_days[:, medoids]
+        price_repr = price_days[:, medoids]
+    elif method == "kmeans":
+        labels, _ = cluster_kmeans(features, k, seed=seed)
+        counts = np.maximum(np.bincount(labels, minlength=k), 1)[None, :, None]
+        demand_repr = np.zeros((demand_days.shape[0], k, steps_per_day))
+        price_repr = np.zeros((price_days.shape[0], k, steps_per_day))
+        np.add.at(demand_repr, (slice(None), labels), demand_days)
+        np.add.at(price_repr, (slice(None), labels), price_days)
+        demand_repr, price_repr = demand_repr / counts, price_repr / counts
+    else:
+        raise ValueError(
+            f"Unknown aggregation method {method}, use 'kmedoids' or 'kmeans'"
+        )
+
+    day_weights = np.bincount(labels, minlength=k).astype(float)
+    demand_repr = demand_repr.reshape(demand_repr.shape[0], -1)
+    aggregation = {
+        "demand": demand_repr[:n_profiles],
+        "p_el": price_repr.reshape(price_repr.shape[0], -1),
+        "weights": np.repeat(day_weights, steps_per_day),
+        "day_weights": day_weights,
+        "labels": labels,
+        "steps_per_day": steps_per_day,
+        "method": method,
+    }
+    if cop_weights is not None:
+        heat, electricity = demand_repr[:n_profiles], demand_repr[n_profiles:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aggregation["cop_weights"] = np.where(heat > 0, electricity / heat, 1.0)
+    return aggregation
+
+
+@instrumented()
+def energy_error_bounds(
+    aggregation: dict,
+    demand: ArrayLike,
+    p_el: ArrayLike,
+    delta_t: float = 0.25,
+    cop_weights: ArrayLike = None,
+) -> tuple:
+    """
+    Bounds the error of the annual heat demand H = sum(d) dt and the electricity costs C = sum(d p) dt on the
+    representative days compared to the full year
+
+    For a day d, p represented by r_d, r_p the bilinear error is
+    d.p - r_d.r_p = (d - r_d).(p - r_p) + (d - r_d).r_p + r_d.(p - r_p), each term is bounded with the Cauchy-Schwarz
+    inequality. For 'kmeans' the two linear terms cancel within each cluster and are left out. The error of H is exact.
+
+    :param dict aggregation: result of aggregate_representative_days
+    :param ArrayLike demand: full demand profiles with shape (n_profiles, n_steps)
+    :param ArrayLike p_el: full price series with shape (n_series, n_steps)
+    :param float delta_t: length of a time step in hours
+    :param ArrayLike cop_weights: full weights of the electricity costs per time step (the aggregation has to be
+        built with them), C is then sum(d w p) dt
+    :return: error of H with shape (n_profiles,), bound of the absolute error of C with shape (n_profiles, n_series)
+    """
+    spd = aggregation["steps_per_day"]
+    labels = aggregation["labels"]
+    demand_days = to_daily_vectors(demand, spd)
+    price_days = to_daily_vectors(np.nan_to_num(np.asarray(p_el, dtype=float)), spd)
+    demand_repr = to_daily_vectors(aggregation["demand"], spd)[:, labels]
+    price_repr = to_daily_vectors(aggregation["p_el"], spd)[:, labels]
+
+    heat_error = (
+        aggregation["demand"] @ aggregation["weights"] - demand_days.sum(axis=(1, 2))
+    ) * delta_t
+
+    if cop_weights is not None:
+        demand_days = to_daily_vectors(
+            np.asarray(demand, dtype=float) * cop_weights, spd
+        )
+        demand_repr = to_daily_vectors(
+            aggregation["demand"] * aggregation["cop_weights"], spd
+        )[:, labels]
+    demand_dev = np.linalg.norm(demand_days - demand_repr, axis=2)
+    price_dev = np.linalg.norm(price_days - price_repr, axis=2)
+    bound = demand_dev @ price_dev.T
+    if aggregation["method"] != "kmeans":
+        bound = bound + demand_dev @ np.linalg.norm(price_repr, axis=2).T
+        bound = bound + np.linalg.norm(demand_repr, axis=2) @ price_dev.T
+    return heat_error, bound * delta_t
+
+
+def allowable_investment_error_bound(
+    heat_error: ArrayLike,
+    cost_bound: ArrayLike,
+    cop: ArrayLike,
+    p_th: ArrayLike,
+    r: ArrayLike,
+    t: ArrayLike,
+    p_el_f: ArrayLike = 1,
+) -> np.ndarray:
+    """
+    Bounds the error of the allowable investment per kW_el caused by the aggregation
+
+    :param ArrayLike heat_error: error of the annual heat demand per profile (see energy_error_bounds)
+    :param ArrayLike cost_bound: bound of the error of the electricity costs (see energy_error_bounds)
+    :param ArrayLike cop: cop of heat pump per profile
+    :param ArrayLike p_th: cost of alternative heat generation in [currency]/kWh
+    :param ArrayLike r: interest rate (decimal)
+    :param ArrayLike t: lifetime in years
+    :param ArrayLike p_el_f: multiplier for the electricity prices
+    :return: bound of the absolute error in [currency]/kW_el with shape (n_profiles, n_series)
+    """
+    heat_error = np.abs(np.asarray(heat_error, dtype=float))[:, None]
+    cop = np.asarray(cop, dtype=float).reshape(-1, 1)
+    f = calculate_annuity_factor(r, t)
+    return (
+        heat_error * np.asarray(p_th) * cop + np.asarray(cost_bound) * np.abs(p_el_f)
+    ) * f
@@ -0,0 +1,156 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from . import cop_grids, instrumentation
+from .carnot_hp_calculations import calculate_cop
+from .cop_maps import available_cop_maps
+
+CARNOT_COP_MODEL = "Carnot cop times exergetic efficiency"
+
+
+def show_debug_panel():
+    """
+    Optional sidebar panel with wall time, calls, cache hits/misses and peak memory of all instrumented stages of the
+    session (values up to the previous run of the page)
+
+    Peak memory is only traced if the app was started with INSTRUMENTATION_TRACE_MEMORY=1.
+    """
+    # the stages of this run are recorded in the session state
+    instrumentation.use_stats(st.session_state.setdefault("instrumentation_stats", {}))
+    if not st.sidebar.checkbox("Show performance debug panel", key="debug_panel"):
+        return
+    if st.sidebar.button("Reset statistics"):
+        instrumentation.reset_stats()
+
+    stats = pd.DataFrame(instrumentation.stats_table())
+    if stats.empty:
+        st.sidebar.markdown("No statistics recorded yet")
+        return
+    stats["total (ms)"] = stats["total_seconds"] * 1000
+    stats["max (ms)"] = stats["max_seconds"] * 1000
+    stats["peak memory (MB)"] = stats["peak_memory_bytes"].astype(float) / 1e6
+    st.sidebar.dataframe(
+        stats.set_index("stage")[
+            [
+                "calls",
+                "total (ms)",
+                "max (ms)",
+                "cache_hits",
+                "cache_misses",
+                "peak memory (MB)",
+            ]
+        ].round(2)
+    )
+
+
+def select_cop_model(efficiency_label="Exergetic efficiency (%)"):
+    """
+    Lets the user choose between the carnot cop with an exergetic efficiency and a cop map from data/cop_maps
+
+    :param efficiency_label: label of the input of the exergetic efficiency
+    :return: exergetic efficiency in % (not used with a cop map), name of the cop map or None for the carnot cop
+    """
+    model = st.selectbox("COP model", [CARNOT_COP_MODEL, *available_cop_maps()])
+    if model == CARNOT_COP_MODEL:
+        return (
+            st.number_input(
+                efficiency_label, value=60.0, min_value=0.0, max_value=100.0, step=0.5
+            ),
+            None,
+        )
+    st.markdown(
+        f"COP interpolated in the performance map data/cop_maps/{model}.csv, operating points outside of the "
+        f"map have no COP."
+    )
+    return 100.0, model
+
+
+def select_temperature_grid():
+    """
+    Lets the user choose the source and sink temperatures of a heatmap
+
+    :return: (first, last, step) of the source and of the sink temperatures in Celsius
+    """
+    columns = st.columns(3)
+    T_source = columns[0].slider("Source temperatures (°C)", -20, 150, (-10, 100))
+    T_sink = columns[1].slider("Sink temperatures (°C)", 0, 250, (40, 200))
+    step = columns[2].selectbox("Step (K)", [1.0, 2.0, 5.0], index=1)
+    return (*T_source, step), (*T_sink, step)
+
+
+def show_temperature_heatmap(grid, values, value_label, file_name, **export):
+    """
+    Shows values over the source and sink temperatures of a cop grid as heatmap with color bands and offers the grid
+    for download
+
+    :param grid: result of cop_grids.calculate_cop_grid
+    :param values: values with shape (n_source, n_sink)
+    :param value_label: name of the values
+    :param file_name: name of the downloaded npz file
+    :param export: arrays to store with the grid (see cop_grids.export_cop_grid)
+    """
+    T_l, T_h = np.meshgrid(grid["T_source"], grid["T_sink"], indexing="ij")
+    valid = np.isfinite(values)
+    data = pd.DataFrame(
+        {
+            "Source temperature (°C)": T_l[valid],
+            "Sink temperature (°C)": T_h[valid],
+            value_label: np.round(values[valid].astype(float), 3),
+        }
+    )
+    step = (
+        float(grid["T_source"][1] - grid["T_source"][0])
+        if grid["T_source"].size > 1
+        else 1.0
+    )
+    chart = (
+        alt.Chart(data)
+        .mark_rect()
+        .encode(
+            x=alt.X("Source temperature (°C):Q", bin=alt.Bin(step=step)),
+            y=alt.Y("Sink temperature (°C):Q", bin=alt.Bin(step=step)),
+            color=alt.Color(
+                f"{value_label}:Q",
+                scale=alt.Scale(type="quantize", nice=True, scheme="viridis"),
+            ),
+            tooltip=["Source temperature (°C)", "Sink temperature (°C)", value_label],
+        )
+        .properties(height=450, width=700)
+    )
+    with instrumentation.stage("render heatmap"):
+        st.altair_chart(chart, width="stretch")
+    # the file is only written when the button is clicked
+    st.download_button(
+        "Download grid (npz)",
+        lambda: cop_grids.export_cop_grid(grid, **export),
+        file_name=file_name,
+        mime="application/octet-stream",
+        on_click="ignore",
+    )
+
+
+def get_cop_profile(profile_name, ex_eta, cop_map=None):
+    """
+    Returns the cop of a saved profile, per time step for profiles with time-varying temperatures (computed once per
+    profile, efficiency and cop map and kept in the session state)
+
+    :param profile_name: name of the saved profile
+    :param ex_eta: exergetic efficiency
+    :param cop_map: name of a cop map, None for the carnot cop (see carnot_hp_calculations.calculate_cop)
+    :return: cop as scalar or with one value per time step of the profile
+    """
+    entry = st.session_state["demand_profiles"][profile_name]
+    if "temperatures" not in entry:
+        return calculate_cop(entry["T_l"], entry["T_h"], ex_eta, cop_map)
+    key = (profile_name, float(ex_eta), cop_map)
+    if key not in st.session_state["cop_profiles"]:
+        temperatures = entry["temperatures"]
+        st.session_state["cop_profiles"][key] = calculate_cop(
+            temperatures["T_l"].to_numpy(),
+            temperatures["T_h"].to_numpy(),
+            ex_eta,
+            cop_map,
+        )
+    return st.session_state["cop_profiles"][key]
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from src.batch_evaluation import (
+    calculate_sufficient_statistics,
+    cached_sufficient_statistics,
+)
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    demand = rng.random((3, 96))
+    p_el = rng.normal(0.1, 0.05, (4, 96))
+    p_el[1, 10] = np.nan
+    weights = rng.integers(1, 5, 96)
+    cop_weights = rng.uniform(0.8, 1.2, (3, 96))
+    return demand, p_el, weights, cop_weights
+
+
+def direct_statistics(demand, p_el, delta_t, weights, cop_weights):
+    """
+    Heat demand and electricity costs of every profile and price series, one pair at a time
+    """
+    heat = np.zeros(len(demand))
+    costs = np.zeros((len(demand), len(p_el)))
+    for i, (d, w_cop) in enumerate(zip(demand, cop_weights)):
+        heat[i] = sum(d[k] * weights[k] * delta_t for k in range(d.size))
+        for j, p in enumerate(p_el):
+            costs[i, j] = sum(
+                d[k] * weights[k] * w_cop[k] * np.nan_to_num(p[k]) * delta_t
+                for k in range(d.size)
+            )
+    return heat, costs
+
+
+def test_sufficient_statistics_match_direct_calculation(series):
+    demand, p_el, weights, cop_weights = series
+    heat, costs = calculate_sufficient_statistics(
+        demand, p_el, 0.25, weights, cop_weights
+    )
+    expected_heat, expected_costs = direct_statistics(
+        demand, p_el, 0.25, weights, cop_weights
+    )
+    assert np.allclose(heat, expected_heat)
+    assert np.allclose(costs, expected_costs)
+
+
+def test_sufficient_statistics_without_weights(series):
+    demand, p_el, _, _ = series
+    heat, costs = calculate_sufficient_statistics(demand, p_el, 1.0)
+    expected_heat, expected_costs = direct_statistics(
+        demand, p_el, 1.0, np.ones(96), np.ones_like(demand)
+    )
+    assert np.allclose(heat, expected_heat)
+    assert np.allclose(costs, expected_costs)
+
+
+def test_cached_sufficient_statistics_match_direct_calculation(series):
+    demand, p_el, weights, cop_weights = series
+    expected_heat, expected_costs = direct_statistics(
+        demand, p_el, 0.25, weights, cop_weights
+    )
+    profile_keys, series_keys = ["a", "b", "c"], [1, 2, 3, 4]
+    cache = {}
+    # fill the cache partly, then ask for all pairs
+    cached_sufficient_statistics(
+        demand[:1], p_el[2:], cache, ["a"], [3, 4], 0.25, weights, cop_weights[:1]
+    )
+    assert len(cache) == 2
+    heat, costs = cached_sufficient_statistics(
+        demand, p_el, cache, profile_keys, series_keys, 0.25, weights, cop_weights
+    )
+    assert len(cache) == demand.shape[0] * p_el.shape[0]
+    assert np.allclose(heat, expected_heat)
+    assert np.allclose(costs, expected_costs)
+
+    # a second call is answered from the cache (the series are not used)
+    heat, costs = cached_sufficient_statistics(
+        None, None, cache, profile_keys[::-1], series_keys[1:], 0.25
+    )
+    assert np.allclose(heat, expected_heat[::-1])
+    assert np.allclose(costs, expected_costs[::-1, 1:])
+
+
+def test_cached_sufficient_statistics_drop_least_recently_used(series):
+    demand, p_el, _, _ = series
+    cache = {}
+    for j in range(4):
+        cached_sufficient_statistics(
+            demand, p_el[j], cache, ["a", "b", "c"], [j], max_entries=7
+        )
+    # the pairs of the first series were dropped, the latest ones are kept
+    assert len(cache) == 7
+    assert ("c", 0) not in cache and ("a", 3) in cache
+    heat, costs = cached_sufficient_statistics(
+        demand, p_el[:1], cache, ["a", "b", "c"], [0], max_entries=7
+    )
+    expected_heat, expected_costs = direct_statistics(
+        demand, p_el[:1], 0.25, np.ones(96), np.ones_like(demand)
+    )
+    assert np.allclose(heat, expected_heat)
+    assert np.allclose(costs, expected_costs)
+    assert list(cache)[-3:] == [("a", 0), ("b", 0), ("c", 0)]
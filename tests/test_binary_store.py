@@ -0,0 +1,84 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from src import binary_store
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.csv"
+    path.write_text("a\n1\n")
+    return str(path)
+
+
+def test_write_and_read_store(tmp_path, source):
+    store_path = str(tmp_path / "store")
+    assert not binary_store.is_store_valid(store_path, [source])
+    binary_store.write_store(store_path, {"x": np.arange(5)}, [source], {"n": 5})
+    assert binary_store.is_store_valid(store_path, [source])
+    arrays, meta = binary_store.read_store(store_path)
+    assert np.array_equal(arrays["x"], np.arange(5)) and meta == {"n": 5}
+
+    # a modified source invalidates the store, a rebuild replaces it
+    with open(source, "a") as f:
+        f.write("2\n")
+    assert not binary_store.is_store_valid(store_path, [source])
+    binary_store.write_store(store_path, {"y": np.ones(3)}, [source])
+    arrays, _ = binary_store.read_store(store_path)
+    assert list(arrays) == ["y"]
+    assert sorted(os.listdir(store_path)) == ["meta.json", "y.npy"]
+    assert sorted(os.listdir(tmp_path)) == ["source.csv", "store"]
+
+
+def test_chunked_store(tmp_path, source):
+    store_path = str(tmp_path / "store")
+    build_path = binary_store.begin_store(store_path)
+    for start in range(0, 10, 3):
+        binary_store.append_to_store(
+            build_path, {"x": np.arange(start, min(start + 3, 10), dtype=np.int64)}
+        )
+    # the store only appears when it is finished
+    assert not os.path.exists(store_path)
+    binary_store.finish_store(
+        build_path, store_path, {"x": np.int64, "empty": np.float32}, [source]
+    )
+    arrays, _ = binary_store.read_store(store_path)
+    assert np.array_equal(arrays["x"], np.arange(10))
+    assert arrays["empty"].dtype == np.float32 and len(arrays["empty"]) == 0
+    assert not os.path.exists(build_path)
+
+
+def test_concurrent_rebuilds(tmp_path, source):
+    store_path = str(tmp_path / "store")
+    binary_store.write_store(store_path, {"x": np.zeros(1000)}, [source])
+    errors = []
+
+    def rebuild(value):
+        try:
+            for _ in range(20):
+                build_path = binary_store.begin_store(store_path)
+                for _ in range(4):
+                    binary_store.append_to_store(
+                        build_path, {"x": np.full(250, float(value))}
+                    )
+                binary_store.finish_store(
+                    build_path, store_path, {"x": np.float64}, [source], {"v": value}
+                )
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=rebuild, args=(v,)) for v in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    # the store is one complete build, no temporary files are left behind
+    assert binary_store.is_store_valid(store_path, [source])
+    arrays, meta = binary_store.read_store(store_path, mmap=False)
+    assert np.array_equal(arrays["x"], np.full(1000, meta["v"]))
+    assert sorted(os.listdir(tmp_path)) == ["source.csv", "store"]
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from src.capacity_sizing import (
+    build_load_duration_index,
+    calculate_capacity_sweep,
+    capacity_statistics,
+    optimal_capacity,
+)
+from src.carnot_hp_calculations import calculate_annuity_factor
+
+CAPACITIES = np.array([0.0, 0.1, 0.25, 0.5, 0.73, 0.9, 1.0])
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    demand = rng.random((3, 96 * 7))
+    # ties, zeros and a flat profile
+    demand[0, :100] = 0.5
+    demand[1, ::3] = 0
+    demand[2] = 1
+    demand /= demand.max(axis=1, keepdims=True)
+    p_el = rng.normal(0.1, 0.03, (2, demand.shape[1]))
+    p_el[1, 5] = np.nan
+    weights = rng.integers(1, 4, demand.shape[1])
+    cop_weights = rng.uniform(0.8, 1.2, demand.shape)
+    return demand, p_el, weights, cop_weights
+
+
+def direct_statistics(demand, p_el, delta_t, weights, cop_weights, capacity):
+    """
+    Covered heat and electricity costs with the heat pump output evaluated in every time step
+    """
+    output = np.minimum(demand[:, None], capacity[:, None])
+    step_weights = weights * delta_t
+    heat = (output * step_weights).sum(axis=-1)
+    prices = np.nan_to_num(p_el)[None] * (cop_weights * step_weights)[:, None]
+    costs = np.einsum("iks,ijs->ijk", output, prices)
+    return heat, costs
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_capacity_statistics_match_direct_evaluation(series, weighted):
+    demand, p_el, weights, cop_weights = series
+    if not weighted:
+        weights, cop_weights = np.ones(demand.shape[1]), np.ones_like(demand)
+    index = build_load_duration_index(
+        demand,
+        p_el,
+        0.25,
+        weights if weighted else None,
+        cop_weights if weighted else None,
+    )
+    heat, costs = capacity_statistics(index, CAPACITIES)
+    expected_heat, expected_costs = direct_statistics(
+        demand, p_el, 0.25, weights, cop_weights, CAPACITIES
+    )
+    assert heat.shape == (3, len(CAPACITIES))
+    assert costs.shape == (3, 2, len(CAPACITIES))
+    assert np.allclose(heat, expected_heat)
+    assert np.allclose(costs, expected_costs)
+    # no heat at 0 %, the full demand at 100 % of the peak
+    assert np.all(heat[:, 0] == 0) and np.all(costs[..., 0] == 0)
+    assert np.allclose(heat[:, -1], (demand * weights * 0.25).sum(axis=1))
+
+
+def test_capacity_sweep_matches_direct_evaluation(series):
+    demand, p_el, _, _ = series
+    cop, p_th, r, t, p_el_f = np.array([3.0, 2.5, 4.0]), 0.05, 0.05, 15, 1.2
+    index = build_load_duration_index(demand, p_el, 0.25)
+    sweep = calculate_capacity_sweep(index, cop, p_th, r, t, p_el_f, CAPACITIES)
+
+    heat, costs = direct_statistics(
+        demand, p_el, 0.25, np.ones(demand.shape[1]), np.ones_like(demand), CAPACITIES
+    )
+    annuity = calculate_annuity_factor(r, t)
+    for k, capacity in enumerate(CAPACITIES):
+        expected_fraction = heat[:, k] / heat[:, -1]
+        assert np.allclose(sweep["covered_heat_fraction"][:, k], expected_fraction)
+        if capacity == 0:
+            assert np.all(np.isnan(sweep["allowable_investment"][..., k]))
+            continue
+        # savings of the heat pump per kW of heat output, converted to kW_el with the cop
+        expected = (
+            (heat[:, None, k] * p_th * cop[:, None] - costs[..., k] * p_el_f)
+            / capacity
+            * annuity
+        )
+        assert np.allclose(sweep["allowable_investment"][..., k], expected)
+
+    optimum = optimal_capacity(sweep, cop, 1000)
+    npv = np.nan_to_num(
+        (sweep["allowable_investment"] - 1000) * CAPACITIES / cop[:, None, None]
+    )
+    assert np.allclose(optimum["net_present_value"], npv.max(axis=2))
@@ -0,0 +1,113 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from src.carnot_hp_calculations import (
+    calculate_allowable_investment_from_cop,
+    calculate_allowable_investment_per_kw_el,
+    calculate_annuity_factor,
+    calculate_cop,
+)
+
+
+def scalar_cop(T_l, T_h, ex_eta=1):
+    """
+    Scalar formulas of the first version of carnot_hp_calculations
+    """
+    return (1 - (T_l + 273) / (T_h + 273)) ** -1 * ex_eta
+
+
+def scalar_annuity_factor(r, t):
+    return (1 - (1 / (1 + r) ** t)) / r
+
+
+def scalar_allowable_investment(T_l, T_h, h, p_th, p_el, r, t, ex_eta=1):
+    return (
+        (p_th * scalar_cop(T_l, T_h, ex_eta) / 1000 - p_el / 1000)
+        * h
+        * scalar_annuity_factor(r, t)
+    )
+
+
+T_L = np.array([-10.0, 20.0, 45.0])
+T_H = np.array([60.0, 90.0, 150.0])
+EX_ETA = np.array([0.4, 0.6])
+
+
+def test_cop_matches_scalar_formula():
+    cop = calculate_cop(T_L[:, None, None], T_H[None, :, None], EX_ETA[None, None])
+    assert cop.shape == (3, 3, 2)
+    for (i, T_l), (j, T_h), (k, ex_eta) in itertools.product(
+        enumerate(T_L), enumerate(T_H), enumerate(EX_ETA)
+    ):
+        assert cop[i, j, k] == pytest.approx(scalar_cop(T_l, T_h, ex_eta), rel=1e-12)
+    assert isinstance(calculate_cop(20, 90, 0.5), float)
+
+
+def test_cop_without_temperature_lift_is_nan():
+    cop = calculate_cop([20.0, 90.0, 100.0], 90.0, 0.5)
+    assert np.isfinite(cop[0])
+    assert np.all(np.isnan(cop[1:]))
+    assert np.isnan(calculate_cop(90, 90))
+
+
+def test_annuity_factor():
+    r, t = np.array([0.0, 0.03, 0.1]), np.array([10, 20])
+    f = calculate_annuity_factor(r[:, None], t[None])
+    # the limit for r = 0 is the lifetime
+    assert np.array_equal(f[0], t)
+    for i, j in itertools.product(range(1, 3), range(2)):
+        assert f[i, j] == pytest.approx(scalar_annuity_factor(r[i], t[j]), rel=1e-12)
+    assert calculate_annuity_factor(1e-9, 15) == pytest.approx(15, rel=1e-6)
+
+
+def test_allowable_investment_matches_scalar_formula():
+    h, p_th, p_el, r, t = (
+        np.array([3000, 8000]),
+        50.0,
+        np.array([80.0, 150.0]),
+        0.05,
+        15,
+    )
+    allowable = calculate_allowable_investment_per_kw_el(
+        T_L[:, None, None, None],
+        T_H[None, :, None, None],
+        h[None, None, :, None],
+        p_th,
+        p_el[None, None, None],
+        r,
+        t,
+        0.6,
+    )
+    for i, j, k, m in itertools.product(range(3), range(3), range(2), range(2)):
+        expected = scalar_allowable_investment(
+            T_L[i], T_H[j], h[k], p_th, p_el[m], r, t, 0.6
+        )
+        assert allowable[i, j, k, m] == pytest.approx(expected, rel=1e-12)
+
+
+def test_allowable_investment_without_lift_is_nan():
+    allowable = calculate_allowable_investment_per_kw_el(
+        [20.0, 95.0], 90.0, 8000, 50, 150, 0.05, 15, 0.6
+    )
+    assert np.isfinite(allowable[0]) and np.isnan(allowable[1])
+
+
+def test_allowable_investment_only_when_profitable():
+    cop = np.array([2.0, 3.0, 4.0, np.nan])
+    p_th, p_el, h, r, t = 50.0, 150.0, 8000, 0.0, 10
+    always = calculate_allowable_investment_from_cop(cop, h, p_th, p_el, r, t)
+    profitable = calculate_allowable_investment_from_cop(
+        cop, h, p_th, p_el, r, t, only_when_profitable=True
+    )
+    # r = 0: the annuity factor is the lifetime
+    assert always[:3] == pytest.approx((p_th * cop[:3] - p_el) / 1000 * h * t)
+    assert always[0] < 0 and always[1] == 0
+    assert np.array_equal(profitable[:3], np.maximum(always[:3], 0))
+    assert np.isnan(always[3]) and np.isnan(profitable[3])
+
+    allowable = calculate_allowable_investment_per_kw_el(
+        20.0, 90.0, h, p_th, p_el, 0.05, t, [0.2, 0.8], only_when_profitable=True
+    )
+    assert allowable[0] == 0 and allowable[1] > 0
@@ -0,0 +1,127 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from src import cop_maps
+from src.cop_maps import interpolate_cop_map, load_cop_map, write_cop_map
+
+T_SOURCE = np.array([0.0, 10.0, 20.0, 40.0])  # not uniform
+T_SINK = np.array([50.0, 60.0, 70.0])
+
+
+@pytest.fixture
+def cop_map(tmp_path, monkeypatch):
+    monkeypatch.setattr(cop_maps, "COP_MAP_PATH", str(tmp_path))
+    cop = (
+        3
+        + 0.05 * T_SOURCE[:, None]
+        - 0.02 * T_SINK[None]
+        + 0.001 * T_SOURCE[:, None] * T_SINK[None]
+    )
+    cop[3, 2] = np.nan  # outside of the envelope
+    write_cop_map(tmp_path / "test.csv", T_SOURCE, T_SINK, cop)
+    return load_cop_map("test"), cop.round(3)
+
+
+def test_reproduces_grid_nodes(cop_map):
+    cop_map, cop = cop_map
+    T_l, T_h = np.meshgrid(T_SOURCE, T_SINK, indexing="ij")
+    assert np.allclose(interpolate_cop_map(cop_map, T_l, T_h), cop, equal_nan=True)
+    # reduced interpolation for a constant sink or source temperature
+    for j, T in enumerate(T_SINK):
+        assert np.allclose(
+            interpolate_cop_map(cop_map, T_SOURCE, T), cop[:, j], equal_nan=True
+        )
+    for i, T in enumerate(T_SOURCE):
+        assert np.allclose(
+            interpolate_cop_map(cop_map, T, T_SINK), cop[i], equal_nan=True
+        )
+
+
+def test_bilinear_between_nodes(cop_map):
+    cop_map, cop = cop_map
+    T_l, T_h = np.array([5.0, 15.0, 25.0]), np.array([52.0, 65.0, 57.5])
+    expected = []
+    for tl, th in zip(T_l, T_h):
+        i = np.searchsorted(T_SOURCE, tl) - 1
+        j = np.searchsorted(T_SINK, th) - 1
+        u = (tl - T_SOURCE[i]) / (T_SOURCE[i + 1] - T_SOURCE[i])
+        v = (th - T_SINK[j]) / (T_SINK[j + 1] - T_SINK[j])
+        expected.append(
+            (1 - u) * (1 - v) * cop[i, j]
+            + (1 - u) * v * cop[i, j + 1]
+            + u * (1 - v) * cop[i + 1, j]
+            + u * v * cop[i + 1, j + 1]
+        )
+    assert np.allclose(interpolate_cop_map(cop_map, T_l, T_h), expected)
+    assert np.allclose(
+        [interpolate_cop_map(cop_map, tl, th) for tl, th in zip(T_l, T_h)], expected
+    )
+
+
+def test_outside_of_map_is_nan(cop_map):
+    cop_map, _ = cop_map
+    T_l = np.array([-0.1, 40.1, 10.0, 10.0, 30.0])
+    T_h = np.array([60.0, 60.0, 49.9, 70.1, 65.0])
+    # last point is in a cell next to the empty operating point
+    assert np.all(np.isnan(interpolate_cop_map(cop_map, T_l, T_h)))
+    assert np.isnan(interpolate_cop_map(cop_map, 45.0, 60.0))
+    assert np.all(np.isnan(interpolate_cop_map(cop_map, [-5.0, 45.0], 60.0)))
+    assert np.all(np.isnan(interpolate_cop_map(cop_map, 10.0, [45.0, 75.0])))
+
+
+def test_clamp_outside_of_map(cop_map):
+    cop_map, cop = cop_map
+    T_l = np.array([-10.0, 50.0, 10.0, 5.0])
+    T_h = np.array([40.0, 60.0, 80.0, 65.0])
+    clamped = interpolate_cop_map(cop_map, T_l, T_h, extrapolation="clamp")
+    expected = interpolate_cop_map(cop_map, np.clip(T_l, 0, 40), np.clip(T_h, 50, 70))
+    assert np.allclose(clamped, expected)
+    assert np.allclose(clamped[:3], [cop[0, 0], cop[3, 1], cop[1, 2]])
+    assert interpolate_cop_map(cop_map, 45.0, 55.0, "clamp") == pytest.approx(
+        (cop[3, 0] + cop[3, 1]) / 2
+    )
+
+
+def test_raise_outside_of_map(cop_map):
+    cop_map, cop = cop_map
+    with pytest.raises(ValueError, match="outside of the cop map"):
+        interpolate_cop_map(cop_map, [10.0, 41.0], 60.0, extrapolation="raise")
+    with pytest.raises(ValueError, match="outside of the cop map"):
+        interpolate_cop_map(cop_map, 10.0, [49.0, 60.0], extrapolation="raise")
+    inside = interpolate_cop_map(cop_map, [0.0, 40.0], 60.0, extrapolation="raise")
+    assert np.allclose(inside, cop[[0, 3], 1])
+    with pytest.raises(ValueError, match="Unknown extrapolation"):
+        interpolate_cop_map(cop_map, 10.0, 60.0, extrapolation="linear")
+
+
+def test_nan_temperatures_are_nan(cop_map):
+    cop_map, cop = cop_map
+    T_l = np.array([np.nan, 10.0, np.inf, 10.0])
+    T_h = np.array([60.0, np.nan, 60.0, 60.0])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = interpolate_cop_map(cop_map, T_l, T_h)
+        clamped = interpolate_cop_map(cop_map, T_l, T_h, "clamp")
+    assert np.all(np.isnan(result[:3])) and result[3] == pytest.approx(cop[1, 1])
+    assert np.isnan(clamped[:2]).all() and clamped[2] == pytest.approx(cop[3, 1])
+
+
+def test_table_rounds_to_resolution(cop_map):
+    cop_map, cop = cop_map
+    rng = np.random.default_rng(0)
+    T_l, T_h = rng.uniform(0, 40, 1000), rng.uniform(50, 70, 1000)
+    table = interpolate_cop_map(cop_map, T_l, T_h)
+    # the same as the bilinear interpolation at the temperatures rounded to 0.1 K
+    rounded = interpolate_cop_map(cop_map, T_l.round(1), T_h.round(1))
+    assert np.allclose(table, rounded, equal_nan=True)
+    valid = ~np.isnan(table)
+    assert valid.sum() > 700
+    # rounding by at most 0.05 K (0.01 K of the fine table) changes the cop by less than its steepest slope allows
+    slope = np.nanmax(np.abs(np.diff(cop, axis=0)) / np.diff(T_SOURCE)[:, None])
+    slope += np.nanmax(np.abs(np.diff(cop, axis=1)) / np.diff(T_SINK)[None])
+    exact = interpolate_cop_map(
+        cop_maps.load_cop_map("test", resolution=0.001), T_l, T_h
+    )
+    assert np.nanmax(np.abs(table - exact)) <= 0.06 * slope
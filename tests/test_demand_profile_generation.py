@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.demand_profile_generation import (
+    CompactDemandProfile,
+    daily_batch_pattern,
+    daily_continuous_pattern,
+    generate_demand_profile_template,
+)
+
+HOURLY_DEMAND = np.r_[np.full(6, 2.0), np.linspace(4, 10, 12), np.full(6, 3.0)]
+
+
+@pytest.fixture
+def profile():
+    return CompactDemandProfile(
+        daily_continuous_pattern(HOURLY_DEMAND),
+        weekend_scale=0.4,
+        holidays=("2025-12-25",),
+        holiday_scale=0.1,
+    )
+
+
+def test_to_array_matches_template(profile):
+    # full year as generated by the page before the compact profiles
+    df = generate_demand_profile_template(True, 40)
+    expected = np.tile(daily_continuous_pattern(HOURLY_DEMAND), 365) * np.where(
+        df["datetime"].dt.strftime("%Y-%m-%d") == "2025-12-25",
+        0.1,
+        df["scaled_process"],
+    )
+    assert np.allclose(profile.to_array(), expected)
+    frame = profile.to_dataframe()
+    assert frame["datetime"].equals(df["datetime"])
+
+
+def test_to_array_round_trip(profile):
+    quarter_hourly, hourly = profile.to_array(15), profile.to_array(60)
+    assert len(quarter_hourly) == 365 * 96 and len(hourly) == 365 * 24
+    # both resolutions describe the same demand
+    assert np.allclose(quarter_hourly.reshape(-1, 4).mean(axis=1), hourly)
+    assert np.allclose(np.repeat(hourly, 4), quarter_hourly)
+    # an hourly profile generates the same year
+    coarse = CompactDemandProfile(
+        HOURLY_DEMAND,
+        weekend_scale=0.4,
+        holidays=("2025-12-25",),
+        holiday_scale=0.1,
+    )
+    assert np.allclose(coarse.to_array(15), quarter_hourly)
+    assert np.allclose(coarse.to_array(60), hourly)
+
+
+def test_annual_energy_and_peak(profile):
+    for resolution in [15, 60]:
+        demand = profile.to_array(resolution)
+        assert profile.annual_energy() == pytest.approx(demand.sum() * resolution / 60)
+        assert profile.peak() == demand.max()
+    batch = CompactDemandProfile(daily_batch_pattern(6, 22, 2, 1), weekend_scale=0)
+    assert batch.annual_energy() == pytest.approx(batch.to_array().sum() / 4)
+    assert batch.peak() == 1
+
+
+def test_pattern_at_across_season_boundary_and_weekend(profile):
+    frame = pd.DataFrame(
+        {"datetime": profile.datetimes(60), "demand": profile.to_array(60)}
+    )
+    days = frame.groupby(frame["datetime"].dt.date)["demand"].apply(np.array)
+    pattern = profile.pattern_at(60)
+    assert np.array_equal(pattern, HOURLY_DEMAND)
+    # Thursday 2025-03-20 (winter) to Tuesday 2025-04-01 (spring, after the daylight saving time change)
+    for day in pd.date_range("2025-03-20", "2025-04-01").date:
+        scale = 0.4 if day.weekday() >= 5 else 1.0
+        assert len(days[day]) == 24
+        assert np.allclose(days[day], scale * pattern)
+    # coarser and finer patterns keep the daily energy
+    assert np.allclose(profile.pattern_at(120), HOURLY_DEMAND.reshape(-1, 2).mean(1))
+    assert profile.pattern_at(5).sum() / 12 == pytest.approx(HOURLY_DEMAND.sum())
+    with pytest.raises(ValueError):
+        profile.pattern_at(7)
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from src import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def process_stats():
+    instrumentation.use_stats(None)
+    instrumentation.reset_stats()
+    yield
+    instrumentation.use_stats(None)
+    instrumentation.reset_stats()
+
+
+def test_stages_are_recorded_per_session():
+    sessions = {"a": {}, "b": {}}
+
+    def run_page(session, n_calls):
+        instrumentation.use_stats(sessions[session])
+        for _ in range(n_calls):
+            with instrumentation.stage("page"):
+                pass
+
+    threads = [
+        threading.Thread(target=run_page, args=("a", 2)),
+        threading.Thread(target=run_page, args=("b", 3)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sessions["a"]["page"]["calls"] == 2
+    assert sessions["b"]["page"]["calls"] == 3
+    # nothing was recorded in the statistics of the process
+    assert instrumentation.stats_table() == []
+
+    instrumentation.use_stats(sessions["a"])
+    assert instrumentation.stats_table()[0]["calls"] == 2
+    instrumentation.reset_stats()
+    assert sessions["a"] == {} and sessions["b"]["page"]["calls"] == 3
+
+
+def test_cache_hits_and_misses():
+    cache = {}
+
+    def memoize(func):
+        return lambda x: cache[x] if x in cache else cache.setdefault(x, func(x))
+
+    square = instrumentation.track_cache(memoize, lambda x: x * x, "square")
+    assert [square(2), square(2), square(3)] == [4, 4, 9]
+    row = instrumentation.stats_table()[0]
+    assert row["stage"] == "square"
+    assert (row["calls"], row["cache_hits"], row["cache_misses"]) == (3, 1, 2)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.plotting import downsample_frame, lttb_indices, min_max_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(5)
+    x = pd.date_range("2023-01-01", periods=17520, freq="30min").to_numpy()
+    y = rng.normal(size=x.size).cumsum()
+    y[1234] = y.max() + 50  # single spikes
+    y[9876] = y.min() - 50
+    return x, y
+
+
+@pytest.mark.parametrize("n_out", [4, 5, 100, 1400])
+def test_lttb_indices(series, n_out):
+    x, y = series
+    index = lttb_indices(x, y, n_out)
+    assert len(index) <= n_out
+    assert np.all(np.diff(index) > 0)
+    assert index[0] == 0 and index[-1] == len(x) - 1
+    assert np.argmin(y) in index and np.argmax(y) in index
+
+
+@pytest.mark.parametrize("n_buckets", [1, 10, 700])
+def test_min_max_indices(series, n_buckets):
+    x, y = series
+    index = min_max_indices(x, y, n_buckets)
+    assert len(index) <= 4 * n_buckets
+    assert np.all(np.diff(index) > 0)
+    assert index[0] == 0 and index[-1] == len(x) - 1
+    assert np.argmin(y) in index and np.argmax(y) in index
+    # lowest and highest point of every bucket
+    bucket = np.minimum(
+        ((x - x[0]) / (x[-1] - x[0]) * n_buckets).astype(int), n_buckets - 1
+    )
+    for b in range(n_buckets):
+        members = np.flatnonzero(bucket == b)
+        assert members[np.argmin(y[members])] in index
+        assert members[np.argmax(y[members])] in index
+
+
+def test_short_series_keep_all_points(series):
+    x, y = series
+    assert np.array_equal(lttb_indices(x[:50], y[:50], 100), np.arange(50))
+    assert np.array_equal(min_max_indices(x[:50], y[:50], 100), np.arange(50))
+    with pytest.raises(ValueError):
+        lttb_indices(x, y, 3)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_downsample_frame(series, method):
+    x, y = series
+    frame = pd.DataFrame(
+        {"t": np.r_[x, x], "p": np.r_[y, -y], "source": ["a"] * x.size + ["b"] * x.size}
+    )
+    frame.loc[10, "p"] = np.nan
+    plot = downsample_frame(frame, "t", "p", width=200, group="source", method=method)
+    assert plot["p"].notna().all()
+    for name, part in plot.groupby("source"):
+        assert len(part) <= 4 * 200
+        original = frame[(frame["source"] == name)]
+        assert part["p"].max() == original["p"].max()
+        assert part["p"].min() == original["p"].min()
+        assert part["t"].is_monotonic_increasing
+
+    # a short time range is returned at full resolution
+    start, end = x[100], x[399]
+    zoomed = downsample_frame(
+        frame, "t", "p", start, end, width=200, group="source", method=method
+    )
+    assert len(zoomed) == 2 * 300
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from src.carnot_hp_calculations import calculate_annuity_factor
+from src.price_duration import (
+    build_price_duration_index,
+    calculate_allowable_investment_threshold,
+    threshold_statistics,
+)
+
+DELTA_T = 0.25
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(3)
+    demand = rng.random((2, 400))
+    p_el = rng.normal(0.1, 0.05, (3, 400)).round(2)  # rounded, so that prices repeat
+    p_el[0, 5] = np.nan
+    weights = rng.integers(1, 4, 400)
+    cop_weights = rng.uniform(0.7, 1.3, (2, 400))
+    return demand, p_el, weights, cop_weights
+
+
+def brute_force_statistics(demand, p_el, limits, weights, cop_weights):
+    """
+    Heat demand and electricity costs of the time steps with a (weighted) price up to each limit, by sorting the time
+    steps of every profile and series
+    """
+    p_el = np.nan_to_num(p_el)
+    heat = np.zeros((len(demand), len(p_el), len(limits)))
+    costs = np.zeros_like(heat)
+    for i, d in enumerate(demand * weights * DELTA_T):
+        for j, p in enumerate(p_el):
+            prices = p * cop_weights[i]
+            order = np.argsort(prices)
+            for k, limit in enumerate(limits):
+                n = 0
+                while n < len(order) and prices[order[n]] <= limit:
+                    n += 1
+                heat[i, j, k] = d[order[:n]].sum()
+                costs[i, j, k] = (d * prices)[order[:n]].sum()
+    return heat, costs
+
+
+@pytest.mark.parametrize("with_cop_weights", [False, True])
+def test_threshold_statistics_match_brute_force(series, with_cop_weights):
+    demand, p_el, weights, cop_weights = series
+    if not with_cop_weights:
+        cop_weights = np.ones_like(demand)
+    index = build_price_duration_index(
+        demand, p_el, DELTA_T, weights, cop_weights if with_cop_weights else None
+    )
+    limits = np.array([-1.0, 0.0, 0.05, 0.1, 0.1000001, 0.15, 1.0])
+    heat, costs = threshold_statistics(index, np.tile(limits, (len(demand), 1)))
+    expected_heat, expected_costs = brute_force_statistics(
+        demand, p_el, limits, weights, cop_weights
+    )
+    assert np.allclose(heat, expected_heat)
+    assert np.allclose(costs, expected_costs)
+
+
+def test_allowable_investment_threshold_matches_brute_force(series):
+    demand, p_el, weights, cop_weights = series
+    cop, p_th, r, t, p_el_f = np.array([3.0, 2.0]), 0.05, 0.05, 15, 1.5
+    index = build_price_duration_index(demand, p_el, DELTA_T, weights, cop_weights)
+    allowable = calculate_allowable_investment_threshold(index, cop, p_th, r, t, p_el_f)
+
+    f = calculate_annuity_factor(r, t)
+    for i in range(len(demand)):
+        # the heat pump runs whenever it is cheaper than the alternative
+        heat, costs = brute_force_statistics(
+            demand[[i]],
+            p_el,
+            [p_th * cop[i] / p_el_f],
+            weights,
+            cop_weights[[i]],
+        )
+        expected = (heat[0, :, 0] * p_th * cop[i] - costs[0, :, 0] * p_el_f) * f
+        assert np.allclose(allowable[i], expected)
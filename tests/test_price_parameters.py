@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src import price_parameters
+from src.price_parameters import (
+    fit_all_price_parameters,
+    fitted_years,
+    load_price_parameters,
+)
+from src.price_profile_generation import (
+    complete_price_years,
+    fit_electricty_price_trends,
+    load_electricity_price_profile,
+)
+from src.price_scenarios import fit_residual_model
+
+COUNTRY = "Croatia"
+
+
+@pytest.fixture
+def parameter_store(repo_root, tmp_path, monkeypatch):
+    monkeypatch.setattr(price_parameters, "PARAMETER_STORE_PATH", str(tmp_path))
+    return tmp_path
+
+
+def test_stored_parameters_equal_fresh_fit(parameter_store):
+    summary = fit_all_price_parameters([COUNTRY], n_workers=1)
+    assert summary[COUNTRY] == complete_price_years(COUNTRY)
+    assert fitted_years(COUNTRY) == complete_price_years(COUNTRY)
+
+    year = complete_price_years(COUNTRY)[-1]
+    params, residual_model, mean_price = load_price_parameters(COUNTRY, year)
+
+    p = load_electricity_price_profile(COUNTRY, year)
+    p_fitted, expected = fit_electricty_price_trends(p, year)
+    expected_residuals = fit_residual_model(p_fitted)
+    for group in ["trend", "weekly_cycle"]:
+        assert params[group].keys() == expected[group].keys()
+        for key, value in expected[group].items():
+            assert params[group][key] == pytest.approx(value, rel=1e-12), (group, key)
+    assert np.array_equal(params["hourly_cycle_table"], expected["hourly_cycle_table"])
+    assert np.array_equal(residual_model["residuals"], expected_residuals["residuals"])
+    assert residual_model["block_days"] == expected_residuals["block_days"]
+    assert residual_model["window_days"] == expected_residuals["window_days"]
+    assert mean_price == pytest.approx(p_fitted["p"].mean())
+
+    # the store is only refitted when the price csv changes
+    assert fit_all_price_parameters([COUNTRY], n_workers=1) == {COUNTRY: "up to date"}
+
+
+def test_unknown_year_raises(parameter_store):
+    with pytest.raises(ValueError, match="No fitted price parameters"):
+        load_price_parameters(COUNTRY, 1990)
+
+
+def test_missing_store_fits_only_the_requested_year(parameter_store):
+    year = complete_price_years(COUNTRY)[0]
+    # without a store the app fits the requested year in the process and writes nothing
+    assert fitted_years(COUNTRY) == complete_price_years(COUNTRY)
+    params, residual_model, mean_price = load_price_parameters(COUNTRY, year)
+    assert list(parameter_store.iterdir()) == []
+
+    fit_all_price_parameters([COUNTRY], n_workers=1)
+    stored = load_price_parameters(COUNTRY, year)
+    assert params["trend"] == stored[0]["trend"]
+    assert np.array_equal(params["hourly_cycle_table"], stored[0]["hourly_cycle_table"])
+    assert np.array_equal(residual_model["residuals"], stored[1]["residuals"])
+    assert mean_price == stored[2]
+
+
+def test_concurrent_writes_leave_a_complete_store(parameter_store):
+    years = complete_price_years(COUNTRY)[:2]
+    results = {
+        year: price_parameters._fit_country_year(COUNTRY, year) for year in years
+    }
+    errors = []
+
+    def write():
+        try:
+            for _ in range(10):
+                price_parameters._write_country(COUNTRY, "hash", results)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert [p.name for p in parameter_store.iterdir()] == [COUNTRY]
+    assert sorted(p.name for p in (parameter_store / COUNTRY).iterdir()) == [
+        "arrays.npz",
+        "meta.json",
+    ]
+    assert fitted_years(COUNTRY) == years
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import price_profile_generation
+from src.binary_store import is_store_valid
+from src.price_profile_generation import (
+    add_time_columns,
+    build_price_store,
+    fit_electricty_price_trends,
+    fit_simple_linear_regression,
+    fit_statsmodels_regression,
+    ingest_price_csv,
+    load_electricity_price_profile,
+    load_price_columns,
+    load_price_statistics,
+)
+
+pytest.importorskip("statsmodels")
+
+
+def assert_same_regression(x, y):
+    expected = fit_statsmodels_regression(x, y, standard_errors=True)
+    coefficients = fit_simple_linear_regression(x, y, standard_errors=True)
+    assert coefficients.keys() == expected.keys()
+    for key in expected:
+        assert np.allclose(coefficients[key], expected[key], rtol=1e-9), key
+
+
+def test_regression_matches_statsmodels_on_synthetic_series():
+    rng = np.random.default_rng(1)
+    x = np.arange(8760, dtype=float)
+    y = 3.5 - 2e-5 * x + rng.normal(0, 0.4, x.size)
+    assert_same_regression(x, y)
+    # regressor far from zero, as the weekly cycle
+    assert_same_regression(np.abs(np.sin(x * np.pi / 168 - 0.3)) + 100, y)
+
+
+@pytest.mark.parametrize("country, year", [("Croatia", 2023), ("Ireland", 2021)])
+def test_regression_matches_statsmodels_on_price_data(repo_root, country, year):
+    p = add_time_columns(load_electricity_price_profile(country, year), year)
+    log_p = np.log(np.where(p["p"] <= 0, 0.01, p["p"]))
+    assert_same_regression(p["int_time_step"], log_p)
+    assert_same_regression(np.abs(np.sin(p["int_time_step"] * np.pi / 168)), log_p)
+
+
+def test_price_trends_match_statsmodels_backend(repo_root):
+    p = load_electricity_price_profile("Croatia", 2023)
+    _, params = fit_electricty_price_trends(p, 2023, standard_errors=True)
+    _, expected = fit_electricty_price_trends(
+        p, 2023, backend="statsmodels", standard_errors=True
+    )
+    for group in ["trend", "weekly_cycle"]:
+        for key, value in expected[group].items():
+            assert np.allclose(params[group][key], value, rtol=1e-9), (group, key)
+    assert np.allclose(params["hourly_cycle_table"], expected["hourly_cycle_table"])
+
+
+def test_ingested_multi_country_store_matches_pandas(tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    utc = pd.date_range("2021-06-01", "2023-03-01", freq="h", inclusive="left")
+    rows = []
+    for country, offset in [("Aland", 1), ("Borduria", 2)]:
+        price = rng.normal(80, 30, len(utc)).round(2).astype(str)
+        price[rng.choice(len(utc), 50, replace=False)] = ""
+        rows.append(
+            pd.DataFrame(
+                {
+                    "Country": country,
+                    "ISO3 Code": country[:3].upper(),
+                    "Datetime (UTC)": utc.strftime("%Y-%m-%d %H:%M:%S"),
+                    "Datetime (Local)": (utc + pd.Timedelta(hours=offset)).strftime(
+                        "%Y-%m-%d %H:%M:%S"
+                    ),
+                    "Price (EUR/MWhe)": price,
+                }
+            )
+        )
+    # the countries alternate row by row
+    frame = pd.concat(rows).sort_index(kind="stable").reset_index(drop=True)
+    source = tmp_path / "prices.csv"
+    frame.to_csv(source, index=False)
+    store_root = str(tmp_path / "stores")
+
+    ingest_price_csv(str(source), store_root, chunk_size=1000)
+    # loading must not rebuild the stores from PRICE_DATA_PATH/<country>.csv
+    monkeypatch.setattr(
+        price_profile_generation,
+        "ingest_price_csv",
+        lambda *args, **kwargs: pytest.fail("store rebuilt"),
+    )
+
+    expected = pd.read_csv(source)
+    expected["Datetime (UTC)"] = pd.to_datetime(expected["Datetime (UTC)"])
+    expected["Datetime (Local)"] = pd.to_datetime(expected["Datetime (Local)"])
+    for country, part in expected.groupby("Country"):
+        store_path = build_price_store(country, store_root)
+        assert is_store_valid(store_path, [str(source)])
+        columns = load_price_columns(country, store_root=store_root)
+        assert np.array_equal(
+            columns["datetime_utc"],
+            part["Datetime (UTC)"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        )
+        assert np.array_equal(
+            columns["datetime_local"],
+            part["Datetime (Local)"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        )
+        assert np.array_equal(
+            columns["price"],
+            part["Price (EUR/MWhe)"].to_numpy(dtype=np.float32),
+            equal_nan=True,
+        )
+
+        statistics = load_price_statistics(country, store_root)
+        part = part.reset_index(drop=True)
+        years = part.groupby(part["Datetime (Local)"].dt.year)
+        assert sorted(statistics) == sorted(years.groups)
+        for year, rows_of_year in years:
+            prices = rows_of_year["Price (EUR/MWhe)"].astype(np.float32)
+            assert statistics[year]["hours"] == len(rows_of_year)
+            assert statistics[year]["missing_prices"] == prices.isna().sum()
+            assert statistics[year]["mean"] == pytest.approx(prices.mean(), rel=1e-6)
+            assert statistics[year]["min"] == pytest.approx(prices.min())
+            assert statistics[year]["max"] == pytest.approx(prices.max())
+            assert statistics[year]["first_row"] == rows_of_year.index[0]
+            assert statistics[year]["last_row"] == rows_of_year.index[-1]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.price_profile_generation import (
+    fit_electricty_price_trends,
+    load_electricity_price_profile,
+)
+from src.price_scenarios import fit_residual_model, generate_price_scenarios
+
+SCALING_FACTORS = {
+    "trend": 1.0,
+    "weekly_factor": 1.0,
+    "hourly_factor": 1.0,
+    "overall_factor": 1.0,
+}
+
+
+@pytest.fixture
+def price_model(repo_root):
+    p = load_electricity_price_profile("Croatia", 2019)
+    p_fitted, params = fit_electricty_price_trends(p, 2019)
+    return params, fit_residual_model(p_fitted), float(p["p"].mean())
+
+
+def test_scenarios_keep_price_level_uncertainty(price_model):
+    params, residual_model, p_mean = price_model
+    scenarios = generate_price_scenarios(
+        params, residual_model, 200, p_mean, SCALING_FACTORS, 2019, seed=0
+    )
+    means = scenarios.mean(axis=1, dtype=float)
+    assert means.std() > 0.005 * p_mean
+    # p_mean is the level of the scenarios, not of every single scenario
+    assert abs(means.mean() - p_mean) < 0.05 * p_mean
+
+
+def test_scenarios_with_fixed_mean(price_model):
+    params, residual_model, p_mean = price_model
+    scenarios = generate_price_scenarios(
+        params,
+        residual_model,
+        50,
+        p_mean,
+        SCALING_FACTORS,
+        2019,
+        seed=0,
+        fixed_mean=True,
+    )
+    assert np.allclose(scenarios.mean(axis=1, dtype=float), p_mean, rtol=1e-5)
+
+
+def test_scenarios_do_not_depend_on_chunk_size(price_model):
+    params, residual_model, p_mean = price_model
+    scenarios = [
+        generate_price_scenarios(
+            params, residual_model, 20, p_mean, SCALING_FACTORS, 2019, chunk_size, 3
+        )
+        for chunk_size in (20, 7)
+    ]
+    assert scenarios[0].shape == (20, 8760)
+    assert np.array_equal(*scenarios)
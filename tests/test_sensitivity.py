@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from src.sensitivity import (
+    allowable_investment_model,
+    calculate_sobol_indices,
+    calculate_tornado,
+    inverse_cdf,
+)
+
+A, B = 2.0, 3.0
+DISTRIBUTIONS = {
+    "x1": ("uniform", 0, 1),
+    "x2": ("normal", 0, 0.2),
+    "x3": ("constant", 5.0),
+}
+
+
+def additive_model(x1, x2, x3):
+    return A * x1 + B * x2 + 0 * x3
+
+
+def analytic_indices():
+    """
+    For y = a x1 + b x2 with independent inputs the first order and total indices are both var(a xi) / var(y)
+    """
+    variances = np.array([A**2 / 12, B**2 * 0.2**2, 0])
+    return variances / variances.sum(), np.sqrt(variances.sum())
+
+
+@pytest.mark.parametrize("sampling", ["sobol", "random"])
+def test_additive_model_converges_to_analytic_indices(sampling):
+    expected, std = analytic_indices()
+    errors = []
+    for n_samples in [2**8, 2**14]:
+        result = calculate_sobol_indices(
+            additive_model, DISTRIBUTIONS, n_samples, sampling=sampling
+        )
+        assert result["names"] == ["x1", "x2", "x3"]
+        assert result["n_samples"] == n_samples and result["n_invalid"] == 0
+        errors.append(
+            max(
+                np.abs(result["first_order"] - expected).max(),
+                np.abs(result["total_order"] - expected).max(),
+            )
+        )
+    # the constant input has no influence
+    assert result["first_order"][2] == 0 and result["total_order"][2] == 0
+    assert result["mean"] == pytest.approx(A / 2, abs=0.01)
+    assert result["std"] == pytest.approx(std, rel=0.02)
+    tolerance = 0.02 if sampling == "sobol" else 0.05
+    assert errors[1] < tolerance
+    assert errors[1] < errors[0]
+
+
+def test_indices_do_not_depend_on_chunks():
+    results = [
+        calculate_sobol_indices(additive_model, DISTRIBUTIONS, 3000, chunk_size=c)
+        for c in [3000, 1024, 100]
+    ]
+    for result in results[1:]:
+        assert np.allclose(result["first_order"], results[0]["first_order"])
+        assert np.allclose(result["total_order"], results[0]["total_order"])
+
+
+def test_invalid_samples_are_left_out():
+    def model(x1, x2, x3):
+        return np.where(x1 < 0.1, np.nan, additive_model(x1, x2, x3))
+
+    result = calculate_sobol_indices(model, DISTRIBUTIONS, 2**12)
+    assert 0 < result["n_invalid"] < 2**12
+    assert result["n_samples"] + result["n_invalid"] == 2**12
+
+
+def test_tornado_swings_are_signed_and_ordered():
+    def model(x1, x2, x3):
+        return 3 * x1 - 2 * x2 + 0.5 * x3
+
+    base = {"x1": 1.0, "x2": 1.0, "x3": 1.0}
+    ranges = {"x1": (0.5, 1.5), "x2": (0.0, 2.0), "x3": (-1.0, 1.0)}
+    tornado = calculate_tornado(model, base, ranges)
+    assert tornado["base"] == pytest.approx(1.5)
+    # (output at the low end, output at the high end) of every input
+    assert tornado["x1"] == pytest.approx((0.0, 3.0))
+    assert tornado["x2"] == pytest.approx((3.5, -0.5))
+    assert tornado["x3"] == pytest.approx((0.5, 1.5))
+    swings = {name: tornado[name][1] - tornado[name][0] for name in ranges}
+    assert sorted(swings, key=lambda name: -abs(swings[name])) == ["x2", "x1", "x3"]
+    assert swings["x1"] > 0 > swings["x2"]
+
+
+def test_tornado_of_allowable_investment():
+    base = {
+        "T_l": 30.0,
+        "T_h": 90.0,
+        "h": 6000.0,
+        "p_th": 50.0,
+        "p_el": 150.0,
+        "r": 0.05,
+        "t": 15.0,
+        "ex_eta": 0.5,
+    }
+    ranges = {"p_th": (40.0, 60.0), "p_el": (120.0, 180.0), "T_l": (20.0, 40.0)}
+    tornado = calculate_tornado(allowable_investment_model(), base, ranges)
+    for name in ranges:
+        low, high = tornado[name]
+        assert min(low, high) < tornado["base"] < max(low, high)
+    # cheaper alternative heat and more expensive electricity lower the allowable investment
+    assert tornado["p_th"][0] < tornado["p_th"][1]
+    assert tornado["p_el"][0] > tornado["p_el"][1]
+    assert tornado["T_l"][0] < tornado["T_l"][1]
+
+
+def test_inverse_cdf():
+    u = np.array([0.0, 0.25, 0.5, 0.75])
+    assert np.allclose(inverse_cdf(("uniform", 2, 6), u), [2, 3, 4, 5])
+    assert inverse_cdf(("normal", 1, 2), 0.5) == pytest.approx(1)
+    assert np.allclose(inverse_cdf(("triangular", 0, 1, 2), [0.0, 0.5]), [0, 1])
+    with pytest.raises(ValueError, match="Unknown distribution"):
+        inverse_cdf(("beta", 1, 1), u)
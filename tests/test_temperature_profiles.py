@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.temperature_profiles import (
+    align_temperature_profiles,
+    seasonal_temperature_profile,
+)
+
+
+@pytest.fixture
+def demand_datetimes():
+    return pd.date_range("2025-01-01", "2025-12-31 23:45", freq="15min")
+
+
+def test_align_hourly_temperatures_of_another_year(demand_datetimes):
+    hours = pd.date_range("2023-01-01", "2023-12-31 23:00", freq="h")
+    temperatures = pd.DataFrame(
+        {
+            "datetime": hours.strftime("%Y-%m-%d %H:%M"),
+            "T_l": np.arange(len(hours), dtype=float),
+            "T_h": 90.0,
+        }
+    )
+    aligned = align_temperature_profiles(temperatures, demand_datetimes)
+    assert aligned["datetime"].equals(pd.Series(demand_datetimes, name="datetime"))
+    # every quarter hour takes the value of its hour
+    assert np.array_equal(aligned["T_l"], np.repeat(np.arange(8760.0), 4))
+    assert np.all(aligned["T_h"] == 90)
+
+
+def test_missing_columns_are_reported(demand_datetimes):
+    temperatures = pd.DataFrame(
+        {"time": demand_datetimes[:10], "T_source": 20.0, "T_h": 90.0}
+    )
+    with pytest.raises(ValueError, match="missing: datetime, T_l"):
+        align_temperature_profiles(temperatures, demand_datetimes)
+    with pytest.raises(ValueError, match="at least two"):
+        align_temperature_profiles(
+            pd.DataFrame({"datetime": ["2025-01-01"], "T_l": [1], "T_h": [2]}),
+            demand_datetimes,
+        )
+
+
+def test_seasonal_temperature_profile(demand_datetimes):
+    T = seasonal_temperature_profile(demand_datetimes, 10, 8, coldest_day=15)
+    assert T.mean() == pytest.approx(10, abs=0.05)
+    assert demand_datetimes[T.argmin()].dayofyear == 16
+    assert T.min() == pytest.approx(2, abs=1e-3) and T.max() == pytest.approx(
+        18, abs=1e-3
+    )
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from src.thermal_storage import dispatch_storage_greedy, dispatch_storage_lp
+
+pytest.importorskip("scipy")
+
+DELTA_T = 1.0
+STORAGE = {
+    "storage_capacity": 4.0,
+    "charge_power": 0.5,
+    "loss_rate": 0.01,
+    "hp_capacity": 1.5,
+}
+
+
+@pytest.fixture
+def days():
+    """
+    Four days of hourly demand and prices with a daily price cycle
+    """
+    rng = np.random.default_rng(4)
+    hours = np.arange(96)
+    demand = np.clip(
+        0.6 + 0.3 * np.sin(hours * 2 * np.pi / 24) + rng.normal(0, 0.05, 96), 0, 1
+    )
+    demand = demand / demand.max()
+    # cheap at night, expensive at noon
+    p_el = 0.1 - 0.05 * np.cos(hours * 2 * np.pi / 24) + rng.normal(0, 0.01, 96)
+    return demand, p_el
+
+
+def costs(heat_output, p_el):
+    return heat_output @ p_el * DELTA_T
+
+
+def storage_levels(demand, heat_output):
+    retention = 1 - STORAGE["loss_rate"] * DELTA_T
+    level, levels = 0.0, []
+    for d, q in zip(demand, heat_output):
+        level = level * retention + (q - d) * DELTA_T
+        levels.append(level)
+    return np.array(levels)
+
+
+def full_horizon_lp(demand, p_el):
+    hours = len(demand) * DELTA_T
+    return dispatch_storage_lp(
+        demand,
+        p_el,
+        **STORAGE,
+        delta_t=DELTA_T,
+        horizon_hours=hours,
+        commit_hours=hours
+    )
+
+
+def test_greedy_costs_at_least_lp_costs(days):
+    demand, p_el = days
+    greedy = dispatch_storage_greedy(demand, p_el, **STORAGE, delta_t=DELTA_T)
+    optimum = full_horizon_lp(demand, p_el)
+
+    # the heuristic dispatch is feasible: demand is covered, storage and heat pump limits hold
+    levels = storage_levels(demand, greedy)
+    assert np.all(levels >= -1e-9) and np.all(
+        levels <= STORAGE["storage_capacity"] + 1e-9
+    )
+    assert np.all(greedy >= -1e-9) and np.all(greedy <= STORAGE["hp_capacity"] + 1e-9)
+    # both use the storage, the heuristic can not be cheaper than the optimum
+    assert costs(greedy, p_el) < costs(demand, p_el)
+    assert costs(greedy, p_el) >= costs(optimum, p_el) - 1e-9
+
+
+def test_rolling_horizon_matches_full_horizon(days):
+    demand, p_el = days
+    rolling = dispatch_storage_lp(
+        demand, p_el, **STORAGE, delta_t=DELTA_T, horizon_hours=48, commit_hours=24
+    )
+    optimum = full_horizon_lp(demand, p_el)
+    levels = storage_levels(demand, rolling)
+    assert np.all(levels >= -1e-7)
+    assert costs(rolling, p_el) >= costs(optimum, p_el) - 1e-9
+    assert np.isclose(costs(rolling, p_el), costs(optimum, p_el), rtol=1e-3)
+
+
+def test_greedy_dispatch_of_several_profiles(days):
+    demand, p_el = days
+    profiles = np.vstack([demand, demand[::-1]])
+    together = dispatch_storage_greedy(profiles, p_el, **STORAGE, delta_t=DELTA_T)
+    for profile, heat_output in zip(profiles, together):
+        single = dispatch_storage_greedy(profile, p_el, **STORAGE, delta_t=DELTA_T)
+        assert np.allclose(heat_output, single)
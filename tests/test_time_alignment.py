@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from src.time_alignment import align_series, shift_to_year
+
+
+def local_hourly_prices(year):
+    """
+    Hourly prices in local time of Berlin, valued by their UTC hour (the repeated hour in October has two values)
+    """
+    utc = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq="h", tz="UTC")[:-1]
+    local = utc.tz_convert("Europe/Berlin").tz_localize(None)
+    return local, np.arange(len(utc), dtype=float)
+
+
+def test_align_series_skipped_hour_in_spring():
+    local, values = local_hourly_prices(2023)
+    target = pd.date_range("2023-03-26 00:00", "2023-03-26 04:45", freq="15min")
+    aligned = align_series(local, values, target)
+    by_hour = pd.Series(values, index=local)
+    # 02:00 does not exist on the day daylight saving time starts, the previous hour is used
+    expected = [
+        by_hour[t.floor("h")] if t.hour != 2 else by_hour["2023-03-26 01:00"]
+        for t in target
+    ]
+    assert np.array_equal(aligned, expected)
+
+
+def test_align_series_repeated_hour_in_autumn():
+    local, values = local_hourly_prices(2023)
+    target = pd.date_range("2023-10-29 01:00", "2023-10-29 03:45", freq="15min")
+    aligned = align_series(local, values, target)
+    repeated = values[local == pd.Timestamp("2023-10-29 02:00")]
+    assert len(repeated) == 2
+    assert np.all(aligned[4:8] == repeated.mean())
+    assert np.all(aligned[:4] == values[local == pd.Timestamp("2023-10-29 01:00")])
+    assert np.all(aligned[8:] == values[local == pd.Timestamp("2023-10-29 03:00")])
+
+
+def test_align_series_leap_year_profile_to_normal_year():
+    local, values = local_hourly_prices(2023)
+    by_hour = pd.Series(values, index=local).groupby(level=0).mean()
+    target = pd.date_range("2024-02-28 12:00", "2024-03-01 12:00", freq="h")
+    aligned = align_series(local, values, target, source_year=2023)
+    # February 29 gets the prices of February 28, March 1 stays March 1
+    expected = [
+        by_hour[t.replace(year=2023, day=28) if t.day == 29 else t.replace(year=2023)]
+        for t in target
+    ]
+    assert np.array_equal(aligned, expected)
+
+
+def test_align_series_normal_year_profile_to_leap_year():
+    local, values = local_hourly_prices(2024)
+    by_hour = pd.Series(values, index=local).groupby(level=0).mean()
+    target = pd.date_range("2023-02-28 12:00", "2023-03-01 12:00", freq="h")
+    aligned = align_series(local, values, target, source_year=2024)
+    # February 29 of the price year is skipped
+    assert np.array_equal(aligned, [by_hour[t.replace(year=2024)] for t in target])
+    assert len(align_series(local, values, local, source_year=2024)) == 8784
+
+
+def test_align_series_outside_source_is_nan():
+    local, values = local_hourly_prices(2023)
+    target = pd.to_datetime(
+        ["2022-12-31 23:00", "2023-06-01 00:00", "2024-01-01 01:00"]
+    )
+    aligned = align_series(local, values, target)
+    assert np.isnan(aligned[0]) and np.isnan(aligned[2])
+    assert aligned[1] == values[local == pd.Timestamp("2023-06-01 00:00")][0]
+
+
+def test_shift_to_year_keeps_wall_clock_time():
+    shifted = shift_to_year(
+        pd.to_datetime(["2024-02-29 06:00", "2024-12-31 23:00", "2023-03-01 00:00"]),
+        2023,
+    )
+    assert list(pd.to_datetime(shifted)) == list(
+        pd.to_datetime(["2023-02-28 06:00", "2023-12-31 23:00", "2023-03-01 00:00"])
+    )
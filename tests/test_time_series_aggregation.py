@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from src.batch_evaluation import (
+    calculate_allowable_investment_from_statistics,
+    calculate_sufficient_statistics,
+)
+from src.time_series_aggregation import (
+    aggregate_representative_days,
+    allowable_investment_error_bound,
+    energy_error_bounds,
+)
+
+STEPS_PER_DAY = 24
+DELTA_T = 1.0
+
+
+@pytest.fixture
+def year():
+    rng = np.random.default_rng(2)
+    n_days = 60
+    hours = np.arange(n_days * STEPS_PER_DAY)
+    demand = np.clip(
+        0.5
+        + 0.3 * np.sin(hours * 2 * np.pi / 24)
+        + rng.normal(0, 0.2, (2, hours.size)),
+        0,
+        None,
+    )
+    p_el = (
+        0.1
+        + 0.04 * np.cos(hours * 2 * np.pi / 24)
+        + rng.normal(0, 0.03, (3, hours.size))
+    )
+    cop_weights = rng.uniform(0.8, 1.2, demand.shape)
+    return demand, p_el, cop_weights
+
+
+@pytest.mark.parametrize("method", ["kmeans", "kmedoids"])
+@pytest.mark.parametrize("with_cop_weights", [False, True])
+@pytest.mark.parametrize("k", [3, 12])
+def test_actual_error_within_bound(year, method, with_cop_weights, k):
+    demand, p_el, cop_weights = year
+    cop_weights = cop_weights if with_cop_weights else None
+    aggregation = aggregate_representative_days(
+        demand, p_el, k, STEPS_PER_DAY, method, cop_weights=cop_weights
+    )
+    heat, costs = calculate_sufficient_statistics(
+        demand, p_el, DELTA_T, cop_weights=cop_weights
+    )
+    heat_repr, costs_repr = calculate_sufficient_statistics(
+        aggregation["demand"],
+        aggregation["p_el"],
+        DELTA_T,
+        aggregation["weights"],
+        aggregation.get("cop_weights"),
+    )
+    heat_error, cost_bound = energy_error_bounds(
+        aggregation, demand, p_el, DELTA_T, cop_weights
+    )
+    assert np.allclose(heat_error, heat_repr - heat)
+    assert np.all(np.abs(costs_repr - costs) <= cost_bound * (1 + 1e-9) + 1e-12)
+
+    cop, parameters = np.array([3.0, 2.5]), (0.05, 0.05, 15, 1.2)
+    allowable = calculate_allowable_investment_from_statistics(
+        heat, costs, cop, *parameters
+    )
+    allowable_repr = calculate_allowable_investment_from_statistics(
+        heat_repr, costs_repr, cop, *parameters
+    )
+    bound = allowable_investment_error_bound(heat_error, cost_bound, cop, *parameters)
+    assert np.all(np.abs(allowable_repr - allowable) <= bound * (1 + 1e-9) + 1e-9)
+
+
+def test_bound_is_zero_with_one_day_per_cluster(year):
+    demand, p_el, _ = year
+    n_days = demand.shape[1] // STEPS_PER_DAY
+    aggregation = aggregate_representative_days(
+        demand, p_el, n_days, STEPS_PER_DAY, "kmedoids"
+    )
+    heat_error, cost_bound = energy_error_bounds(aggregation, demand, p_el, DELTA_T)
+    assert np.allclose(heat_error, 0)
+    assert np.allclose(cost_bound, 0)